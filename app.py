@@ -1,25 +1,69 @@
+import copy
+import importlib
+import os
+
 import streamlit as st
 import streamlit_authenticator as stauth  # type: ignore
 import yaml  # type: ignore
 from streamlit_option_menu import option_menu  # type: ignore
 from yaml.loader import SafeLoader  # type: ignore
 
-from constants import HTML_BANNER
-from pgs.pagina_acerca_de import pagina_acerca_de
-from pgs.pagina_admin import pagina_admin
-from pgs.pagina_eda import pagina_eda
-from pgs.pagina_entrenamiento import pagina_entrenamiento
-from pgs.pagina_inicio import pagina_inicio
-from pgs.pagina_prediccion import pagina_prediccion
+from constants import CALENTAR_SERVIDOR, HTML_BANNER, PAGINAS, RUTA_AUTH, RUTA_MODELO_USUARIO
 from logger_config import logger
+from perfilado import ejecutar_perfilado, peticiones_perfilado
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def load_auth_yaml() -> dict:
-    with open("auth.yaml") as f:
+@st.cache_resource(max_entries=1)
+def leer_auth_yaml(fecha_modificacion: float) -> dict:
+    """
+    Lee y parsea 'auth.yaml'. Se cachea por fecha de modificación, así el fichero solo se vuelve a leer
+    cuando cambia.
+    """
+    with open(RUTA_AUTH) as f:
         return yaml.load(f, Loader=SafeLoader)
 
 
+# ----------------------------------------------------------------------------------------------------------------------
+def load_auth_yaml() -> dict:
+    """
+    Devuelve una copia de la configuración de autenticación, porque el autenticador modifica las credenciales.
+    """
+    return copy.deepcopy(leer_auth_yaml(os.path.getmtime(RUTA_AUTH)))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def obtener_authenticator() -> stauth.Authenticate:
+    """
+    Devuelve el autenticador de la sesión.
+
+    Mientras la sesión no está autenticada se construye en cada ejecución, porque el gestor de cookies lee la
+    cookie de sesión del navegador al construirse y el valor llega en la ejecución siguiente. Una vez autenticada,
+    se reutiliza el de la sesión hasta que cambie 'auth.yaml', así las interacciones no repiten la lectura de
+    la configuración ni la comprobación de credenciales. No se comparte entre sesiones porque el gestor de
+    cookies pertenece al navegador de cada sesión.
+    """
+    fecha_modificacion = os.path.getmtime(RUTA_AUTH)
+    if (
+        st.session_state.get("authentication_status")
+        and st.session_state.get("authenticator_fecha") == fecha_modificacion
+        and "authenticator" in st.session_state
+    ):
+        return st.session_state["authenticator"]
+
+    config = load_auth_yaml()
+    authenticator = stauth.Authenticate(
+        config["credentials"],
+        config["cookie"]["name"],
+        config["cookie"]["key"],
+        config["cookie"]["expiry_days"],
+        config["preauthorized"],
+    )
+    st.session_state["authenticator"] = authenticator
+    st.session_state["authenticator_fecha"] = fecha_modificacion
+    return authenticator
+
+
 # ----------------------------------------------------------------------------------------------------------------------
 def main() -> None:
     config_app()
@@ -29,6 +73,12 @@ def main() -> None:
     )
     # Hago un control de excepciones general para que la aplicación no se caiga
     try:
+        # La migración solo actúa si existe el modelo legado, así el registro de modelos (y xgboost) no se
+        # importa en cada arranque
+        if os.path.isfile(RUTA_MODELO_USUARIO):
+            from model_registry import migrar_modelo_legado
+
+            migrar_modelo_legado()
         create_menu()
     except Exception as e:
         logger.error(e)
@@ -38,6 +88,16 @@ def main() -> None:
         st.error(e)
         st.stop()
 
+    # Se calienta al final de la primera ejecución del proceso, cuando la página ya se ha mostrado. Es solo una
+    # optimización: si falla se registra y la aplicación sigue funcionando en frío
+    if CALENTAR_SERVIDOR:
+        try:
+            from calentamiento import calentar_servidor
+
+            calentar_servidor()
+        except Exception as e:
+            logger.warning(f"Error al calentar el servidor: {e}")
+
 
 # ----------------------------------------------------------------------------------------------------------------------
 def config_app() -> None:
@@ -64,14 +124,7 @@ def handle_authentication() -> bool:
         bool: Estado de autenticación del usuario (True si está autenticado, False en caso contrario).
     """
 
-    config = load_auth_yaml()
-    authenticator = stauth.Authenticate(
-        config["credentials"],
-        config["cookie"]["name"],
-        config["cookie"]["key"],
-        config["cookie"]["expiry_days"],
-        config["preauthorized"],
-    )
+    authenticator = obtener_authenticator()
 
     authenticator.login(
         fields={
@@ -84,6 +137,9 @@ def handle_authentication() -> bool:
 
     if st.session_state["authentication_status"]:
         authenticator.logout("Logout", "main", key="unique_key")
+        # La lista de administradores solo se lee, así que no hace falta la copia de 'load_auth_yaml'
+        admins = leer_auth_yaml(os.path.getmtime(RUTA_AUTH)).get("admins", [])
+        st.session_state["es_admin"] = st.session_state["username"] in admins
         st.write(f'Bienvenido *{st.session_state["name"]}*')
         return True
     elif st.session_state["authentication_status"] is False:
@@ -146,20 +202,26 @@ def create_menu() -> None:
     Crea un menú lateral en una aplicación Streamlit y gestiona la navegación entre diferentes páginas.
     """
 
-    # Diccionario para mapear nombres de páginas a funciones
-    page_functions = {
-        "Inicio": pagina_inicio,
-        "EDA": pagina_eda,
-        "Predición": pagina_prediccion,
-        "Entrenamiento": pagina_entrenamiento,
-        "Acerca de": pagina_acerca_de,
-        "Admin": pagina_admin,
-    }
-
     selected_page = create_sidebar_menu()
 
-    if selected_page in page_functions:
-        page_functions[selected_page]()
+    if selected_page in PAGINAS:
+        pagina = cargar_pagina(selected_page)
+        # Si un administrador ha pedido perfilar la página, esta ejecución se hace con el perfilador
+        modo = peticiones_perfilado.tomar(selected_page)
+        if modo is None:
+            pagina()
+        else:
+            ejecutar_perfilado(selected_page, pagina, modo)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def cargar_pagina(nombre: str):
+    """
+    Devuelve la función de una página, importando su módulo si es la primera vez que se usa en el proceso.
+    Las importaciones siguientes salen de 'sys.modules' y no tienen coste.
+    """
+    modulo, funcion = PAGINAS[nombre]
+    return getattr(importlib.import_module(modulo), funcion)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
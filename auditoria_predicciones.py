@@ -0,0 +1,253 @@
+import atexit
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from constants import (
+    CARPETA_AUDITORIA,
+    DIAS_RETENCION_AUDITORIA,
+    INTERVALO_ESCRITURA_AUDITORIA_S,
+    TAMANO_LOTE_AUDITORIA,
+)
+from logger_config import logger
+from metricas import registro_metricas
+from reactores import NOMBRES_REACTORES
+
+# Etapas de 'run_prediccion' cuya latencia se registra, además del total
+ETAPAS_PREDICCION = ["componentes", "features", "modelo", "prediccion", "presentacion"]
+
+# Columnas de los eventos y su tipo. Todos los ficheros tienen el mismo esquema aunque falten valores en un lote
+TIPOS_EVENTO = {
+    "fecha": "datetime64[us]",
+    "usuario": "string",
+    "tinte": "string",
+    "cantidad": "int64",
+    "rango": "int64",
+    "version": "string",
+    "estado": "string",
+    **{f"probabilidad_{reactor}": "float64" for reactor in NOMBRES_REACTORES},
+    **{f"{etapa}_ms": "float64" for etapa in ETAPAS_PREDICCION},
+    "total_ms": "float64",
+}
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Auditoría de predicciones
+#
+# Cada llamada a 'run_prediccion' genera un evento con el usuario, el pedido, la versión del modelo, la probabilidad
+# de cada reactor y la latencia de cada etapa. Los eventos se acumulan en memoria y se escriben por lotes en
+# ficheros Parquet inmutables, uno por lote y proceso, en una carpeta por día. Así varios procesos pueden escribir
+# a la vez sin bloqueos y las consultas por rango de fechas solo leen las carpetas de esos días y las columnas que
+# necesitan.
+# ----------------------------------------------------------------------------------------------------------------------
+class Cronometro:
+    """
+    Mide la latencia de etapas consecutivas: cada 'marcar' registra el tiempo desde la marca anterior.
+    """
+
+    def __init__(self):
+        self.latencias: dict[str, float] = {}
+        self._inicio = self._marca = time.perf_counter()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def marcar(self, etapa: str) -> None:
+        ahora = time.perf_counter()
+        self.latencias[f"{etapa}_ms"] = round((ahora - self._marca) * 1000, 2)
+        self._marca = ahora
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def total(self) -> float:
+        return round((time.perf_counter() - self._inicio) * 1000, 2)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+class BufferAuditoria:
+    """
+    Eventos pendientes de escribir del proceso. Se escriben al acumular 'TAMANO_LOTE_AUDITORIA' eventos, cuando
+    el más antiguo lleva 'INTERVALO_ESCRITURA_AUDITORIA_S' segundos en memoria, antes de cada consulta y al
+    terminar el proceso.
+
+    'registrar' solo añade el evento a la lista: las escrituras por tamaño y por antigüedad las hace un hilo en
+    segundo plano, así una predicción no espera al disco ni recibe sus errores.
+    """
+
+    def __init__(self, carpeta: str):
+        self.carpeta = carpeta
+        self._eventos: list[dict] = []
+        self._lock = threading.Lock()
+        self._primer_evento = 0.0
+        self._lote_lleno = threading.Event()
+        self._hilo = threading.Thread(target=self._vaciar_periodicamente, name="escritor_auditoria", daemon=True)
+        self._hilo.start()
+        atexit.register(self.vaciar)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def registrar(self, evento: dict) -> None:
+        with self._lock:
+            if not self._eventos:
+                self._primer_evento = time.monotonic()
+            self._eventos.append(evento)
+            if len(self._eventos) >= TAMANO_LOTE_AUDITORIA:
+                self._lote_lleno.set()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def vaciar(self) -> None:
+        with self._lock:
+            eventos, self._eventos = self._eventos, []
+        # La escritura se hace fuera del bloqueo para no frenar al resto de sesiones
+        if eventos:
+            self._escribir(eventos)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def _vaciar_periodicamente(self) -> None:
+        # Se despierta al llenarse un lote y, si no, cuatro veces por intervalo, así ningún evento pasa en memoria
+        # mucho más de 'INTERVALO_ESCRITURA_AUDITORIA_S' segundos
+        while True:
+            self._lote_lleno.wait(INTERVALO_ESCRITURA_AUDITORIA_S / 4)
+            self._lote_lleno.clear()
+            with self._lock:
+                pendiente = len(self._eventos) >= TAMANO_LOTE_AUDITORIA or (
+                    bool(self._eventos)
+                    and time.monotonic() - self._primer_evento >= INTERVALO_ESCRITURA_AUDITORIA_S
+                )
+            if pendiente:
+                try:
+                    self.vaciar()
+                except Exception as e:
+                    logger.error(f"Error al escribir la auditoría de predicciones: {e}")
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def _escribir(self, eventos: list[dict]) -> None:
+        """
+        Escribe un lote de eventos, un fichero Parquet por día. El fichero se escribe con un nombre oculto que
+        después se sustituye por el definitivo, así las consultas nunca leen un fichero a medio escribir.
+        """
+        lote = pd.DataFrame(eventos, columns=list(TIPOS_EVENTO)).astype(TIPOS_EVENTO)
+        for dia, eventos_dia in lote.groupby(lote["fecha"].dt.strftime("%Y-%m-%d")):
+            carpeta_dia = os.path.join(self.carpeta, dia)
+            os.makedirs(carpeta_dia, exist_ok=True)
+
+            nombre = f"{time.strftime('%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}.parquet"
+            ruta_temporal = os.path.join(carpeta_dia, f".{nombre}.tmp")
+            eventos_dia.to_parquet(ruta_temporal, index=False)
+            os.replace(ruta_temporal, os.path.join(carpeta_dia, nombre))
+
+        borrar_dias_antiguos(self.carpeta)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_resource
+def obtener_buffer_auditoria() -> BufferAuditoria:
+    """
+    Devuelve el buffer de eventos del proceso, compartido por todas las sesiones.
+    """
+    return BufferAuditoria(CARPETA_AUDITORIA)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def registrar_prediccion(
+    usuario: str,
+    tinte: str,
+    cantidad: int,
+    rango: int,
+    version: str | None,
+    estado: str,
+    probabilidades: pd.DataFrame | None,
+    cronometro: Cronometro,
+) -> None:
+    """
+    Registra el evento de una predicción.
+
+    Args:
+        usuario (str): Usuario que hace la predicción.
+        tinte (str): Tinte seleccionado.
+        cantidad (int): Cantidad del pedido en Kg.
+        rango (int): Rango de cantidad en %.
+        version (str | None): Etiqueta de la versión del modelo, None si no se llegó a cargar.
+        estado (str): 'ok', 'sin_componentes' o 'error'.
+        probabilidades (pd.DataFrame | None): Resultado de la predicción, con las columnas 'reactor', 'cantidad'
+            y 'probabilidad'. Se guarda la probabilidad de cada reactor para la cantidad pedida.
+        cronometro (Cronometro): Cronómetro con la latencia de las etapas.
+    """
+    evento = {
+        "fecha": datetime.now(),
+        "usuario": usuario,
+        "tinte": tinte,
+        "cantidad": cantidad,
+        "rango": rango,
+        "version": version,
+        "estado": estado,
+        **{f"{etapa}_ms": np.nan for etapa in ETAPAS_PREDICCION},
+        **cronometro.latencias,
+        "total_ms": cronometro.total(),
+    }
+
+    probabilidad_reactor = {}
+    if probabilidades is not None:
+        nominal = probabilidades[probabilidades["cantidad"] == cantidad]
+        probabilidad_reactor = dict(zip(nominal["reactor"], nominal["probabilidad"]))
+    for reactor in NOMBRES_REACTORES:
+        evento[f"probabilidad_{reactor}"] = probabilidad_reactor.get(reactor, np.nan)
+
+    obtener_buffer_auditoria().registrar(evento)
+
+    # Las mismas latencias alimentan los histogramas de la página de administración
+    for etapa in [*ETAPAS_PREDICCION, "total"]:
+        if not np.isnan(evento[f"{etapa}_ms"]):
+            registro_metricas.observar(f"prediccion.{etapa}", evento[f"{etapa}_ms"])
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def borrar_dias_antiguos(carpeta: str) -> None:
+    """
+    Borra las carpetas de los días anteriores a la retención.
+    """
+    limite = (date.today() - timedelta(days=DIAS_RETENCION_AUDITORIA)).isoformat()
+    for dia in os.listdir(carpeta):
+        if dia < limite:
+            shutil.rmtree(os.path.join(carpeta, dia), ignore_errors=True)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def consultar_predicciones(
+    desde: date, hasta: date, tinte: str | None = None, columnas: list[str] | None = None
+) -> pd.DataFrame:
+    """
+    Devuelve los eventos de predicción de un rango de días, opcionalmente de un tinte.
+
+    Solo se leen las carpetas de los días del rango y las columnas pedidas, y el filtro de tinte se aplica al
+    leer cada fichero. Antes se escriben los eventos pendientes del proceso.
+
+    Args:
+        desde (date): Primer día, incluido.
+        hasta (date): Último día, incluido.
+        tinte (str | None): Si se indica, solo los eventos de este tinte.
+        columnas (list[str] | None): Columnas que se leen, por defecto todas.
+
+    Returns:
+        pd.DataFrame: Eventos ordenados por fecha.
+    """
+    obtener_buffer_auditoria().vaciar()
+
+    columnas = columnas or list(TIPOS_EVENTO)
+    if not os.path.isdir(CARPETA_AUDITORIA):
+        return pd.DataFrame(columns=columnas).astype({c: TIPOS_EVENTO[c] for c in columnas})
+
+    filtros = [("tinte", "==", tinte)] if tinte else None
+    partes = [
+        pd.read_parquet(os.path.join(CARPETA_AUDITORIA, dia), columns=columnas, filters=filtros)
+        for dia in sorted(os.listdir(CARPETA_AUDITORIA))
+        if desde.isoformat() <= dia <= hasta.isoformat()
+    ]
+    if not partes:
+        return pd.DataFrame(columns=columnas).astype({c: TIPOS_EVENTO[c] for c in columnas})
+
+    eventos = pd.concat(partes, ignore_index=True)
+    return eventos.sort_values("fecha", ignore_index=True) if "fecha" in columnas else eventos
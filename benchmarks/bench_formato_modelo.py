@@ -0,0 +1,61 @@
+"""
+Compara el tamaño y el tiempo de carga del modelo en formato joblib y en formato nativo de XGBoost.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_formato_modelo --repeticiones 20
+"""
+
+import argparse
+import os
+import statistics
+import time
+import warnings
+
+import joblib
+
+from constants import RUTA_ESQUEMA, RUTA_MODELO, RUTA_MODELO_NATIVO
+from model_format import cargar_modelo_nativo
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def medir_carga(funcion_carga, repeticiones: int) -> list[float]:
+    """
+    Ejecuta la función de carga varias veces y devuelve los tiempos en milisegundos.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion_carga()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return tiempos
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    # Los avisos de compatibilidad de xgboost al deserializar el joblib no aportan nada a la medición
+    warnings.filterwarnings("ignore")
+
+    formatos = {
+        "joblib": (RUTA_MODELO, lambda: joblib.load(RUTA_MODELO)),
+        "nativo (ubj)": (
+            RUTA_MODELO_NATIVO,
+            lambda: cargar_modelo_nativo(RUTA_MODELO_NATIVO, RUTA_ESQUEMA),
+        ),
+    }
+
+    print(f"{'formato':<14}{'tamaño (KB)':>14}{'mediana (ms)':>16}{'mínimo (ms)':>14}")
+    for nombre, (ruta, funcion_carga) in formatos.items():
+        tiempos = medir_carga(funcion_carga, args.repeticiones)
+        print(
+            f"{nombre:<14}{os.path.getsize(ruta) / 1024:>14.1f}"
+            f"{statistics.median(tiempos):>16.2f}{min(tiempos):>14.2f}"
+        )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
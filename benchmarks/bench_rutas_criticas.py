@@ -0,0 +1,227 @@
+"""
+Mide el tiempo y la memoria de las rutas críticas de la aplicación con historiales de pedidos sintéticos.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_rutas_criticas --filas 1e3 1e5 1e7 --comparar benchmarks/resultados/anterior.json
+
+Los resultados se guardan en JSON (por defecto en 'benchmarks/resultados/<fecha>.json') junto con los datos del
+equipo y de las librerías, para comparar ejecuciones en la misma máquina a lo largo del tiempo.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+import sklearn
+import xgboost
+from sklearn.model_selection import train_test_split
+from xgboost import XGBClassifier
+
+from benchmarks.datos_sinteticos import generar_pedidos, guardar_pedidos
+from constants import RUTA_ESQUEMA, RUTA_MODELO_NATIVO
+from data_repo import preprocesar_datos_eda, read_data
+from model_format import cargar_modelo_nativo
+from pgs.pagina_entrenamiento import preparar_datos_entrenamiento
+from pgs.pagina_prediccion import predecir_viscosidad
+from reactores import CAPACIDADES, crear_matriz_features
+
+RUTAS = ["read_data", "preprocess_data_eda", "train_data", "predecir_viscosidad"]
+# Parámetros por defecto de la página de entrenamiento
+PARAMETROS_ENTRENAMIENTO = {
+    "alpha": 0.5,
+    "colsample_bytree": 0.9,
+    "gamma": 0.2,
+    "learning_rate": 0.005,
+    "max_depth": 4,
+    "min_child_weight": 0.8,
+    "n_estimators": 500,
+    "scale_pos_weight": 1.0,
+    "seed": 0,
+    "subsample": 0.5,
+}
+TEST_SIZE = 0.3
+ARCHIVO_PEDIDOS = "pedidos.csv"
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def medir(funcion, repeticiones: int, memoria: bool) -> dict:
+    """
+    Ejecuta la función varias veces y devuelve sus tiempos en segundos. La memoria se mide en una ejecución más con
+    'tracemalloc', aparte para que no afecte a los tiempos; cuenta lo que reservan Python, numpy y pandas, pero no
+    la memoria interna de XGBoost.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    pico_memoria_mb = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcion()
+            pico_memoria_mb = round(tracemalloc.get_traced_memory()[1] / 1024**2, 2)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "tiempos_s": [round(tiempo, 6) for tiempo in tiempos],
+        "mediana_s": round(statistics.median(tiempos), 6),
+        "minimo_s": round(min(tiempos), 6),
+        "pico_memoria_mb": pico_memoria_mb,
+    }
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def preparar_rutas(n_filas: int, carpeta: str, semilla: int) -> dict:
+    """
+    Genera los datos sintéticos de un tamaño y devuelve, para cada ruta crítica, la función que se mide. La
+    preparación de las entradas (generar y guardar el CSV, cargar el modelo) no forma parte de la medida.
+    """
+    pedidos = generar_pedidos(n_filas, semilla=semilla)
+    ruta_pedidos = guardar_pedidos(pedidos, os.path.join(carpeta, ARCHIVO_PEDIDOS))
+    componentes = read_data("componentes.csv")
+
+    def entrenar() -> None:
+        X, y = preparar_datos_entrenamiento(pd.read_csv(ruta_pedidos), componentes)
+        X_train, _, y_train, _ = train_test_split(
+            X, y, test_size=TEST_SIZE, random_state=PARAMETROS_ENTRENAMIENTO["seed"]
+        )
+        XGBClassifier(**PARAMETROS_ENTRENAMIENTO).fit(X_train, y_train)
+
+    # Una fila por pedido, con los componentes del primer tinte y cantidades que caben en el reactor
+    rng = np.random.default_rng(semilla)
+    indices = rng.integers(0, len(CAPACIDADES), n_filas)
+    features = crear_matriz_features(
+        componentes.iloc[:1].drop(columns="material"),
+        np.round(CAPACIDADES[indices] * rng.uniform(0.1, 1, n_filas)),
+        indices,
+    )
+    modelo = cargar_modelo_nativo(RUTA_MODELO_NATIVO, RUTA_ESQUEMA)
+
+    return {
+        "read_data": lambda: read_data(ARCHIVO_PEDIDOS, subfolder=carpeta),
+        "preprocess_data_eda": lambda: preprocesar_datos_eda(ruta_pedidos),
+        "train_data": entrenar,
+        "predecir_viscosidad": lambda: predecir_viscosidad(features, modelo, "cantidad", 0, 0),
+    }
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def describir_entorno() -> dict:
+    """
+    Devuelve los datos del equipo, de las librerías y del commit con los que se ha ejecutado el benchmark.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit,
+        "equipo": platform.node(),
+        "procesador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "sistema": platform.platform(),
+        "python": platform.python_version(),
+        "librerias": {
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "scikit-learn": sklearn.__version__,
+            "xgboost": xgboost.__version__,
+        },
+    }
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def comparar(resultados: list[dict], ruta_anterior: str) -> None:
+    """
+    Muestra la variación de la mediana de cada medida respecto a una ejecución anterior.
+    """
+    with open(ruta_anterior) as f:
+        anterior = json.load(f)
+    medianas = {(r["ruta"], r["filas"]): r["mediana_s"] for r in anterior["resultados"]}
+
+    print(f"\nComparación con {ruta_anterior} ({anterior['entorno']['fecha']}, {anterior['entorno']['commit']}):")
+    for resultado in resultados:
+        clave = (resultado["ruta"], resultado["filas"])
+        if clave in medianas:
+            variacion = (resultado["mediana_s"] / medianas[clave] - 1) * 100
+            print(
+                f"{clave[0]:<22}{clave[1]:>10}  {medianas[clave]:>10.4f} s -> {resultado['mediana_s']:.4f} s "
+                f"({variacion:+.1f} %)"
+            )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--filas",
+        type=lambda valor: int(float(valor)),
+        nargs="+",
+        default=[1_000, 10_000, 100_000],
+        help="Tamaños de los historiales de pedidos, p. ej. 1e3 1e5 1e7",
+    )
+    parser.add_argument("--rutas", nargs="+", choices=RUTAS, default=RUTAS)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument(
+        "--memoria",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Mide el pico de memoria con una ejecución más de cada ruta",
+    )
+    parser.add_argument("--salida", default=None, help="Ruta del JSON de resultados")
+    parser.add_argument("--comparar", default=None, help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    # Los avisos de xgboost y pandas no aportan nada a la medición
+    warnings.filterwarnings("ignore")
+
+    resultados = []
+    print(f"{'ruta':<22}{'filas':>10}{'mediana (s)':>14}{'mínimo (s)':>13}{'pico (MB)':>12}")
+    for n_filas in args.filas:
+        with tempfile.TemporaryDirectory(prefix="bench_") as carpeta:
+            rutas = preparar_rutas(n_filas, carpeta, args.semilla)
+            for nombre in args.rutas:
+                medidas = medir(rutas[nombre], args.repeticiones, args.memoria)
+                resultado = {"ruta": nombre, "filas": n_filas, **medidas}
+                resultados.append(resultado)
+                pico = "-" if resultado["pico_memoria_mb"] is None else f"{resultado['pico_memoria_mb']:.1f}"
+                print(
+                    f"{nombre:<22}{n_filas:>10}{resultado['mediana_s']:>14.4f}{resultado['minimo_s']:>13.4f}"
+                    f"{pico:>12}"
+                )
+
+    salida = args.salida or os.path.join("benchmarks", "resultados", f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+    with open(salida, "w") as f:
+        json.dump(
+            {"entorno": describir_entorno(), "repeticiones": args.repeticiones, "resultados": resultados},
+            f,
+            indent=2,
+            ensure_ascii=False,
+        )
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
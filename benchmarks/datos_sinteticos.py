@@ -0,0 +1,106 @@
+"""
+Genera historiales de pedidos sintéticos con el formato de los datos de entrenamiento, a escala de planta.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.datos_sinteticos --filas 1000000 --salida /tmp/pedidos.csv
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from constants import CAPACIDAD_REACTORES
+
+# Reparto de los pedidos entre reactores y grado de llenado típico de cada uno (distribución beta), aproximados a
+# partir de los datos de entrenamiento de 'static_data'
+PROPORCION_REACTORES = {"grande": 0.22, "mediano": 0.41, "pequeño": 0.37}
+BETA_LLENADO = (4.0, 2.5)
+# Proporción de pedidos con viscosidad incorrecta
+TASA_VISCOSIDAD_INCORRECTA = 0.33
+# El historial cubre siempre el mismo periodo, así el número de pedidos por día crece con el número de filas
+INICIO_HISTORIAL = np.datetime64("2021-12-01T06:00:00.000")
+DIAS_HISTORIAL = 3 * 365
+PRIMERA_ORDEN = 1_000_000
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def generar_pedidos(
+    n_filas: int, ruta_componentes: str = "static_data/componentes.csv", semilla: int = 0
+) -> pd.DataFrame:
+    """
+    Genera un historial de pedidos con las columnas del CSV de entrenamiento: 'orden', 'fecha', 'matcode',
+    'cantidad', 'target' y 'reactor'.
+
+    Los tintes se eligen entre los de 'componentes.csv' con una popularidad de tipo Zipf (unos pocos tintes
+    concentran la mayoría de los pedidos). La cantidad es un grado de llenado aleatorio de la capacidad del reactor
+    y la probabilidad de viscosidad incorrecta depende del tinte y crece con el grado de llenado. El resultado solo
+    depende de 'n_filas' y 'semilla'.
+    """
+    rng = np.random.default_rng(semilla)
+    materiales = pd.read_csv(ruta_componentes, usecols=["material"])["material"].to_numpy()
+
+    # Popularidad y riesgo de viscosidad de cada tinte
+    popularidad = 1 / np.arange(1, len(materiales) + 1)
+    popularidad = rng.permutation(popularidad / popularidad.sum())
+    riesgo_tinte = rng.normal(0, 0.5, len(materiales))
+    tintes = rng.choice(len(materiales), size=n_filas, p=popularidad)
+
+    nombres = np.array(list(PROPORCION_REACTORES), dtype=object)
+    reactores = rng.choice(len(nombres), size=n_filas, p=list(PROPORCION_REACTORES.values()))
+    capacidades = np.array([CAPACIDAD_REACTORES[nombre] for nombre in nombres])[reactores]
+    cantidades = np.maximum(np.round(capacidades * rng.beta(*BETA_LLENADO, size=n_filas)), 1)
+
+    # Modelo logístico centrado en la tasa de viscosidad incorrecta
+    logit = (
+        np.log(TASA_VISCOSIDAD_INCORRECTA / (1 - TASA_VISCOSIDAD_INCORRECTA))
+        + riesgo_tinte[tintes]
+        + 2 * (cantidades / capacidades - 0.6)
+    )
+    target = (rng.random(n_filas) < 1 / (1 + np.exp(-logit))).astype(np.int64)
+
+    # Fechas crecientes con separaciones exponenciales, en milisegundos
+    separaciones_ms = rng.exponential(DIAS_HISTORIAL * 86_400_000 / n_filas, size=n_filas)
+    fechas = INICIO_HISTORIAL + np.cumsum(separaciones_ms).astype("timedelta64[ms]")
+
+    return pd.DataFrame(
+        {
+            "orden": np.arange(PRIMERA_ORDEN, PRIMERA_ORDEN + n_filas),
+            "fecha": fechas,
+            "matcode": materiales[tintes],
+            "cantidad": cantidades,
+            "target": target,
+            "reactor": nombres[reactores],
+        }
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def guardar_pedidos(pedidos: pd.DataFrame, ruta: str) -> str:
+    """
+    Guarda un historial de pedidos como CSV, con el mismo formato de fecha que los datos de entrenamiento.
+
+    Returns:
+        str: Ruta del CSV.
+    """
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    pedidos.to_csv(ruta, index=False)
+    return ruta
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", required=True, help="Ruta del CSV generado")
+    args = parser.parse_args()
+
+    ruta = guardar_pedidos(generar_pedidos(args.filas, semilla=args.semilla), args.salida)
+    print(f"{args.filas} pedidos generados en {ruta} ({os.path.getsize(ruta) / 1024 ** 2:.1f} MB)")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Mide el coste de importación de app.py y de cada página con 'python -X importtime'.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.perfil_importaciones --top 25 --paginas
+
+Termina con código 1 si la importación de app.py supera el presupuesto, para usarlo en integración continua.
+"""
+
+import argparse
+import subprocess
+import sys
+
+from constants import PAGINAS, PRESUPUESTO_IMPORTACION_MS
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def medir_importaciones(codigo: str) -> list[dict]:
+    """
+    Ejecuta el código en un intérprete nuevo con '-X importtime' y devuelve los módulos importados.
+
+    Returns:
+        list[dict]: Un registro por módulo con 'modulo', 'profundidad' (0 para las importaciones directas del
+        código), 'propio_ms' y 'acumulado_ms' (incluye los módulos que importa).
+    """
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        capture_output=True,
+        text=True,
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(f"Error al importar:\n{resultado.stderr}")
+
+    modulos = []
+    for linea in resultado.stderr.splitlines():
+        # Formato: 'import time: <propio us> | <acumulado us> | <sangría><módulo>'
+        if not linea.startswith("import time:"):
+            continue
+        propio, acumulado, nombre = linea[len("import time:") :].split("|")
+        if not propio.strip().isdigit():
+            continue  # Cabecera
+        modulos.append(
+            {
+                "modulo": nombre.strip(),
+                "profundidad": (len(nombre) - len(nombre.lstrip()) - 1) // 2,
+                "propio_ms": int(propio) / 1000,
+                "acumulado_ms": int(acumulado) / 1000,
+            }
+        )
+    return modulos
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def coste_modulo(modulos: list[dict], modulo: str) -> float:
+    """
+    Devuelve el tiempo acumulado de importación de un módulo importado directamente por el código.
+    """
+    for registro in modulos:
+        if registro["profundidad"] == 0 and registro["modulo"] == modulo:
+            return registro["acumulado_ms"]
+    return 0.0
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top", type=int, default=20, help="Módulos más costosos que se muestran")
+    parser.add_argument(
+        "--paginas",
+        action="store_true",
+        help="Mide también el coste de la primera selección de cada página",
+    )
+    parser.add_argument("--presupuesto-ms", type=float, default=PRESUPUESTO_IMPORTACION_MS)
+    args = parser.parse_args()
+
+    modulos = medir_importaciones("import app")
+    total_app = coste_modulo(modulos, "app")
+
+    print(f"Módulos más costosos al importar app.py (de {len(modulos)}):")
+    print(f"{'acumulado (ms)':>15} {'propio (ms)':>12}  módulo")
+    for registro in sorted(modulos, key=lambda r: r["acumulado_ms"], reverse=True)[: args.top]:
+        sangria = "  " * registro["profundidad"]
+        print(
+            f"{registro['acumulado_ms']:>15.1f} {registro['propio_ms']:>12.1f}  {sangria}{registro['modulo']}"
+        )
+
+    if args.paginas:
+        # Las páginas se miden después de importar app.py, así solo cuenta lo que añade cada una
+        print("\nCoste de la primera selección de cada página:")
+        for nombre, (modulo, _) in PAGINAS.items():
+            coste = coste_modulo(medir_importaciones(f"import app\nimport {modulo}"), modulo)
+            print(f"{coste:>15.1f}  {nombre} ({modulo})")
+
+    print(f"\nImportación de app.py: {total_app:.1f} ms (presupuesto: {args.presupuesto_ms:.0f} ms)")
+    if total_app > args.presupuesto_ms:
+        print("Se ha superado el presupuesto de importación")
+        sys.exit(1)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import json
+from typing import Callable
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+from constants import MEMORIA_MAXIMA_CACHE_FIGURAS_MB
+from cache_lru import CacheLRU
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Caché de figuras de Plotly
+#
+# Guarda la especificación de las figuras (el diccionario de 'to_plotly_json'), compartida por todas las sesiones, en
+# una caché LRU con límite de memoria. La clave incluye la versión de los datos, los parámetros del gráfico y el tema
+# de Plotly, así que una figura solo se vuelve a construir cuando cambia alguno de ellos. Un acierto se ahorra la
+# construcción de la figura (agregación de datos y Plotly Express), pero no la serialización: 'st.plotly_chart'
+# siempre valida la especificación y la codifica a JSON para enviarla al navegador.
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_resource
+def obtener_cache_figuras() -> CacheLRU:
+    """
+    Devuelve la caché de figuras del proceso, compartida por todas las sesiones.
+    """
+    return CacheLRU(MEMORIA_MAXIMA_CACHE_FIGURAS_MB * 1024**2, "figuras")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def figura_cacheada(
+    nombre: str, version: str, parametros: dict, construir: Callable[[], go.Figure]
+) -> dict:
+    """
+    Devuelve la especificación de una figura, construyéndola con 'construir' solo si no está en la caché.
+
+    Args:
+        nombre (str): Nombre del gráfico.
+        version (str): Versión de los datos con los que se construye el gráfico.
+        parametros (dict): Parámetros del gráfico que cambian la figura.
+        construir (Callable): Función sin argumentos que construye la figura.
+
+    Returns:
+        dict: Especificación de la figura, se puede pasar directamente a 'st.plotly_chart'. Se comparte entre
+        sesiones sin copiarla, hay que tratarla como de solo lectura.
+    """
+    clave = (
+        nombre,
+        version,
+        json.dumps(parametros, sort_keys=True, default=str),
+        str(px.defaults.template),
+    )
+    # El tamaño se estima una sola vez, al añadirla, con la longitud de su JSON
+    return obtener_cache_figuras().obtener(
+        clave,
+        lambda: construir().to_plotly_json(),
+        lambda especificacion: len(pio.to_json(especificacion, validate=False)),
+    )
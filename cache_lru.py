@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+class CacheLRU:
+    """
+    Caché en memoria con política LRU y límite de memoria, compartida por todas las sesiones.
+
+    Cada elemento se guarda con una estimación de su tamaño en bytes. Cuando la suma supera el límite se expulsan
+    los elementos usados hace más tiempo. La caché registra aciertos, fallos y expulsiones para poder
+    dimensionar el límite desde la página de administración. 'nombre_elementos' es el nombre con el que se
+    cuentan los elementos en las métricas, p. ej. 'modelos' o 'figuras'.
+    """
+
+    def __init__(self, memoria_maxima_bytes: int, nombre_elementos: str = "elementos"):
+        self.memoria_maxima_bytes = memoria_maxima_bytes
+        self.nombre_elementos = nombre_elementos
+        self._elementos: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes_ocupados = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.bytes_expulsados = 0
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def obtener(
+        self,
+        clave: Hashable,
+        cargador: Callable[[], Any],
+        tamano_bytes: int | Callable[[Any], int],
+    ) -> Any:
+        """
+        Devuelve el elemento de la clave indicada, cargándolo con 'cargador' si no está en la caché.
+
+        Args:
+            clave (Hashable): Identificador del elemento, debe cambiar cuando cambia el elemento.
+            cargador (Callable): Función sin argumentos que carga o construye el elemento.
+            tamano_bytes (int | Callable): Estimación de la memoria que ocupa el elemento, o una función que la
+                calcula a partir del elemento cargado. Solo se usa si hay que cargarlo.
+
+        Returns:
+            Any: El elemento.
+        """
+        with self._lock:
+            if clave in self._elementos:
+                self._elementos.move_to_end(clave)
+                self.aciertos += 1
+                return self._elementos[clave][0]
+            self.fallos += 1
+
+        # La carga se hace fuera del bloqueo para no frenar al resto de sesiones
+        elemento = cargador()
+        if callable(tamano_bytes):
+            tamano_bytes = tamano_bytes(elemento)
+
+        with self._lock:
+            if clave not in self._elementos:
+                self._elementos[clave] = (elemento, tamano_bytes)
+                self._bytes_ocupados += tamano_bytes
+                self._expulsar()
+            else:
+                self._elementos.move_to_end(clave)
+            return self._elementos[clave][0]
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def _expulsar(self) -> None:
+        """
+        Expulsa los elementos menos usados hasta cumplir el límite de memoria. Siempre se conserva el último
+        elemento añadido, aunque por sí solo supere el límite.
+        """
+        while self._bytes_ocupados > self.memoria_maxima_bytes and len(self._elementos) > 1:
+            _, (_, tamano_bytes) = self._elementos.popitem(last=False)
+            self._bytes_ocupados -= tamano_bytes
+            self.expulsiones += 1
+            self.bytes_expulsados += tamano_bytes
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def metricas(self) -> dict:
+        """
+        Devuelve las métricas de uso de la caché.
+        """
+        with self._lock:
+            peticiones = self.aciertos + self.fallos
+            return {
+                self.nombre_elementos: len(self._elementos),
+                "memoria_mb": round(self._bytes_ocupados / 1024**2, 2),
+                "memoria_maxima_mb": round(self.memoria_maxima_bytes / 1024**2, 2),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / peticiones, 4) if peticiones else 0.0,
+                "expulsiones": self.expulsiones,
+                "memoria_expulsada_mb": round(self.bytes_expulsados / 1024**2, 2),
+            }
@@ -0,0 +1,79 @@
+import importlib
+import time
+
+import numpy as np
+import streamlit as st
+
+from data_repo import cargar_componentes, get_tintes
+from logger_config import logger
+from model_registry import cargar_modelo
+from reactores import CAPACIDADES, crear_matriz_features, predecir_probabilidades
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Calentamiento del servidor
+#
+# Tras un despliegue o reinicio, la primera predicción paga la lectura del modelo, el parseo de los CSV y la
+# inicialización de XGBoost. El calentamiento hace ese trabajo una vez por proceso y deja el modelo publicado, los
+# componentes y el listado de tintes en los recursos compartidos, así la primera predicción real ya va en caliente.
+#
+# Uso: python -m calentamiento (compara los tiempos en frío y en caliente)
+# ----------------------------------------------------------------------------------------------------------------------
+def calentar() -> dict:
+    """
+    Importa la página de predicción, carga sus recursos y hace una predicción de prueba en cada reactor, midiendo cada etapa.
+
+    Returns:
+        dict: Informe con la versión del modelo, la fecha, el tiempo de cada etapa en milisegundos y el total.
+    """
+    etapas = {}
+    inicio = time.perf_counter()
+
+    def medir(etapa: str, funcion):
+        comienzo = time.perf_counter()
+        resultado = funcion()
+        etapas[etapa] = round((time.perf_counter() - comienzo) * 1000, 1)
+        return resultado
+
+    # La página de predicción se importa al seleccionarla por primera vez (plotly, optimizador de lotes...)
+    medir("pagina", lambda: importlib.import_module("pgs.pagina_prediccion"))
+    medir("tintes", get_tintes)
+    componentes = medir("componentes", cargar_componentes)
+    modelo, etiqueta = medir("modelo", lambda: cargar_modelo(None))
+
+    # Un pedido de media capacidad en cada reactor, con los componentes del primer tinte
+    indices = np.arange(len(CAPACIDADES))
+    features = crear_matriz_features(
+        componentes.iloc[:1].drop(columns="material"), CAPACIDADES / 2, indices
+    )
+    medir("prediccion", lambda: predecir_probabilidades(modelo, features))
+
+    return {
+        "version": etiqueta,
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "etapas_ms": etapas,
+        "total_ms": round((time.perf_counter() - inicio) * 1000, 1),
+    }
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def calentar_servidor() -> dict:
+    """
+    Calienta el servidor una sola vez por proceso y devuelve el informe de tiempos.
+    """
+    informe = calentar()
+    logger.info(f"Servidor calentado en {informe['total_ms']} ms: {informe['etapas_ms']}")
+    return informe
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    frio = calentar()
+    caliente = calentar()
+
+    print(f"Modelo: {frio['version']}")
+    print(f"{'etapa':<12} {'en frío (ms)':>13} {'en caliente (ms)':>17}")
+    for etapa, tiempo in frio["etapas_ms"].items():
+        print(f"{etapa:<12} {tiempo:>13.1f} {caliente['etapas_ms'][etapa]:>17.1f}")
+    print(f"{'total':<12} {frio['total_ms']:>13.1f} {caliente['total_ms']:>17.1f}")
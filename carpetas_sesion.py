@@ -0,0 +1,94 @@
+import contextlib
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+from constants import CARPETA_SESIONES, INTERVALO_BARRIDO_SESIONES_S, TTL_CARPETAS_SESION_S
+from logger_config import logger
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Carpetas temporales por sesión
+#
+# Cada sesión escribe sus ficheros temporales en su propia carpeta ('tmp/sesiones/<id de sesión>'), así dos
+# usuarios que entrenan a la vez no se pisan los ficheros. La carpeta se crea solo cuando hace falta escribir algo y
+# un hilo en segundo plano borra las que llevan más de 'TTL_CARPETAS_SESION_S' sin usarse, también las que dejó un
+# proceso anterior.
+# ----------------------------------------------------------------------------------------------------------------------
+def carpeta_sesion() -> str:
+    """
+    Devuelve la carpeta temporal de la sesión actual, creándola si no existe, y renueva su fecha de uso.
+    """
+    if "id_sesion" not in st.session_state:
+        st.session_state["id_sesion"] = uuid.uuid4().hex
+    iniciar_barrido()
+
+    carpeta = os.path.join(CARPETA_SESIONES, st.session_state["id_sesion"])
+    os.makedirs(carpeta, exist_ok=True)
+    os.utime(carpeta)
+    return carpeta
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def guardar_fichero_sesion(nombre: str, datos: memoryview | bytes) -> str:
+    """
+    Guarda unos datos en la carpeta temporal de la sesión. Se escriben en un fichero temporal que después sustituye
+    al definitivo, para no dejar nunca un fichero a medio escribir.
+
+    Returns:
+        str: Ruta del fichero.
+    """
+    ruta = os.path.join(carpeta_sesion(), nombre)
+    ruta_temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+    with open(ruta_temporal, "wb") as f:
+        f.write(datos)
+    os.replace(ruta_temporal, ruta)
+    return ruta
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def barrer_carpetas_sesion(ttl_s: float = TTL_CARPETAS_SESION_S) -> int:
+    """
+    Borra las carpetas de sesión que no se han usado en los últimos 'ttl_s' segundos.
+
+    Returns:
+        int: Número de carpetas borradas.
+    """
+    if not os.path.isdir(CARPETA_SESIONES):
+        return 0
+
+    borradas = 0
+    limite = time.time() - ttl_s
+    for nombre in os.listdir(CARPETA_SESIONES):
+        carpeta = os.path.join(CARPETA_SESIONES, nombre)
+        with contextlib.suppress(FileNotFoundError):
+            if os.path.getmtime(carpeta) < limite:
+                shutil.rmtree(carpeta, ignore_errors=True)
+                borradas += 1
+    return borradas
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def iniciar_barrido() -> threading.Thread:
+    """
+    Arranca, una vez por proceso, el hilo que barre las carpetas de sesión caducadas cada
+    'INTERVALO_BARRIDO_SESIONES_S' segundos.
+    """
+
+    def barrer() -> None:
+        while True:
+            try:
+                if borradas := barrer_carpetas_sesion():
+                    logger.info(f"Borradas {borradas} carpetas de sesión caducadas")
+            except OSError as e:
+                logger.error(f"Error al borrar las carpetas de sesión: {e}")
+            time.sleep(INTERVALO_BARRIDO_SESIONES_S)
+
+    hilo = threading.Thread(target=barrer, name="barrido_sesiones", daemon=True)
+    hilo.start()
+    return hilo
@@ -5,8 +5,30 @@ HTML_BANNER = """
     </div>
     """
 
+# Configuración de usuarios y cookies de autenticación
+RUTA_AUTH = "auth.yaml"
+
+# Módulo y función de cada página. Las páginas se importan la primera vez que se seleccionan, así xgboost,
+# scikit-learn, plotly, etc. no se cargan hasta que una página los necesita
+PAGINAS = {
+    "Inicio": ("pgs.pagina_inicio", "pagina_inicio"),
+    "EDA": ("pgs.pagina_eda", "pagina_eda"),
+    "Predición": ("pgs.pagina_prediccion", "pagina_prediccion"),
+    "Entrenamiento": ("pgs.pagina_entrenamiento", "pagina_entrenamiento"),
+    "Acerca de": ("pgs.pagina_acerca_de", "pagina_acerca_de"),
+    "Admin": ("pgs.pagina_admin", "pagina_admin"),
+}
+
+# Presupuesto de tiempo de importación de app.py (arranque en frío hasta el inicio de sesión), se comprueba con
+# 'python -m benchmarks.perfil_importaciones'. Las páginas se importan al seleccionarlas y no cuentan
+PRESUPUESTO_IMPORTACION_MS = 1000
+
 # Página de inicio -------------------------------------------------------------------------------------
 
+# Las descargas se leen de disco al pulsar el botón, por bloques. Los CSV y los logs se comprimen con gzip
+EXTENSIONES_DESCARGA_GZIP = (".csv", ".log")
+TAMANO_BLOQUE_DESCARGA = 1024 * 1024
+
 # Datos sobre archivos para descarga
 FILES_TO_DOWNLOAD = [
     {
@@ -63,6 +85,9 @@ EDA_DESCRIPTION = """
         asegurando una interpretación precisa y fundamentada de los datos.
         """
 
+# Etiquetas de la variable objetivo
+MAPA_RESULTADO = {0: "Viscosidad correcta", 1: "Viscosidad incorrecta"}
+
 # Lista temas plotly
 PLOTLY_THEMES = [
     "plotly",
@@ -74,21 +99,96 @@ PLOTLY_THEMES = [
     "none",
 ]
 
+# Agregación de los gráficos en el servidor, el tamaño de los gráficos no depende del número de filas
+NUM_BINS_HISTOGRAMA = 50
+NUM_BINS_DENSIDAD = 60
+MAX_PUNTOS_DISPERSION = 5000
+
+# Granularidades de tiempo de los gráficos de defectos, con su frecuencia de periodo de pandas
+GRANULARIDADES_CUBO = {"Día": "D", "Semana": "W", "Mes": "M"}
+# Número máximo de matcodes (los de más pedidos) en el mapa de calor de defectos
+MAX_MATCODES_MAPA_CALOR = 30
+
+# Memoria máxima de la caché de figuras de Plotly, compartida por todas las sesiones
+MEMORIA_MAXIMA_CACHE_FIGURAS_MB = 64
+
+# Filas por página de la tabla de datos de entrenamiento, solo se envía al navegador la página actual
+TAMANOS_PAGINA_EDA = [25, 50, 100, 200]
+
+# Estadísticas del EDA calculadas por bloques de filas, sin cargar el histórico completo en memoria
+TAMANO_BLOQUE_EDA = 100_000
+# Los datos de entrenamiento de al menos este tamaño se analizan con DuckDB si está instalado
+UMBRAL_MB_MOTOR_DUCKDB = 50
+# Copia en Parquet de cada versión de los datos de entrenamiento para el motor DuckDB
+CARPETA_PARQUET_EDA = "user_data/parquet_eda"
+# Se conservan las copias de las versiones usadas más recientemente, las demás se borran al convertir una nueva
+VERSIONES_PARQUET_EDA = 4
+# Snapshots del EDA generados con 'python -m snapshot_eda', uno por versión de los datos
+CARPETA_SNAPSHOTS_EDA = "user_data/snapshots_eda"
+# Valores por nivel del sketch de cuantiles, los percentiles son exactos hasta este número de filas
+CAPACIDAD_SKETCH_CUANTILES = 2048
+
 # Página de predicción ---------------------------------------------------------------------------------
-CAPACIDAD_REACTORES = {
-    "grande": 3000,
-    "mediano": 1000,
-    "pequeño": 500,
-}
+# Reactores de la planta. 'columna' es la variable indicadora del reactor en el modelo, el reactor sin columna es
+# la categoría de referencia (todas las indicadoras a 0). Para añadir un reactor basta con añadirlo a esta lista
+# y reentrenar el modelo con datos que lo incluyan.
+REACTORES = [
+    {"nombre": "grande", "capacidad": 3000, "columna": None},
+    {"nombre": "mediano", "capacidad": 1000, "columna": "reactor_mediano"},
+    {"nombre": "pequeño", "capacidad": 500, "columna": "reactor_pequeño"},
+]
+
+CAPACIDAD_REACTORES = {reactor["nombre"]: reactor["capacidad"] for reactor in REACTORES}
+
+# División de pedidos que superan la capacidad de los reactores en varios lotes
+CANTIDAD_MAXIMA_PEDIDO = 20000
+PASO_DIVISION_KG = 10
+MAX_LOTES_DIVISION = 10
+
+# Auditoría de predicciones: cada predicción se guarda como un evento. Los eventos se acumulan en memoria y se
+# escriben por lotes en ficheros Parquet, en una carpeta por día que se borra pasados los días de retención
+CARPETA_AUDITORIA = "auditoria"
+TAMANO_LOTE_AUDITORIA = 100
+INTERVALO_ESCRITURA_AUDITORIA_S = 60
+DIAS_RETENCION_AUDITORIA = 365
+
+# Calentamiento del servidor: la primera ejecución de cada proceso carga el modelo publicado, los componentes y el
+# listado de tintes y hace una predicción de prueba, para que el primer usuario no pague la carga en frío
+CALENTAR_SERVIDOR = True
 
 RUTA_MODELO = "static_data/xgb_viscosity.joblib"
+# Modelo por defecto en formato nativo de XGBoost y su esquema de variables, generados con model_format.py
+RUTA_MODELO_NATIVO = "static_data/xgb_viscosity.ubj"
+RUTA_ESQUEMA = "static_data/xgb_viscosity.esquema.json"
 USUARIO_FOLDER = "user_data"
+# Ruta del modelo de usuario anterior al registro de versiones, solo se usa para migrarlo al registro
 RUTA_MODELO_USUARIO = "user_data/xgb_viscosity.joblib"
 
+# Registro de versiones del modelo ---------------------------------------------------------------------
+# Registro compartido, contiene los modelos anteriores a los registros por usuario
+REGISTRO_FOLDER = "user_data/registro"
+# Cada usuario tiene su registro en 'user_data/usuarios/<usuario>/registro'
+USUARIOS_FOLDER = "user_data/usuarios"
+# Memoria máxima del pool de modelos cargados, compartido por todas las sesiones
+MEMORIA_MAXIMA_POOL_MB = 256
+ARCHIVO_MODELO = "xgb_viscosity.ubj"
+ARCHIVO_ESQUEMA = "esquema.json"
+# Las versiones publicadas antes del formato nativo guardan el modelo con joblib
+ARCHIVO_MODELO_JOBLIB = "xgb_viscosity.joblib"
+ARCHIVO_METADATOS = "metadatos.json"
+# Puntero a la versión activa, se sustituye de forma atómica al publicar o restaurar una versión
+ARCHIVO_VERSION_ACTUAL = "ACTUAL"
+
 # Página de entrenamiento ------------------------------------------------------------------------------
+# Ruta de los datos de entrenamiento anterior al registro de versiones, solo se usa para migrarlos al registro
 RUTA_DATOS_ENTRENAMIENTO_USUARIO = "user_data/datos_entrenamiento.csv"
 ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO = "datos_entrenamiento.csv"
 TEMP_FOLDER = "tmp"
+# Los ficheros subidos se leen en memoria. Solo se escriben, en una carpeta temporal por sesión, cuando hay que
+# conservarlos (al predeterminar el modelo); las carpetas sin uso durante 'TTL_CARPETAS_SESION_S' se borran
+CARPETA_SESIONES = "tmp/sesiones"
+TTL_CARPETAS_SESION_S = 3600
+INTERVALO_BARRIDO_SESIONES_S = 600
 
 # Tooltip para los parámetros de entrenamiento
 TOOLTIP_ALPHA = """Alpha es el término de regularización L1 aplicado en los pesos del modelo. 
@@ -137,3 +237,28 @@ TOOLTIP_SEED = """En el contexto del aprendizaje automático, "seed" o "semilla"
                 resultados cada vez que se ejecuta el código. Esto es vital para la comparación de modelos,
                 la depuración y la publicación de resultados consistentes y reproducibles en el 
                 aprendizaje automático."""
+
+# Página de administración -----------------------------------------------------------------------------
+CARPETA_LOGS = "logs"
+# Los logs se escriben en segundo plano, por lotes, en un fichero por día ('<fecha>.log'). Los de días anteriores
+# se comprimen con gzip y se borran pasados los días de retención. Opcionalmente, una línea JSON por entrada
+DIAS_RETENCION_LOGS = 7
+COMPRIMIR_LOGS = True
+LOGS_JSON = False
+TAMANO_LOTE_LOGS = 500
+INTERVALO_ESCRITURA_LOGS_S = 0.5
+# Métricas de latencia por etapa: se exportan en formato Prometheus, un fichero por proceso, para el textfile
+# collector de node_exporter. El panel de administración se actualiza solo cada pocos segundos
+CARPETA_METRICAS = "metricas"
+INTERVALO_EXPORTACION_METRICAS_S = 15
+INTERVALO_PANEL_METRICAS_S = 5
+# Perfilado bajo demanda de las páginas: perfiles guardados, intervalo del perfilador de muestreo y máximo de
+# ejecuciones que se pueden perfilar de una vez
+CARPETA_PERFILES = "perfiles"
+INTERVALO_MUESTREO_PERFIL_S = 0.005
+MAX_EJECUCIONES_PERFILADO = 20
+# Visor de logs: entradas por página, tamaño de los bloques que se leen hacia atrás y separación en bytes entre los
+# puntos del índice de fechas de cada fichero
+ENTRADAS_PAGINA_LOGS = [50, 100, 200, 500]
+TAMANO_BLOQUE_LOGS = 64 * 1024
+PASO_INDICE_LOGS = 256 * 1024
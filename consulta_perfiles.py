@@ -0,0 +1,78 @@
+import io
+import os
+import pstats
+from collections import Counter
+
+import pandas as pd
+
+from constants import CARPETA_PERFILES
+from perfilado import MODOS_PERFILADO, PATRON_PERFIL
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Consulta de los perfiles guardados
+#
+# Solo la usa la página de administración. Está separada de 'perfilado', que importa app.py en cada arranque, para
+# que el arranque no cargue pandas.
+# ----------------------------------------------------------------------------------------------------------------------
+def listar_perfiles() -> pd.DataFrame:
+    """
+    Devuelve los perfiles guardados, del más reciente al más antiguo, con su fecha, página, proceso, modo y tamaño.
+    """
+    filas = []
+    if os.path.isdir(CARPETA_PERFILES):
+        for fichero in os.listdir(CARPETA_PERFILES):
+            perfil = PATRON_PERFIL.fullmatch(fichero)
+            if perfil is None:
+                continue
+            filas.append(
+                {
+                    "fichero": fichero,
+                    "fecha": pd.to_datetime(perfil[1], format="%Y%m%d-%H%M%S"),
+                    "pagina": perfil[2],
+                    "proceso": int(perfil[3]),
+                    "modo": "muestreo" if perfil[4] == MODOS_PERFILADO["muestreo"] else "determinista",
+                    "kb": round(os.path.getsize(os.path.join(CARPETA_PERFILES, fichero)) / 1024, 1),
+                }
+            )
+    perfiles = pd.DataFrame(filas, columns=["fichero", "fecha", "pagina", "proceso", "modo", "kb"])
+    return perfiles.sort_values("fecha", ascending=False, ignore_index=True)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def resumir_muestreo(ruta: str, n_funciones: int = 30) -> pd.DataFrame:
+    """
+    Resume un perfil de muestreo: para cada función, el % de muestras en que está en la pila (tiempo inclusivo) y
+    en que está en lo alto de la pila (tiempo propio).
+    """
+    inclusivas: Counter[str] = Counter()
+    propias: Counter[str] = Counter()
+    total = 0
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            pila, muestras = linea.rstrip("\n").rsplit(" ", 1)
+            marcos = pila.split(";")
+            muestras = int(muestras)
+            total += muestras
+            propias[marcos[-1]] += muestras
+            for marco in set(marcos):
+                inclusivas[marco] += muestras
+
+    resumen = pd.DataFrame(
+        [
+            {"funcion": marco, "inclusivo_%": muestras / total * 100, "propio_%": propias[marco] / total * 100}
+            for marco, muestras in inclusivas.most_common(n_funciones)
+        ],
+        columns=["funcion", "inclusivo_%", "propio_%"],
+    )
+    return resumen.round(1)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def resumir_determinista(ruta: str, n_funciones: int = 30) -> str:
+    """
+    Resume un perfil de cProfile: las funciones con más tiempo acumulado.
+    """
+    salida = io.StringIO()
+    pstats.Stats(ruta, stream=salida).strip_dirs().sort_stats("cumulative").print_stats(n_funciones)
+    return salida.getvalue()
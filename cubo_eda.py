@@ -0,0 +1,90 @@
+import pandas as pd
+
+from constants import CAPACIDAD_REACTORES
+
+# Dimensiones del cubo, además del día
+DIMENSIONES_CUBO = ["reactor", "matcode"]
+# Medidas aditivas del cubo, se pueden sumar al agregar celdas
+MEDIDAS_CUBO = ["pedidos", "defectuosos", "cantidad", "grado_llenado"]
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Cubo de defectos por día, reactor y matcode
+#
+# El cubo se construye una vez por versión de los datos recorriendo todos los pedidos. Como todas sus medidas son
+# sumas, se puede agregar a semana o mes, filtrar y agrupar por cualquier subconjunto de dimensiones recorriendo
+# solo sus celdas, sin volver a los pedidos. Las tasas y medias se calculan al final a partir de las sumas.
+# ----------------------------------------------------------------------------------------------------------------------
+def construir_cubo(pedidos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega los pedidos por día, reactor y matcode.
+
+    Args:
+        pedidos (pd.DataFrame): Pedidos con las columnas 'fecha' (datetime), 'reactor', 'matcode', 'cantidad'
+            y 'target'.
+
+    Returns:
+        pd.DataFrame: Una fila por celda no vacía con las columnas 'dia', 'reactor', 'matcode', 'pedidos',
+        'defectuosos', 'cantidad' y 'grado_llenado' (suma de los grados de llenado).
+    """
+    grado_llenado = pedidos["cantidad"] / pedidos["reactor"].map(CAPACIDAD_REACTORES) * 100
+
+    return (
+        pd.DataFrame(
+            {
+                "dia": pedidos["fecha"].dt.floor("D"),
+                "reactor": pedidos["reactor"],
+                "matcode": pedidos["matcode"],
+                "defectuosos": pedidos["target"],
+                "cantidad": pedidos["cantidad"],
+                "grado_llenado": grado_llenado,
+            }
+        )
+        .groupby(["dia", *DIMENSIONES_CUBO])
+        .agg(
+            pedidos=("defectuosos", "size"),
+            defectuosos=("defectuosos", "sum"),
+            cantidad=("cantidad", "sum"),
+            grado_llenado=("grado_llenado", "sum"),
+        )
+        .reset_index()
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def agregar_cubo(
+    cubo: pd.DataFrame,
+    granularidad: str = "D",
+    dimensiones: list[str] | None = None,
+    reactores: list | None = None,
+    matcodes: list | None = None,
+) -> pd.DataFrame:
+    """
+    Agrega el cubo a la granularidad de tiempo y las dimensiones indicadas, filtrando antes sus celdas.
+
+    Args:
+        cubo (pd.DataFrame): Cubo devuelto por 'construir_cubo'.
+        granularidad (str): Frecuencia de periodo de pandas: 'D' (día), 'W' (semana) o 'M' (mes).
+        dimensiones (list[str] | None): Dimensiones que se mantienen, entre 'DIMENSIONES_CUBO'.
+        reactores (list | None): Si se indica, solo se tienen en cuenta estos reactores.
+        matcodes (list | None): Si se indica, solo se tienen en cuenta estos matcodes.
+
+    Returns:
+        pd.DataFrame: Una fila por periodo y combinación de dimensiones con las medidas sumadas y las columnas
+        'tasa_defectos' (%), 'cantidad_media' y 'grado_llenado_medio'.
+    """
+    dimensiones = dimensiones or []
+    if reactores:
+        cubo = cubo[cubo["reactor"].isin(reactores)]
+    if matcodes:
+        cubo = cubo[cubo["matcode"].isin(matcodes)]
+
+    # El periodo se identifica por su primer día, así los ejes de tiempo de los gráficos son fechas
+    periodo = cubo["dia"].dt.to_period(granularidad).dt.start_time.rename("periodo")
+    agregado = cubo.groupby([periodo, *dimensiones])[MEDIDAS_CUBO].sum().reset_index()
+
+    agregado["tasa_defectos"] = (agregado["defectuosos"] / agregado["pedidos"] * 100).round(2)
+    agregado["cantidad_media"] = (agregado["cantidad"] / agregado["pedidos"]).round(2)
+    agregado["grado_llenado_medio"] = (agregado["grado_llenado"] / agregado["pedidos"]).round(2)
+
+    return agregado
@@ -1,11 +1,31 @@
 import os
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+import motor_duckdb
 from constants import (
     ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO,
     CAPACIDAD_REACTORES,
-    RUTA_DATOS_ENTRENAMIENTO_USUARIO,
+    MAPA_RESULTADO,
+    TAMANO_BLOQUE_EDA,
+    UMBRAL_MB_MOTOR_DUCKDB,
+)
+from cubo_eda import construir_cubo
+from eda_agregados import (
+    calcular_cuantiles_caja,
+    calcular_densidad_2d,
+    calcular_histograma,
+    muestreo_estratificado,
+)
+from estadisticas_online import AcumuladorEstadisticas
+from metricas import span
+from model_registry import (
+    VERSION_DEFECTO,
+    etiqueta_version,
+    resolver_version,
+    ruta_version,
 )
 
 
@@ -36,6 +56,7 @@ def get_tintes() -> list[str]:
 
 
 # ----------------------------------------------------------------------------------------------------------------------
+@span("datos.read_data")
 def read_data(file_name: str, subfolder="static_data") -> pd.DataFrame:
     """
     Reads a specified .csv file from the 'data' directory and returns it as a pandas DataFrame.
@@ -50,22 +71,86 @@ def read_data(file_name: str, subfolder="static_data") -> pd.DataFrame:
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def preprocess_data_eda():
+@st.cache_resource(show_spinner=False)
+def cargar_componentes() -> pd.DataFrame:
+    """
+    Returns the components of every dye, read once per process and shared by all sessions.
+    The DataFrame is not copied, so it must be treated as read-only.
+    """
+    return read_data("componentes.csv")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def resolver_datos_entrenamiento(usuario: str | None = None) -> tuple[str, str]:
+    """
+    Resolves which training data the user works with and its version.
+
+    The version identifies the data uniquely, so it can be used as a cache key: registry versions are immutable
+    and the default training data is identified by its modification time.
+
+    Args:
+        usuario (str | None): User whose active model training data is used. Falls back to the shared
+            registry and then to the default training data.
+
+    Returns:
+        tuple[str, str]: Data version and path of the training data CSV.
+    """
+    propietario, version_id = resolver_version(usuario)
+    if version_id is not None:
+        ruta_datos = os.path.join(
+            ruta_version(propietario, version_id), ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO
+        )
+        if os.path.exists(ruta_datos):
+            return etiqueta_version(propietario, version_id), ruta_datos
+
+    ruta_datos = os.path.join("static_data", ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO)
+    return f"{VERSION_DEFECTO}-{os.path.getmtime(ruta_datos):.0f}", ruta_datos
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def preprocess_data_eda(usuario: str | None = None):
     """
     Preprocesses the orders data by performing various transformations and merging it with components data.
 
+    Args:
+        usuario (str | None): User whose active model training data is used. Falls back to the shared
+            registry and then to the default training data.
+
     Returns:
         DataFrame: The preprocessed data with additional columns and merged data.
     """
-    if os.path.exists(RUTA_DATOS_ENTRENAMIENTO_USUARIO):
-        orders_data = read_data(
-            ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO, subfolder="user_data"
-        )
-    else:
-        orders_data = read_data(ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO)
+    _, ruta_datos = resolver_datos_entrenamiento(usuario)
+    return preprocesar_datos_eda(ruta_datos)
 
-    components_data = read_data("componentes.csv")
 
+# ----------------------------------------------------------------------------------------------------------------------
+def preprocesar_datos_eda(ruta_datos: str) -> pd.DataFrame:
+    """
+    Reads a training data CSV and merges it with the components data, adding reactor capacity and fill degree.
+
+    Args:
+        ruta_datos (str): Path of the training data CSV.
+
+    Returns:
+        pd.DataFrame: The preprocessed data with additional columns and merged data.
+    """
+    return preprocesar_pedidos_eda(pd.read_csv(ruta_datos), read_data("componentes.csv"))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def preprocesar_pedidos_eda(
+    orders_data: pd.DataFrame, components_data: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Merges a block of orders with the components data, adding reactor capacity and fill degree.
+
+    Args:
+        orders_data (pd.DataFrame): Orders, either the whole training data or a block of it.
+        components_data (pd.DataFrame): Components data.
+
+    Returns:
+        pd.DataFrame: The preprocessed orders.
+    """
     orders_data["capacidad_reactor"] = orders_data["reactor"].map(CAPACIDAD_REACTORES)
     orders_data["grado_llenado"] = (
         (orders_data["cantidad"] / orders_data["capacidad_reactor"]) * 100
@@ -79,3 +164,291 @@ def preprocess_data_eda():
     df_join["matcode"] = df_join["matcode"].astype(str)
 
     return df_join
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_resource(max_entries=4, show_spinner=False)
+def cargar_datos_eda(version: str, ruta_datos: str) -> pd.DataFrame:
+    """
+    Returns the EDA dataset with the 'resultado' column, cached per data version and shared by all sessions.
+
+    The DataFrame is shared without copying, so callers must treat it as read-only.
+
+    Args:
+        version (str): Data version returned by 'resolver_datos_entrenamiento', used as cache key.
+        ruta_datos (str): Path of the training data CSV.
+
+    Returns:
+        pd.DataFrame: The preprocessed EDA data.
+    """
+    eda_data = preprocesar_datos_eda(ruta_datos)
+    eda_data["resultado"] = eda_data["target"].map(MAPA_RESULTADO)
+    return eda_data
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Paginated training data
+#
+# The filters run on the orders alone (a few columns) and only the rows of the requested page are joined with the
+# components data, so the wide table is never built for the whole history.
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_resource(max_entries=4, show_spinner=False)
+def cargar_pedidos(version: str, ruta_datos: str) -> pd.DataFrame:
+    """
+    Returns the training orders without the components data and with 'fecha' parsed, cached per data version
+    and shared by all sessions. The DataFrame is shared without copying, so callers must treat it as read-only.
+
+    Args:
+        version (str): Data version returned by 'resolver_datos_entrenamiento', used as cache key.
+        ruta_datos (str): Path of the training data CSV.
+
+    Returns:
+        pd.DataFrame: The training orders.
+    """
+    pedidos = pd.read_csv(ruta_datos)
+    pedidos["fecha"] = pd.to_datetime(pedidos["fecha"])
+    return pedidos
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_data(max_entries=4, show_spinner=False)
+def calcular_opciones_filtro(version: str, ruta_datos: str) -> dict:
+    """
+    Returns the values available for each filter of the training data table: reactors, matcodes, results
+    and the first and last order dates.
+    """
+    pedidos = cargar_pedidos(version, ruta_datos)
+    return {
+        "reactores": sorted(pedidos["reactor"].dropna().unique()),
+        "matcodes": sorted(pedidos["matcode"].dropna().unique()),
+        "resultados": list(MAPA_RESULTADO.values()),
+        "fecha_min": pedidos["fecha"].min().date(),
+        "fecha_max": pedidos["fecha"].max().date(),
+    }
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def filtrar_pedidos(
+    version: str,
+    ruta_datos: str,
+    reactores: list | None = None,
+    matcodes: list | None = None,
+    fechas: tuple | None = None,
+    resultados: list | None = None,
+) -> np.ndarray:
+    """
+    Returns the positions of the orders that match the filters. An empty or None filter matches every order.
+
+    Args:
+        version (str): Data version returned by 'resolver_datos_entrenamiento'.
+        ruta_datos (str): Path of the training data CSV.
+        reactores (list | None): Reactor names.
+        matcodes (list | None): Dye matcodes.
+        fechas (tuple | None): First and last date, both included.
+        resultados (list | None): Results, as the labels in 'MAPA_RESULTADO'.
+
+    Returns:
+        np.ndarray: Positions of the matching orders, in file order.
+    """
+    pedidos = cargar_pedidos(version, ruta_datos)
+    mascara = np.ones(len(pedidos), dtype=bool)
+
+    if reactores:
+        mascara &= pedidos["reactor"].isin(reactores).to_numpy()
+    if matcodes:
+        mascara &= pedidos["matcode"].isin(matcodes).to_numpy()
+    if fechas:
+        inicio, fin = pd.Timestamp(fechas[0]), pd.Timestamp(fechas[-1]) + pd.Timedelta(days=1)
+        mascara &= ((pedidos["fecha"] >= inicio) & (pedidos["fecha"] < fin)).to_numpy()
+    if resultados:
+        targets = [target for target, resultado in MAPA_RESULTADO.items() if resultado in resultados]
+        mascara &= pedidos["target"].isin(targets).to_numpy()
+
+    return np.flatnonzero(mascara)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def obtener_pagina_pedidos(version: str, ruta_datos: str, posiciones: np.ndarray) -> pd.DataFrame:
+    """
+    Builds the EDA rows (orders joined with the components data and 'resultado') of the given orders only.
+
+    Args:
+        version (str): Data version returned by 'resolver_datos_entrenamiento'.
+        ruta_datos (str): Path of the training data CSV.
+        posiciones (np.ndarray): Positions of the orders of the page, as returned by 'filtrar_pedidos'.
+
+    Returns:
+        pd.DataFrame: The preprocessed orders of the page.
+    """
+    pagina = cargar_pedidos(version, ruta_datos).iloc[posiciones].reset_index(drop=True)
+    pagina = preprocesar_pedidos_eda(pagina, read_data("componentes.csv"))
+    pagina["resultado"] = pagina["target"].map(MAPA_RESULTADO)
+    return pagina
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# EDA aggregates
+#
+# Each aggregate is cached separately per data version, so a collapsed EDA section costs nothing.
+# 'version' is the data version returned by 'resolver_datos_entrenamiento' and acts as cache key.
+#
+# Large training data files are aggregated with DuckDB (see 'motor_duckdb') when it is installed. Both engines
+# return the same small results, so the plotting functions do not depend on the engine.
+# ----------------------------------------------------------------------------------------------------------------------
+def usar_motor_duckdb(ruta_datos: str) -> bool:
+    """
+    Returns whether the EDA of a training data file is computed with DuckDB: it must be installed and the file
+    must be at least 'UMBRAL_MB_MOTOR_DUCKDB' MB.
+    """
+    return motor_duckdb.disponible() and (
+        os.path.getsize(ruta_datos) >= UMBRAL_MB_MOTOR_DUCKDB * 1024**2
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def acumular_estadisticas_eda(ruta_datos: str) -> AcumuladorEstadisticas:
+    """
+    Builds the statistics accumulator of the numeric EDA columns reading the training data in blocks of
+    'TAMANO_BLOQUE_EDA' rows, so the whole history is never loaded at once.
+
+    Args:
+        ruta_datos (str): Path of the training data CSV.
+
+    Returns:
+        AcumuladorEstadisticas: Accumulator with all the rows of the training data.
+    """
+    components_data = read_data("componentes.csv")
+    acumulador = None
+
+    for bloque in pd.read_csv(ruta_datos, chunksize=TAMANO_BLOQUE_EDA):
+        bloque = preprocesar_pedidos_eda(bloque, components_data)
+        if acumulador is None:
+            acumulador = AcumuladorEstadisticas(
+                bloque.select_dtypes(include="number").columns
+            )
+        acumulador.actualizar(bloque)
+
+    return acumulador
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_resource(max_entries=4, show_spinner=False)
+def calcular_estadisticas_eda(version: str, ruta_datos: str) -> AcumuladorEstadisticas:
+    """
+    Returns the statistics accumulator of the EDA data, built once per data version.
+    The accumulator is shared across sessions without copying it, so it must be treated as read-only.
+    """
+    return acumular_estadisticas_eda(ruta_datos)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_data(max_entries=4, show_spinner=False)
+def calcular_descripcion_eda(version: str, ruta_datos: str) -> pd.DataFrame:
+    """
+    Returns the statistical description of the numeric EDA columns, rounded to 2 decimals.
+    """
+    if usar_motor_duckdb(ruta_datos):
+        return motor_duckdb.describir(version, ruta_datos).round(2)
+    return calcular_estadisticas_eda(version, ruta_datos).describir().round(2)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_data(max_entries=4, show_spinner=False)
+def calcular_correlacion_eda(version: str, ruta_datos: str) -> pd.DataFrame:
+    """
+    Returns the correlation matrix of the numeric EDA columns, rounded to 2 decimals.
+    """
+    if usar_motor_duckdb(ruta_datos):
+        return motor_duckdb.correlacion(version, ruta_datos).round(2)
+    return calcular_estadisticas_eda(version, ruta_datos).correlacion().round(2)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_data(max_entries=4, show_spinner=False)
+def calcular_cubo_eda(version: str, ruta_datos: str) -> pd.DataFrame:
+    """
+    Returns the day x reactor x matcode defect cube of the training orders (see 'cubo_eda').
+    """
+    if usar_motor_duckdb(ruta_datos):
+        return motor_duckdb.cubo(version, ruta_datos)
+    return construir_cubo(cargar_pedidos(version, ruta_datos))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_data(max_entries=4, show_spinner=False)
+def calcular_conteo_target(version: str, ruta_datos: str) -> pd.Series:
+    """
+    Returns the value counts of the 'target' column.
+    """
+    if usar_motor_duckdb(ruta_datos):
+        return motor_duckdb.conteo_target(version, ruta_datos)
+    return cargar_pedidos(version, ruta_datos)["target"].value_counts()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_data(max_entries=4, show_spinner=False)
+def calcular_conteo_reactor(version: str, ruta_datos: str) -> pd.DataFrame:
+    """
+    Returns the number of orders per reactor and result, with columns 'reactor', 'resultado' and 'pedidos'.
+    """
+    if usar_motor_duckdb(ruta_datos):
+        return motor_duckdb.conteo_reactor(version, ruta_datos)
+    pedidos = cargar_pedidos(version, ruta_datos)
+    return (
+        pedidos.groupby(["reactor", pedidos["target"].map(MAPA_RESULTADO).rename("resultado")])
+        .size()
+        .reset_index(name="pedidos")
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_data(max_entries=16, show_spinner=False)
+def calcular_histograma_eda(
+    version: str, ruta_datos: str, variable: str, segmentar: bool
+) -> pd.DataFrame:
+    """
+    Returns the histogram of a numeric EDA column, by result if 'segmentar' (see 'eda_agregados.calcular_histograma').
+    """
+    if usar_motor_duckdb(ruta_datos):
+        return motor_duckdb.histograma(version, ruta_datos, variable, segmentar)
+    eda_data = cargar_datos_eda(version, ruta_datos)
+    return calcular_histograma(eda_data[variable], eda_data["resultado"] if segmentar else None)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_data(max_entries=16, show_spinner=False)
+def calcular_caja_eda(version: str, ruta_datos: str, variable: str) -> pd.DataFrame:
+    """
+    Returns the box plot statistics of a numeric EDA column by result (see 'eda_agregados.calcular_cuantiles_caja').
+    """
+    if usar_motor_duckdb(ruta_datos):
+        return motor_duckdb.cuantiles_caja(version, ruta_datos, variable)
+    eda_data = cargar_datos_eda(version, ruta_datos)
+    return calcular_cuantiles_caja(eda_data[variable], eda_data["resultado"])
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_data(max_entries=16, show_spinner=False)
+def calcular_densidad_eda(version: str, ruta_datos: str, x: str, y: str) -> tuple:
+    """
+    Returns the 2-D density grid of two numeric EDA columns by result (see 'eda_agregados.calcular_densidad_2d').
+    """
+    if usar_motor_duckdb(ruta_datos):
+        return motor_duckdb.densidad_2d(version, ruta_datos, x, y)
+    eda_data = cargar_datos_eda(version, ruta_datos)
+    return calcular_densidad_2d(eda_data[x], eda_data[y], eda_data["resultado"])
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_data(max_entries=16, show_spinner=False)
+def calcular_muestra_eda(version: str, ruta_datos: str, columnas: list[str]) -> pd.DataFrame:
+    """
+    Returns a sample of the given EDA columns and 'resultado' stratified by result
+    (see 'eda_agregados.muestreo_estratificado').
+    """
+    if usar_motor_duckdb(ruta_datos):
+        return motor_duckdb.muestra_estratificada(version, ruta_datos, columnas)
+    eda_data = cargar_datos_eda(version, ruta_datos)
+    return muestreo_estratificado(
+        eda_data[list(dict.fromkeys([*columnas, "resultado"]))], "resultado"
+    )
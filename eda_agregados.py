@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+from constants import MAX_PUNTOS_DISPERSION, NUM_BINS_DENSIDAD, NUM_BINS_HISTOGRAMA
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Agregaciones del EDA en el servidor
+#
+# Los gráficos del EDA no envían las filas al navegador sino el resultado de estas agregaciones, cuyo tamaño depende
+# del número de intervalos o de puntos de la muestra y no del número de filas. Todas las agregaciones se calculan
+# con operaciones vectorizadas de numpy sobre todos los grupos a la vez.
+# ----------------------------------------------------------------------------------------------------------------------
+def codificar_grupos(grupos: pd.Series | None, n_filas: int) -> tuple[np.ndarray, list]:
+    """
+    Convierte una serie de grupos en códigos enteros. Si no hay grupos, todas las filas son del grupo 'Todos'.
+
+    Returns:
+        tuple[np.ndarray, list]: Código de grupo de cada fila y nombres de los grupos.
+    """
+    if grupos is None:
+        return np.zeros(n_filas, dtype=int), ["Todos"]
+    codigos, nombres = pd.factorize(grupos, sort=True)
+    return codigos, list(nombres)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def calcular_bins(valores: np.ndarray, bordes: np.ndarray) -> np.ndarray:
+    """
+    Devuelve el índice de intervalo de cada valor, con el último intervalo cerrado como 'np.histogram'.
+    Los valores no finitos reciben el índice -1.
+    """
+    n_bins = len(bordes) - 1
+    indices = np.clip(np.searchsorted(bordes, valores, side="right") - 1, 0, n_bins - 1)
+    return np.where(np.isfinite(valores), indices, -1)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def calcular_histograma(
+    valores: pd.Series, grupos: pd.Series | None = None, bins: int = NUM_BINS_HISTOGRAMA
+) -> pd.DataFrame:
+    """
+    Calcula el histograma de una variable para cada grupo, con los mismos intervalos para todos los grupos.
+
+    Args:
+        valores (pd.Series): Valores de la variable.
+        grupos (pd.Series | None): Grupo de cada fila, por ejemplo el resultado de viscosidad.
+        bins (int): Número de intervalos.
+
+    Returns:
+        pd.DataFrame: Una fila por grupo e intervalo con las columnas 'grupo', 'inicio', 'fin', 'centro' y 'conteo'.
+    """
+    valores = valores.to_numpy(dtype=float)
+    codigos, nombres = codificar_grupos(grupos, len(valores))
+
+    finitos = np.isfinite(valores)
+    if not finitos.any():
+        return pd.DataFrame(columns=["grupo", "inicio", "fin", "centro", "conteo"])
+
+    bordes = np.histogram_bin_edges(valores[finitos], bins=bins)
+    indices = calcular_bins(valores, bordes)
+    validos = indices >= 0
+
+    # Un único bincount para todos los grupos: índice combinado grupo * n_bins + intervalo
+    conteos = np.bincount(
+        codigos[validos] * bins + indices[validos], minlength=len(nombres) * bins
+    ).reshape(len(nombres), bins)
+
+    return histograma_desde_conteos(bordes, conteos, nombres)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def histograma_desde_conteos(bordes: np.ndarray, conteos: np.ndarray, nombres: list) -> pd.DataFrame:
+    """
+    Construye el DataFrame de 'calcular_histograma' a partir de los bordes de los intervalos y los conteos
+    con forma (n_grupos, n_bins).
+    """
+    bins = len(bordes) - 1
+    return pd.DataFrame(
+        {
+            "grupo": np.repeat(nombres, bins),
+            "inicio": np.tile(bordes[:-1], len(nombres)),
+            "fin": np.tile(bordes[1:], len(nombres)),
+            "centro": np.tile((bordes[:-1] + bordes[1:]) / 2, len(nombres)),
+            "conteo": conteos.ravel(),
+        }
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def calcular_densidad_2d(
+    x: pd.Series, y: pd.Series, grupos: pd.Series | None = None, bins: int = NUM_BINS_DENSIDAD
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, list]:
+    """
+    Calcula una rejilla de densidad 2-D (conteo de filas por celda) para cada grupo.
+
+    Returns:
+        tuple: Centros de los intervalos de x, centros de los intervalos de y, conteos con forma
+        (n_grupos, bins_y, bins_x) y nombres de los grupos.
+    """
+    x = x.to_numpy(dtype=float)
+    y = y.to_numpy(dtype=float)
+    codigos, nombres = codificar_grupos(grupos, len(x))
+
+    finitos = np.isfinite(x) & np.isfinite(y)
+    bordes_x = np.histogram_bin_edges(x[finitos], bins=bins)
+    bordes_y = np.histogram_bin_edges(y[finitos], bins=bins)
+    indices_x = calcular_bins(x, bordes_x)
+    indices_y = calcular_bins(y, bordes_y)
+    validos = finitos & (indices_x >= 0) & (indices_y >= 0)
+
+    indice_combinado = (codigos[validos] * bins + indices_y[validos]) * bins + indices_x[validos]
+    conteos = np.bincount(indice_combinado, minlength=len(nombres) * bins * bins).reshape(
+        len(nombres), bins, bins
+    )
+
+    return (
+        (bordes_x[:-1] + bordes_x[1:]) / 2,
+        (bordes_y[:-1] + bordes_y[1:]) / 2,
+        conteos,
+        nombres,
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def calcular_cuantiles_caja(valores: pd.Series, grupos: pd.Series) -> pd.DataFrame:
+    """
+    Calcula los estadísticos de un diagrama de caja para cada grupo: cuartiles, mediana, media y bigotes
+    (valores extremos dentro de 1.5 veces el rango intercuartílico).
+
+    Returns:
+        pd.DataFrame: Una fila por grupo con las columnas 'q1', 'mediana', 'q3', 'media', 'inferior',
+        'superior' y 'conteo'.
+    """
+    df = pd.DataFrame({"valor": valores.to_numpy(dtype=float), "grupo": grupos.to_numpy()})
+    df = df[np.isfinite(df["valor"])]
+    agrupado = df.groupby("grupo")["valor"]
+
+    estadisticos = agrupado.quantile([0.25, 0.5, 0.75]).unstack()
+    estadisticos.columns = ["q1", "mediana", "q3"]
+    estadisticos["media"] = agrupado.mean()
+    estadisticos["conteo"] = agrupado.size()
+
+    # Los bigotes llegan al valor más extremo dentro de los límites de Tukey de su grupo
+    rango = estadisticos["q3"] - estadisticos["q1"]
+    limite_inferior = df["grupo"].map(estadisticos["q1"] - 1.5 * rango)
+    limite_superior = df["grupo"].map(estadisticos["q3"] + 1.5 * rango)
+    dentro = (df["valor"] >= limite_inferior) & (df["valor"] <= limite_superior)
+    estadisticos["inferior"] = df[dentro].groupby("grupo")["valor"].min()
+    estadisticos["superior"] = df[dentro].groupby("grupo")["valor"].max()
+
+    return estadisticos.reset_index()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def muestreo_estratificado(
+    df: pd.DataFrame, estrato: str, n_max: int = MAX_PUNTOS_DISPERSION, semilla: int = 0
+) -> pd.DataFrame:
+    """
+    Devuelve una muestra de como máximo 'n_max' filas que mantiene la proporción de cada estrato.
+    Los estratos pequeños conservan al menos una fila para que no desaparezcan de los gráficos.
+
+    Args:
+        df (pd.DataFrame): Datos a muestrear.
+        estrato (str): Columna que define los estratos, por ejemplo 'resultado'.
+        n_max (int): Número máximo de filas de la muestra.
+        semilla (int): Semilla para que la muestra sea estable entre ejecuciones.
+
+    Returns:
+        pd.DataFrame: La muestra, o el DataFrame completo si no supera 'n_max' filas.
+    """
+    if len(df) <= n_max:
+        return df
+
+    rng = np.random.default_rng(semilla)
+    tamanos = df[estrato].value_counts()
+    cuotas = np.maximum((tamanos * n_max / len(df)).round().astype(int), 1)
+
+    # Orden aleatorio dentro de cada estrato y nos quedamos con las primeras 'cuota' filas de cada uno
+    orden_aleatorio = pd.Series(rng.random(len(df)), index=df.index)
+    posicion = orden_aleatorio.groupby(df[estrato]).rank(method="first")
+
+    return df[posicion <= df[estrato].map(cuotas)]
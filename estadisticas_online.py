@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+from constants import CAPACIDAD_SKETCH_CUANTILES
+
+# Percentiles que muestra la descripción estadística, los mismos que 'DataFrame.describe'
+PERCENTILES_DESCRIPCION = [0.25, 0.5, 0.75]
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+class SketchCuantiles:
+    """
+    Sketch de cuantiles combinable basado en compactores, al estilo de KLL.
+
+    Los valores se guardan en niveles; un valor del nivel h representa 2**h valores originales. Cuando un nivel
+    supera la capacidad se ordena y la mitad de sus valores (los pares o los impares, al azar) sube al nivel
+    siguiente. Mientras no se llena el primer nivel los cuantiles son exactos; después el error de rango crece
+    con el número de niveles y decrece con la capacidad. Dos sketches se combinan juntando sus niveles.
+    """
+
+    def __init__(self, capacidad: int = CAPACIDAD_SKETCH_CUANTILES, semilla: int = 0):
+        self.capacidad = capacidad
+        self.niveles: list[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(semilla)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def actualizar(self, valores: np.ndarray) -> None:
+        """
+        Añade al sketch los valores finitos de un array.
+        """
+        valores = np.asarray(valores, dtype=float)
+        self.niveles[0] = np.concatenate([self.niveles[0], valores[np.isfinite(valores)]])
+        self._compactar()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def combinar(self, otro: "SketchCuantiles") -> None:
+        """
+        Añade a este sketch los valores resumidos en otro sketch.
+        """
+        for h, valores in enumerate(otro.niveles):
+            if h == len(self.niveles):
+                self.niveles.append(np.empty(0))
+            self.niveles[h] = np.concatenate([self.niveles[h], valores])
+        self._compactar()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def _compactar(self) -> None:
+        h = 0
+        while h < len(self.niveles):
+            nivel = self.niveles[h]
+            if len(nivel) > self.capacidad:
+                nivel = np.sort(nivel)
+                # Si el número de valores es impar, el último se queda en el nivel
+                n_pares = len(nivel) - len(nivel) % 2
+                promovidos = nivel[self._rng.integers(2) : n_pares : 2]
+                self.niveles[h] = nivel[n_pares:]
+                if h + 1 == len(self.niveles):
+                    self.niveles.append(np.empty(0))
+                self.niveles[h + 1] = np.concatenate([self.niveles[h + 1], promovidos])
+            h += 1
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def cuantiles(self, probabilidades: list[float]) -> np.ndarray:
+        """
+        Devuelve los cuantiles indicados con interpolación lineal, como 'Series.quantile'.
+        NaN si el sketch está vacío.
+        """
+        valores = np.concatenate(self.niveles)
+        if len(valores) == 0:
+            return np.full(len(probabilidades), np.nan)
+
+        pesos = np.concatenate(
+            [np.full(len(nivel), 2.0**h) for h, nivel in enumerate(self.niveles)]
+        )
+        orden = np.argsort(valores, kind="stable")
+        valores, pesos = valores[orden], pesos[orden]
+
+        # Cada valor ocupa 'peso' posiciones consecutivas de la serie original, lo situamos en el centro
+        acumulado = np.cumsum(pesos)
+        posiciones = acumulado - (pesos + 1) / 2
+        return np.interp(np.asarray(probabilidades) * (acumulado[-1] - 1), posiciones, valores)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+class AcumuladorEstadisticas:
+    """
+    Acumulador de estadísticas de un conjunto de columnas numéricas que se actualiza por bloques de filas.
+
+    Guarda, para cada pareja de columnas (i, j), el número de filas en las que ambas tienen valor, la media y la
+    suma de cuadrados centrada de i en esas filas y el co-momento de i y j. Los bloques se resumen con
+    operaciones matriciales de numpy y se combinan con las fórmulas de Welford y Chan, que son numéricamente
+    estables. La diagonal da las estadísticas de cada columna y la matriz completa la correlación con las
+    mismas filas que 'DataFrame.corr' (observaciones completas por parejas).
+
+    Dos acumuladores de las mismas columnas, calculados en bloques o procesos distintos, se combinan con
+    'combinar'. El acumulador se puede serializar con pickle.
+    """
+
+    def __init__(self, columnas: list[str]):
+        self.columnas = list(columnas)
+        n_columnas = len(self.columnas)
+        self.n = np.zeros((n_columnas, n_columnas))
+        self.media = np.zeros((n_columnas, n_columnas))
+        self.m2 = np.zeros((n_columnas, n_columnas))
+        self.comomento = np.zeros((n_columnas, n_columnas))
+        self.minimo = np.full(n_columnas, np.inf)
+        self.maximo = np.full(n_columnas, -np.inf)
+        self.sketches = [SketchCuantiles() for _ in self.columnas]
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def actualizar(self, df: pd.DataFrame) -> None:
+        """
+        Añade al acumulador las filas de un bloque. Los valores que faltan (NaN) se ignoran.
+
+        Args:
+            df (pd.DataFrame): Bloque de filas, debe contener todas las columnas del acumulador.
+        """
+        bloque = AcumuladorEstadisticas(self.columnas)
+        valores = df[self.columnas].to_numpy(dtype=float)
+        presentes = np.isfinite(valores)
+        if not presentes.any():
+            return
+
+        # Centramos el bloque en sus medias para que las sumas de cuadrados no pierdan precisión
+        conteo = presentes.sum(axis=0)
+        desplazamiento = np.where(presentes, valores, 0.0).sum(axis=0) / np.maximum(conteo, 1)
+        centrados = np.where(presentes, valores - desplazamiento, 0.0)
+        mascara = presentes.astype(float)
+
+        # Sumas sobre las filas en las que están presentes las dos columnas de cada pareja
+        n = mascara.T @ mascara
+        suma = centrados.T @ mascara
+        suma_cuadrados = (centrados**2).T @ mascara
+        suma_productos = centrados.T @ centrados
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bloque.n = n
+            bloque.media = np.where(n > 0, desplazamiento[:, np.newaxis] + suma / n, 0.0)
+            bloque.m2 = np.where(n > 0, suma_cuadrados - suma**2 / n, 0.0)
+            bloque.comomento = np.where(n > 0, suma_productos - suma * suma.T / n, 0.0)
+
+        bloque.minimo = np.where(presentes, valores, np.inf).min(axis=0)
+        bloque.maximo = np.where(presentes, valores, -np.inf).max(axis=0)
+        for sketch, columna in zip(bloque.sketches, valores.T):
+            sketch.actualizar(columna)
+
+        self.combinar(bloque)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def combinar(self, otro: "AcumuladorEstadisticas") -> None:
+        """
+        Añade a este acumulador las estadísticas de otro acumulador de las mismas columnas.
+
+        Raises:
+            ValueError: Si los acumuladores no tienen las mismas columnas.
+        """
+        if otro.columnas != self.columnas:
+            raise ValueError("Los acumuladores deben tener las mismas columnas")
+
+        n = self.n + otro.n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            peso = np.where(n > 0, self.n * otro.n / n, 0.0)
+            fraccion = np.where(n > 0, otro.n / n, 0.0)
+        delta = otro.media - self.media
+        self.media = self.media + delta * fraccion
+        # delta.T[i, j] es la diferencia de medias de la columna j en las filas de la pareja (i, j)
+        self.m2 = self.m2 + otro.m2 + delta**2 * peso
+        self.comomento = self.comomento + otro.comomento + delta * delta.T * peso
+        self.n = n
+
+        self.minimo = np.minimum(self.minimo, otro.minimo)
+        self.maximo = np.maximum(self.maximo, otro.maximo)
+        for sketch, sketch_otro in zip(self.sketches, otro.sketches):
+            sketch.combinar(sketch_otro)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def describir(self) -> pd.DataFrame:
+        """
+        Devuelve la descripción estadística con el mismo formato que 'DataFrame.describe'. La media, la desviación
+        típica, el mínimo y el máximo son exactos; los percentiles salen del sketch de cuantiles.
+        """
+        n = np.diag(self.n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            media = np.where(n > 0, np.diag(self.media), np.nan)
+            std = np.where(n > 1, np.sqrt(np.maximum(np.diag(self.m2), 0) / (n - 1)), np.nan)
+        cuantiles = np.array(
+            [sketch.cuantiles(PERCENTILES_DESCRIPCION) for sketch in self.sketches]
+        ).reshape(len(self.columnas), len(PERCENTILES_DESCRIPCION))
+
+        filas = {
+            "count": n,
+            "mean": media,
+            "std": std,
+            "min": np.where(n > 0, self.minimo, np.nan),
+        }
+        for p, valores in zip(PERCENTILES_DESCRIPCION, cuantiles.T):
+            filas[f"{p:.0%}"] = valores
+        filas["max"] = np.where(n > 0, self.maximo, np.nan)
+
+        return pd.DataFrame(filas, index=self.columnas).T
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def correlacion(self) -> pd.DataFrame:
+        """
+        Devuelve la matriz de correlación de Pearson, equivalente a 'DataFrame.corr' con observaciones completas
+        por parejas. NaN para las parejas con menos de dos filas o sin varianza.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlacion = self.comomento / np.sqrt(self.m2 * self.m2.T)
+        correlacion = np.where(self.n > 1, np.clip(correlacion, -1, 1), np.nan)
+        return pd.DataFrame(correlacion, index=self.columnas, columns=self.columnas)
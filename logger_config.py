@@ -1,7 +1,217 @@
+import contextlib
+import gzip
+import json
 import logging
 import os
+import queue
+import re
+import shutil
+import sys
+import threading
 import time
-from logging.handlers import TimedRotatingFileHandler
+import uuid
+from logging.handlers import QueueHandler
+
+from constants import (
+    CARPETA_LOGS,
+    COMPRIMIR_LOGS,
+    DIAS_RETENCION_LOGS,
+    INTERVALO_ESCRITURA_LOGS_S,
+    LOGS_JSON,
+    TAMANO_LOTE_LOGS,
+)
+
+# Un log de un día anterior solo se comprime si lleva este tiempo sin modificarse, por si otro proceso aún escribe
+# las últimas entradas del día
+ESPERA_COMPRESION_S = 300
+# Cada cuánto se comprimen y borran los logs antiguos
+INTERVALO_MANTENIMIENTO_S = 3600
+# Un bloqueo de compresión más antiguo es de un proceso que terminó a medias y se descarta
+CADUCIDAD_BLOQUEO_S = 3600
+PATRON_FICHERO_LOG = re.compile(r"(\d{4}-\d{2}-\d{2})\.log(\.gz)?")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Formato JSON
+# ----------------------------------------------------------------------------------------------------------------------
+class FormateadorJSON(logging.Formatter):
+    """
+    Formatea cada entrada como una línea JSON. La fecha y el nivel van primero, así el visor de logs reconoce
+    la cabecera de la entrada igual que en el formato de texto.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(
+            {
+                "fecha": self.formatTime(record),
+                "nivel": record.levelname,
+                "logger": record.name,
+                "proceso": record.process,
+                "mensaje": record.getMessage(),
+            },
+            ensure_ascii=False,
+        )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Escritura de ficheros
+# ----------------------------------------------------------------------------------------------------------------------
+class ManejadorFicheroDiario(logging.Handler):
+    """
+    Escribe cada entrada en el log del día de su fecha ('<carpeta>/<fecha>.log').
+
+    Los ficheros no se rotan renombrándolos: cada lote se escribe con una sola llamada en modo append, así varios
+    procesos pueden compartir la carpeta sin pisarse. Los logs de días anteriores se comprimen y se borran en
+    'mantener', con un fichero de bloqueo para que solo un proceso comprima cada log.
+    """
+
+    def __init__(self, carpeta: str):
+        super().__init__()
+        self.carpeta = carpeta
+        os.makedirs(carpeta, exist_ok=True)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def emit(self, record: logging.LogRecord) -> None:
+        self.escribir([record])
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def escribir(self, registros: list[logging.LogRecord]) -> None:
+        """
+        Escribe un lote de entradas, con una escritura por cada día que aparece en el lote.
+        """
+        textos_dia: dict[str, list[str]] = {}
+        for registro in registros:
+            try:
+                texto = self.format(registro)
+            except Exception:
+                self.handleError(registro)
+                continue
+            dia = time.strftime("%Y-%m-%d", time.localtime(registro.created))
+            textos_dia.setdefault(dia, []).append(texto + "\n")
+
+        for dia, textos in textos_dia.items():
+            descriptor = os.open(
+                os.path.join(self.carpeta, f"{dia}.log"), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644
+            )
+            try:
+                os.write(descriptor, "".join(textos).encode("utf-8"))
+            finally:
+                os.close(descriptor)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def mantener(self) -> None:
+        """
+        Borra los logs más antiguos que los días de retención y comprime con gzip los de días anteriores.
+        """
+        hoy = time.strftime("%Y-%m-%d")
+        limite = time.strftime("%Y-%m-%d", time.localtime(time.time() - DIAS_RETENCION_LOGS * 86400))
+
+        for nombre in os.listdir(self.carpeta):
+            fichero = PATRON_FICHERO_LOG.fullmatch(nombre)
+            if fichero is None or fichero[1] >= hoy:
+                continue
+
+            ruta = os.path.join(self.carpeta, nombre)
+            if fichero[1] < limite:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(ruta)
+            elif COMPRIMIR_LOGS and not fichero[2] and time.time() - os.path.getmtime(ruta) > ESPERA_COMPRESION_S:
+                self.comprimir(ruta)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def comprimir(self, ruta: str) -> None:
+        """
+        Comprime un log en '<ruta>.gz' y borra el original. Si el comprimido ya existe (otro proceso escribió
+        entradas tarde), las nuevas se añaden como un miembro gzip más.
+        """
+        bloqueo = f"{ruta}.lock"
+        try:
+            os.close(os.open(bloqueo, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            with contextlib.suppress(FileNotFoundError):
+                if time.time() - os.path.getmtime(bloqueo) > CADUCIDAD_BLOQUEO_S:
+                    os.remove(bloqueo)
+            return
+
+        try:
+            ruta_gz = f"{ruta}.gz"
+            ruta_temporal = f"{ruta_gz}.{uuid.uuid4().hex}.tmp"
+            if os.path.isfile(ruta_gz):
+                shutil.copyfile(ruta_gz, ruta_temporal)
+            with open(ruta, "rb") as f, gzip.open(ruta_temporal, "ab") as gz:
+                shutil.copyfileobj(f, gz)
+            os.replace(ruta_temporal, ruta_gz)
+            os.remove(ruta)
+        finally:
+            os.remove(bloqueo)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+class EscritorLogs:
+    """
+    Hilo en segundo plano que vacía la cola de logs y escribe las entradas por lotes.
+
+    El lote se cierra al llegar a 'TAMANO_LOTE_LOGS' entradas o 'INTERVALO_ESCRITURA_LOGS_S' segundos después de
+    su primera entrada. Así 'logger.info' en las páginas solo añade la entrada a la cola y no espera al disco.
+    """
+
+    def __init__(self, manejador: ManejadorFicheroDiario):
+        self.cola: queue.SimpleQueue = queue.SimpleQueue()
+        self.manejador = manejador
+        self._hilo = threading.Thread(target=self._ejecutar, name="escritor_logs", daemon=True)
+        self._proximo_mantenimiento = 0.0
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def iniciar(self) -> None:
+        self._hilo.start()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def detener(self) -> None:
+        if self._hilo.is_alive():
+            self.cola.put(None)
+            self._hilo.join()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def _ejecutar(self) -> None:
+        activo = True
+        while activo:
+            lote = [self.cola.get()]
+            limite = time.monotonic() + INTERVALO_ESCRITURA_LOGS_S
+            while len(lote) < TAMANO_LOTE_LOGS and (restante := limite - time.monotonic()) > 0:
+                try:
+                    lote.append(self.cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            # None es la señal de parada de 'detener'
+            if None in lote:
+                activo = False
+                lote = [registro for registro in lote if registro is not None]
+
+            try:
+                self.manejador.escribir(lote)
+                if time.monotonic() >= self._proximo_mantenimiento:
+                    self._proximo_mantenimiento = time.monotonic() + INTERVALO_MANTENIMIENTO_S
+                    self.manejador.mantener()
+            except OSError as e:
+                print(f"Error al escribir los logs: {e}", file=sys.stderr)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+class ManejadorCola(QueueHandler):
+    """
+    Añade las entradas a la cola del escritor. Al cerrarlo (al terminar el proceso con 'logging.shutdown' o al
+    reconfigurar el logger) se detiene el escritor después de escribir lo que quede en la cola.
+    """
+
+    def __init__(self, escritor: EscritorLogs):
+        super().__init__(escritor.cola)
+        self.escritor = escritor
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def close(self) -> None:
+        self.escritor.detener()
+        super().close()
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -16,9 +226,11 @@ def setup_logger():
 
     Pasos de la configuración:
     - Se crea un directorio 'logs' si no existe, para almacenar los archivos de registro.
-    - Se configura un manejador de archivos con rotación diaria, que mantiene los registros de los últimos 7 días.
-    - Se establece un formato para los mensajes de registro.
-    - Si la función se ejecuta más de una vez, se elimina el manejador de archivos anterior para evitar duplicaciones.
+    - Las entradas se añaden a una cola y un hilo en segundo plano las escribe por lotes en el log del día,
+      así el hilo de la petición no espera al disco.
+    - Se mantienen los registros de los últimos 'DIAS_RETENCION_LOGS' días, comprimidos salvo el de hoy.
+    - Se establece un formato para los mensajes de registro, de texto o JSON según 'LOGS_JSON'.
+    - Si la función se ejecuta más de una vez, se detiene el escritor anterior para evitar duplicaciones.
 
     Return:
     - logger: El objeto logger configurado, listo para ser utilizado en la aplicación.
@@ -28,33 +240,24 @@ def setup_logger():
     >>> logger.info("Mensaje de información")
     """
     logger = logging.getLogger("tomakeup_logger")
-    logger.setLevel(logging.DEBUG)  
-
-    # Creamos un directorio para los archivos de registro si no existe
-    log_directory = "logs"
-    os.makedirs(log_directory, exist_ok=True)
-
-    # Configuramos el manejador de archivos
-    log_filename = os.path.join(log_directory, time.strftime("%Y-%m-%d") + ".log")
-    handler = TimedRotatingFileHandler(
-        filename=log_filename,
-        when="midnight",
-        interval=1,
-        backupCount=7,
-        encoding="utf-8",
-        delay=False,
-        utc=False,
-    )
-
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-
-    # Eliminamos los manejadores anteriores si se ejecuta setup_logger() más de una vez
-    if len(logger.handlers) > 1:
-        logger.handlers.pop(0)
+    logger.setLevel(logging.DEBUG)
+
+    # Eliminamos los manejadores anteriores si se ejecuta setup_logger() más de una vez (p. ej. al recargar el
+    # módulo), escribiendo antes lo que quede en su cola
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    manejador = ManejadorFicheroDiario(CARPETA_LOGS)
+    if LOGS_JSON:
+        manejador.setFormatter(FormateadorJSON())
+    else:
+        manejador.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    escritor = EscritorLogs(manejador)
+    escritor.iniciar()
+
+    logger.addHandler(ManejadorCola(escritor))
 
     return logger
 
@@ -0,0 +1,193 @@
+import atexit
+import bisect
+import contextlib
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+import pandas as pd
+
+from constants import CARPETA_METRICAS, INTERVALO_EXPORTACION_METRICAS_S
+from logger_config import logger
+
+# Límites superiores de los buckets de los histogramas en milisegundos, crecen un 50% de uno a otro desde 0.1 ms
+# hasta unos 100 s. Los percentiles se estiman con un error relativo menor que la separación entre buckets
+LIMITES_HISTOGRAMA_MS = [round(0.1 * 1.5**i, 4) for i in range(35)]
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Métricas de latencia por etapa
+#
+# Cada etapa instrumentada con 'span' suma su duración a un histograma en memoria con buckets fijos, así registrar
+# una medida cuesta una búsqueda binaria y unos incrementos (unos pocos microsegundos), y la memoria no crece con el
+# número de medidas. El registro es del proceso ('registro_metricas', como el logger) y se comparte entre sesiones.
+# Se muestra en la página de administración y se exporta periódicamente en formato de texto de Prometheus.
+# ----------------------------------------------------------------------------------------------------------------------
+class HistogramaLatencias:
+    """
+    Histograma de latencias con los buckets de 'LIMITES_HISTOGRAMA_MS'.
+    """
+
+    def __init__(self):
+        # El último bucket recoge las medidas por encima del último límite
+        self.conteos = [0] * (len(LIMITES_HISTOGRAMA_MS) + 1)
+        self.n = 0
+        self.suma_ms = 0.0
+        self.maximo_ms = 0.0
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def observar(self, duracion_ms: float) -> None:
+        self.conteos[bisect.bisect_left(LIMITES_HISTOGRAMA_MS, duracion_ms)] += 1
+        self.n += 1
+        self.suma_ms += duracion_ms
+        self.maximo_ms = max(self.maximo_ms, duracion_ms)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def percentil(self, q: float) -> float:
+        """
+        Estima un percentil interpolando linealmente dentro del bucket que lo contiene.
+        """
+        objetivo = q * self.n
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            if conteo and acumulado + conteo >= objetivo:
+                inferior = LIMITES_HISTOGRAMA_MS[i - 1] if i > 0 else 0.0
+                superior = min(
+                    LIMITES_HISTOGRAMA_MS[i] if i < len(LIMITES_HISTOGRAMA_MS) else self.maximo_ms,
+                    self.maximo_ms,
+                )
+                return inferior + (superior - inferior) * (objetivo - acumulado) / conteo
+            acumulado += conteo
+        return self.maximo_ms
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+class RegistroMetricas:
+    """
+    Histogramas de latencia por etapa del proceso.
+
+    El fichero de Prometheus lo escribe un hilo en segundo plano cada 'INTERVALO_EXPORTACION_METRICAS_S' segundos
+    si ha habido medidas nuevas. El hilo arranca con la primera medida, así 'observar' nunca escribe en disco.
+    """
+
+    def __init__(self, ruta_prometheus: str):
+        self.ruta_prometheus = ruta_prometheus
+        self._histogramas: dict[str, HistogramaLatencias] = {}
+        self._lock = threading.Lock()
+        self._cambios = False
+        self._hilo: threading.Thread | None = None
+        # El fichero es del proceso, se borra al terminar para no dejar métricas de procesos que ya no existen
+        atexit.register(self._borrar_exportacion)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def observar(self, etapa: str, duracion_ms: float) -> None:
+        with self._lock:
+            histograma = self._histogramas.get(etapa)
+            if histograma is None:
+                histograma = self._histogramas[etapa] = HistogramaLatencias()
+            histograma.observar(duracion_ms)
+            self._cambios = True
+
+            if self._hilo is None:
+                self._hilo = threading.Thread(
+                    target=self._exportar_periodicamente, name="exportador_metricas", daemon=True
+                )
+                self._hilo.start()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def resumen(self) -> pd.DataFrame:
+        """
+        Devuelve una fila por etapa con el número de medidas, la media, los percentiles y el máximo en ms.
+        """
+        with self._lock:
+            filas = [
+                {
+                    "etapa": etapa,
+                    "n": histograma.n,
+                    "media": histograma.suma_ms / histograma.n,
+                    **{nombre: histograma.percentil(q) for nombre, q in PERCENTILES.items()},
+                    "max": histograma.maximo_ms,
+                }
+                for etapa, histograma in sorted(self._histogramas.items())
+            ]
+        return pd.DataFrame(filas, columns=["etapa", "n", "media", *PERCENTILES, "max"]).round(2)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def texto_prometheus(self) -> str:
+        """
+        Devuelve los histogramas en formato de texto de Prometheus, con las duraciones en segundos.
+        """
+        nombre = "tomakeup_etapa_duracion_segundos"
+        proceso = os.getpid()
+        lineas = [
+            f"# HELP {nombre} Duración de las etapas de la aplicación.",
+            f"# TYPE {nombre} histogram",
+        ]
+        with self._lock:
+            for etapa, histograma in sorted(self._histogramas.items()):
+                etiquetas = f'etapa="{etapa.replace(chr(34), chr(39))}",proceso="{proceso}"'
+                acumulado = 0
+                for limite, conteo in zip(LIMITES_HISTOGRAMA_MS, histograma.conteos):
+                    acumulado += conteo
+                    lineas.append(f'{nombre}_bucket{{{etiquetas},le="{limite / 1000:g}"}} {acumulado}')
+                lineas.append(f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {histograma.n}')
+                lineas.append(f"{nombre}_sum{{{etiquetas}}} {histograma.suma_ms / 1000:.6f}")
+                lineas.append(f"{nombre}_count{{{etiquetas}}} {histograma.n}")
+        return "\n".join(lineas) + "\n"
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def exportar(self) -> None:
+        """
+        Escribe el fichero de Prometheus. Se escribe en un fichero temporal que después sustituye al definitivo,
+        así el scraper nunca lee un fichero a medio escribir.
+        """
+        os.makedirs(os.path.dirname(self.ruta_prometheus), exist_ok=True)
+        ruta_temporal = f"{self.ruta_prometheus}.{uuid.uuid4().hex}.tmp"
+        with open(ruta_temporal, "w", encoding="utf-8") as f:
+            f.write(self.texto_prometheus())
+        os.replace(ruta_temporal, self.ruta_prometheus)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def reiniciar(self) -> None:
+        with self._lock:
+            self._histogramas.clear()
+            self._cambios = True
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def _exportar_periodicamente(self) -> None:
+        while True:
+            time.sleep(INTERVALO_EXPORTACION_METRICAS_S)
+            with self._lock:
+                cambios, self._cambios = self._cambios, False
+            if cambios:
+                try:
+                    self.exportar()
+                except OSError as e:
+                    logger.warning(f"Error al exportar las métricas: {e}")
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def _borrar_exportacion(self) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.ruta_prometheus)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@contextmanager
+def span(etapa: str) -> Iterator[None]:
+    """
+    Mide la duración de un bloque y la registra en el histograma de la etapa, también si el bloque falla.
+    Se puede usar como 'with span("etapa"):' o como decorador '@span("etapa")'.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro_metricas.observar(etapa, (time.perf_counter() - inicio) * 1000)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+registro_metricas = RegistroMetricas(os.path.join(CARPETA_METRICAS, f"tomakeup_{os.getpid()}.prom"))
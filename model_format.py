@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+
+import joblib
+import xgboost
+from xgboost import XGBClassifier
+
+from constants import RUTA_ESQUEMA, RUTA_MODELO, RUTA_MODELO_NATIVO
+from metricas import span
+
+# Versión del formato del fichero de esquema, se incrementa si cambia su estructura
+VERSION_ESQUEMA = 1
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Formato nativo del modelo
+#
+# El modelo se guarda con 'save_model' de XGBoost en formato UBJSON, que no depende de pickle ni de las versiones
+# exactas de xgboost y scikit-learn, junto con un pequeño JSON con el esquema de las variables de entrada.
+# Los modelos antiguos en formato joblib se siguen pudiendo cargar.
+# ----------------------------------------------------------------------------------------------------------------------
+def guardar_modelo_nativo(model: XGBClassifier, ruta_modelo: str, ruta_esquema: str) -> None:
+    """
+    Guarda el modelo en formato nativo de XGBoost y su esquema de variables en un JSON.
+
+    Args:
+        model (XGBClassifier): Modelo entrenado.
+        ruta_modelo (str): Ruta del fichero del modelo, la extensión '.ubj' indica el formato UBJSON.
+        ruta_esquema (str): Ruta del fichero JSON con el esquema de variables.
+    """
+    model.save_model(ruta_modelo)
+
+    esquema = {
+        "version_esquema": VERSION_ESQUEMA,
+        "features": [str(feature) for feature in model.feature_names_in_],
+        "clases": [int(clase) for clase in model.classes_],
+        "version_xgboost": xgboost.__version__,
+    }
+    with open(ruta_esquema, "w") as f:
+        json.dump(esquema, f, indent=2, ensure_ascii=False)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def cargar_modelo_nativo(ruta_modelo: str, ruta_esquema: str) -> XGBClassifier:
+    """
+    Carga un modelo guardado en formato nativo de XGBoost y comprueba que coincide con su esquema.
+
+    Args:
+        ruta_modelo (str): Ruta del fichero del modelo.
+        ruta_esquema (str): Ruta del fichero JSON con el esquema de variables.
+
+    Returns:
+        XGBClassifier: El modelo listo para usar 'predict_proba'.
+
+    Raises:
+        ValueError: Si las variables del modelo no coinciden con las del esquema.
+    """
+    with open(ruta_esquema) as f:
+        esquema = json.load(f)
+
+    model = XGBClassifier()
+    model.load_model(ruta_modelo)
+
+    if list(model.feature_names_in_) != esquema["features"]:
+        raise ValueError(
+            f"Las variables del modelo {ruta_modelo} no coinciden con su esquema"
+        )
+
+    return model
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@span("modelo.cargar_fichero")
+def cargar_modelo_fichero(ruta_modelo: str, ruta_esquema: str | None = None):
+    """
+    Carga un modelo según la extensión del fichero: '.joblib' para los modelos antiguos y formato nativo
+    de XGBoost en otro caso.
+    """
+    if ruta_modelo.endswith(".joblib"):
+        return joblib.load(ruta_modelo)
+    return cargar_modelo_nativo(ruta_modelo, ruta_esquema)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def migrar_modelo_joblib(
+    ruta_joblib: str = RUTA_MODELO,
+    ruta_modelo: str = RUTA_MODELO_NATIVO,
+    ruta_esquema: str = RUTA_ESQUEMA,
+) -> None:
+    """
+    Convierte un modelo guardado con joblib al formato nativo de XGBoost.
+
+    La conversión hay que ejecutarla con versiones de xgboost y scikit-learn capaces de leer el fichero joblib;
+    a partir de ese momento el modelo ya no depende de ellas.
+    """
+    model = joblib.load(ruta_joblib)
+    guardar_modelo_nativo(model, ruta_modelo, ruta_esquema)
+    print(
+        f"{ruta_joblib} ({os.path.getsize(ruta_joblib)} bytes) -> "
+        f"{ruta_modelo} ({os.path.getsize(ruta_modelo)} bytes)"
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Migra un modelo joblib al formato nativo de XGBoost"
+    )
+    parser.add_argument("--joblib", default=RUTA_MODELO)
+    parser.add_argument("--modelo", default=RUTA_MODELO_NATIVO)
+    parser.add_argument("--esquema", default=RUTA_ESQUEMA)
+    args = parser.parse_args()
+
+    migrar_modelo_joblib(args.joblib, args.modelo, args.esquema)
@@ -0,0 +1,11 @@
+from cache_lru import CacheLRU
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+class PoolModelos(CacheLRU):
+    """
+    Pool de modelos en memoria con política LRU y límite de memoria, compartido por todas las sesiones.
+    """
+
+    def __init__(self, memoria_maxima_bytes: int):
+        super().__init__(memoria_maxima_bytes, "modelos")
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+import joblib
+import streamlit as st
+
+from constants import (
+    ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO,
+    ARCHIVO_ESQUEMA,
+    ARCHIVO_METADATOS,
+    ARCHIVO_MODELO,
+    ARCHIVO_MODELO_JOBLIB,
+    ARCHIVO_VERSION_ACTUAL,
+    MEMORIA_MAXIMA_POOL_MB,
+    REGISTRO_FOLDER,
+    RUTA_DATOS_ENTRENAMIENTO_USUARIO,
+    RUTA_ESQUEMA,
+    RUTA_MODELO,
+    RUTA_MODELO_NATIVO,
+    RUTA_MODELO_USUARIO,
+    USUARIOS_FOLDER,
+)
+from logger_config import logger
+from model_format import cargar_modelo_fichero, guardar_modelo_nativo
+from model_pool import PoolModelos
+
+# Etiqueta de versión del modelo por defecto de 'static_data'
+VERSION_DEFECTO = "defecto"
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Registro de versiones del modelo
+#
+# Cada usuario tiene su propio registro en 'user_data/usuarios/<usuario>/registro'. Cada versión se guarda en un
+# directorio inmutable con el modelo, los datos de entrenamiento y un fichero de metadatos. La versión activa se
+# indica en el fichero 'ACTUAL', que solo se sustituye con 'os.replace', de modo que una predicción concurrente
+# siempre ve una versión completa.
+#
+# El registro compartido 'user_data/registro' (usuario None) contiene los modelos anteriores a los registros por
+# usuario y sirve de respaldo a los usuarios que aún no han publicado ningún modelo propio.
+# ----------------------------------------------------------------------------------------------------------------------
+def calcular_hash_fichero(ruta_fichero: str) -> str:
+    """
+    Calcula el hash SHA-256 de un fichero leyéndolo por bloques.
+
+    Args:
+        ruta_fichero (str): Ruta del fichero.
+
+    Returns:
+        str: Hash SHA-256 en hexadecimal.
+    """
+    sha256 = hashlib.sha256()
+    with open(ruta_fichero, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(bloque)
+    return sha256.hexdigest()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def calcular_hash_datos(datos: memoryview | bytes) -> str:
+    """
+    Calcula el hash SHA-256 de unos datos en memoria, p. ej. el buffer de un fichero subido, sin copiarlos.
+    Coincide con 'calcular_hash_fichero' del fichero con esos datos.
+    """
+    return hashlib.sha256(datos).hexdigest()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def ruta_registro(usuario: str | None) -> str:
+    """
+    Devuelve el directorio del registro de un usuario, o el registro compartido si el usuario es None.
+
+    Raises:
+        ValueError: Si el nombre de usuario no es válido como nombre de directorio.
+    """
+    if usuario is None:
+        return REGISTRO_FOLDER
+    if not re.fullmatch(r"\w[\w.-]*", usuario):
+        raise ValueError(f"Nombre de usuario no válido: {usuario}")
+    return os.path.join(USUARIOS_FOLDER, usuario, "registro")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def ruta_version(usuario: str | None, version_id: str) -> str:
+    """
+    Devuelve el directorio de una versión del registro de un usuario.
+    """
+    return os.path.join(ruta_registro(usuario), version_id)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def publicar_version(
+    usuario: str | None,
+    model,
+    datos: str | memoryview | bytes,
+    parametros: dict,
+    metricas: dict,
+) -> str:
+    """
+    Publica una nueva versión del modelo en el registro del usuario y la activa.
+
+    El modelo, los datos y los metadatos se escriben primero en un directorio temporal dentro del registro,
+    que después se renombra al directorio definitivo. Por último se sustituye el puntero a la versión activa.
+
+    Args:
+        usuario (str | None): Usuario propietario del modelo.
+        model: El modelo de XGBoost entrenado.
+        datos (str | memoryview | bytes): Ruta del CSV con los datos de entrenamiento, o su contenido en
+            memoria (p. ej. el buffer de un fichero subido), que se escribe directamente en la versión.
+        parametros (dict): Parámetros de entrenamiento del modelo.
+        metricas (dict): Métricas obtenidas en el entrenamiento.
+
+    Returns:
+        str: Identificador de la versión publicada.
+    """
+    carpeta_registro = ruta_registro(usuario)
+    os.makedirs(carpeta_registro, exist_ok=True)
+
+    # El identificador ordena las versiones cronológicamente
+    version_id = f"{datetime.now():%Y%m%d-%H%M%S-%f}"
+    ruta_staging = tempfile.mkdtemp(prefix=".staging-", dir=carpeta_registro)
+
+    try:
+        ruta_datos_version = os.path.join(
+            ruta_staging, ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO
+        )
+        if isinstance(datos, str):
+            shutil.copyfile(datos, ruta_datos_version)
+            hash_datos = calcular_hash_fichero(ruta_datos_version)
+        else:
+            with open(ruta_datos_version, "wb") as f:
+                f.write(datos)
+            hash_datos = calcular_hash_datos(datos)
+        guardar_modelo_nativo(
+            model,
+            os.path.join(ruta_staging, ARCHIVO_MODELO),
+            os.path.join(ruta_staging, ARCHIVO_ESQUEMA),
+        )
+
+        metadatos = {
+            "version": version_id,
+            "usuario": usuario,
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "parametros": parametros,
+            "metricas": metricas,
+            "hash_datos": hash_datos,
+        }
+        with open(os.path.join(ruta_staging, ARCHIVO_METADATOS), "w") as f:
+            json.dump(metadatos, f, indent=2, ensure_ascii=False)
+
+        os.rename(ruta_staging, ruta_version(usuario, version_id))
+    except Exception:
+        shutil.rmtree(ruta_staging, ignore_errors=True)
+        raise
+
+    activar_version(usuario, version_id)
+    logger.info(f"Publicada la versión {version_id} del modelo de {usuario}")
+
+    return version_id
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def activar_version(usuario: str | None, version_id: str) -> None:
+    """
+    Activa una versión existente del registro de un usuario. Sirve tanto para publicar como para volver a una
+    versión anterior sin necesidad de reentrenar.
+
+    Args:
+        usuario (str | None): Usuario propietario del registro.
+        version_id (str): Identificador de la versión a activar.
+
+    Raises:
+        FileNotFoundError: Si la versión no existe en el registro.
+    """
+    if not os.path.isfile(
+        os.path.join(ruta_version(usuario, version_id), ARCHIVO_METADATOS)
+    ):
+        raise FileNotFoundError(f"No existe la versión {version_id} del modelo")
+
+    # Escribimos el puntero en un fichero temporal y lo sustituimos de forma atómica
+    ruta_puntero = os.path.join(ruta_registro(usuario), ARCHIVO_VERSION_ACTUAL)
+    ruta_temporal = f"{ruta_puntero}.{uuid.uuid4().hex}.tmp"
+    with open(ruta_temporal, "w") as f:
+        f.write(version_id)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ruta_temporal, ruta_puntero)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def obtener_version_actual(usuario: str | None) -> str | None:
+    """
+    Devuelve el identificador de la versión activa del registro de un usuario o None si no tiene ninguna.
+    """
+    try:
+        with open(os.path.join(ruta_registro(usuario), ARCHIVO_VERSION_ACTUAL)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def resolver_version(usuario: str | None) -> tuple[str | None, str | None]:
+    """
+    Determina qué modelo usa un usuario: su versión activa, la versión activa del registro compartido
+    o, si no hay ninguna, el modelo por defecto.
+
+    Returns:
+        tuple[str | None, str | None]: Propietario del registro y versión, (None, None) para el modelo por defecto.
+    """
+    if usuario is not None:
+        version_id = obtener_version_actual(usuario)
+        if version_id is not None:
+            return usuario, version_id
+
+    return None, obtener_version_actual(None)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def etiqueta_version(propietario: str | None, version_id: str | None) -> str:
+    """
+    Devuelve un identificador legible y único de la versión, apto para usarse como clave de caché.
+    """
+    if version_id is None:
+        return VERSION_DEFECTO
+    return f"{propietario or 'compartido'}/{version_id}"
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def listar_versiones(usuario: str | None) -> list[dict]:
+    """
+    Devuelve los metadatos de todas las versiones del registro de un usuario, de la más reciente a la más antigua.
+    """
+    carpeta_registro = ruta_registro(usuario)
+    if not os.path.isdir(carpeta_registro):
+        return []
+
+    versiones = []
+    for nombre in os.listdir(carpeta_registro):
+        ruta_metadatos = os.path.join(carpeta_registro, nombre, ARCHIVO_METADATOS)
+        # Los directorios temporales de publicaciones en curso no tienen metadatos
+        if nombre.startswith(".") or not os.path.isfile(ruta_metadatos):
+            continue
+        with open(ruta_metadatos) as f:
+            versiones.append(json.load(f))
+
+    return sorted(versiones, key=lambda v: v["version"], reverse=True)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_resource
+def obtener_pool_modelos() -> PoolModelos:
+    """
+    Devuelve el pool de modelos del proceso, compartido por todas las sesiones.
+    """
+    return PoolModelos(MEMORIA_MAXIMA_POOL_MB * 1024**2)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def rutas_modelo(propietario: str | None, version_id: str | None) -> tuple[str, str | None]:
+    """
+    Devuelve la ruta del modelo de una versión y la de su esquema. Se prefiere el formato nativo de XGBoost y, si
+    no existe, se usa el joblib, que no tiene esquema.
+    """
+    if version_id is None:
+        ruta_modelo, ruta_esquema = RUTA_MODELO_NATIVO, RUTA_ESQUEMA
+        ruta_joblib = RUTA_MODELO
+    else:
+        carpeta_version = ruta_version(propietario, version_id)
+        ruta_modelo = os.path.join(carpeta_version, ARCHIVO_MODELO)
+        ruta_esquema = os.path.join(carpeta_version, ARCHIVO_ESQUEMA)
+        ruta_joblib = os.path.join(carpeta_version, ARCHIVO_MODELO_JOBLIB)
+
+    if not os.path.isfile(ruta_modelo):
+        return ruta_joblib, None
+    return ruta_modelo, ruta_esquema
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def cargar_modelo(usuario: str | None) -> tuple:
+    """
+    Devuelve el modelo que usa el usuario y la etiqueta de su versión.
+
+    Como las versiones son inmutables, los modelos se guardan en el pool por su versión y solo se leen de disco
+    la primera vez que se usan o después de ser expulsados. Se prefiere el formato nativo de XGBoost y, si no
+    existe, se usa el joblib.
+
+    Returns:
+        tuple: El modelo y la etiqueta de la versión.
+    """
+    propietario, version_id = resolver_version(usuario)
+
+    # Los ficheros del modelo solo se consultan al cargarlo, un acierto del pool no los toca. El tamaño en
+    # disco del modelo es una buena estimación de la memoria que ocupa el booster
+    etiqueta = etiqueta_version(propietario, version_id)
+    modelo = obtener_pool_modelos().obtener(
+        etiqueta,
+        lambda: cargar_modelo_fichero(*rutas_modelo(propietario, version_id)),
+        lambda _: os.path.getsize(rutas_modelo(propietario, version_id)[0]),
+    )
+
+    return modelo, etiqueta
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def migrar_modelo_legado() -> None:
+    """
+    Publica en el registro compartido el modelo y los datos de usuario guardados con el formato anterior
+    ('user_data/xgb_viscosity.joblib'), para no perderlos al actualizar la aplicación.
+    """
+    if obtener_version_actual(None) is not None:
+        return
+    if not (
+        os.path.isfile(RUTA_MODELO_USUARIO)
+        and os.path.isfile(RUTA_DATOS_ENTRENAMIENTO_USUARIO)
+    ):
+        return
+
+    publicar_version(
+        None,
+        joblib.load(RUTA_MODELO_USUARIO),
+        RUTA_DATOS_ENTRENAMIENTO_USUARIO,
+        parametros={},
+        metricas={},
+    )
+    os.remove(RUTA_MODELO_USUARIO)
+    os.remove(RUTA_DATOS_ENTRENAMIENTO_USUARIO)
@@ -0,0 +1,416 @@
+import contextlib
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from constants import (
+    CAPACIDAD_REACTORES,
+    CARPETA_PARQUET_EDA,
+    MAPA_RESULTADO,
+    MAX_PUNTOS_DISPERSION,
+    NUM_BINS_DENSIDAD,
+    NUM_BINS_HISTOGRAMA,
+    TAMANO_BLOQUE_EDA,
+    VERSIONES_PARQUET_EDA,
+)
+from eda_agregados import histograma_desde_conteos
+
+try:
+    import duckdb
+except ImportError:  # DuckDB es opcional, sin él todo el EDA se calcula con pandas
+    duckdb = None
+
+# Percentiles de la descripción estadística, los mismos que 'DataFrame.describe'
+PERCENTILES_DESCRIPCION = [0.25, 0.5, 0.75]
+TIPOS_NUMERICOS = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "FLOAT", "DOUBLE", "DECIMAL")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Motor del EDA con DuckDB para históricos grandes
+#
+# Los datos de entrenamiento se convierten una vez por versión a ficheros Parquet en 'CARPETA_PARQUET_EDA'. Las
+# consultas se ejecutan en paralelo en todos los núcleos y leyendo solo las columnas que necesitan, y devuelven
+# resultados pequeños con el mismo formato que las funciones de pandas de 'data_repo' y 'eda_agregados', de modo
+# que los gráficos no distinguen qué motor los ha calculado.
+# ----------------------------------------------------------------------------------------------------------------------
+def disponible() -> bool:
+    """
+    Indica si DuckDB está instalado.
+    """
+    return duckdb is not None
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def columna(nombre: str) -> str:
+    """
+    Devuelve el nombre de una columna entrecomillado para SQL, algunos componentes tienen puntos en el nombre.
+    """
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def literal(valor: str) -> str:
+    """
+    Devuelve una cadena como literal de SQL.
+    """
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def ruta_parquet(version: str) -> str:
+    """
+    Devuelve la carpeta con los ficheros Parquet de una versión de los datos.
+    """
+    return os.path.join(CARPETA_PARQUET_EDA, re.sub(r"[^\w.-]", "_", version))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def convertir_a_parquet(version: str, ruta_datos: str) -> str:
+    """
+    Convierte los datos de entrenamiento de una versión a Parquet si no se han convertido antes.
+
+    DuckDB escribe un fichero por hilo con grupos de 'TAMANO_BLOQUE_EDA' filas. La conversión se hace en una
+    carpeta temporal que después se renombra, así nunca se leen ficheros a medio escribir. Tras convertir una
+    versión nueva se borran las copias que no están entre las 'VERSIONES_PARQUET_EDA' usadas más recientemente.
+
+    Returns:
+        str: Carpeta con los ficheros Parquet.
+    """
+    carpeta = ruta_parquet(version)
+    if os.path.isdir(carpeta):
+        # La fecha de modificación de la carpeta indica cuándo se usó por última vez
+        os.utime(carpeta)
+        return carpeta
+
+    os.makedirs(CARPETA_PARQUET_EDA, exist_ok=True)
+    carpeta_temporal = tempfile.mkdtemp(prefix=".staging-", dir=CARPETA_PARQUET_EDA)
+    try:
+        with duckdb.connect() as con:
+            con.execute(
+                f"COPY (SELECT * FROM read_csv_auto({literal(ruta_datos)})) "
+                f"TO {literal(carpeta_temporal)} "
+                f"(FORMAT PARQUET, PER_THREAD_OUTPUT TRUE, ROW_GROUP_SIZE {TAMANO_BLOQUE_EDA}, OVERWRITE TRUE)"
+            )
+        os.rename(carpeta_temporal, carpeta)
+    except OSError:
+        # Otra sesión ha terminado antes la misma conversión
+        shutil.rmtree(carpeta_temporal, ignore_errors=True)
+        if not os.path.isdir(carpeta):
+            raise
+    except Exception:
+        shutil.rmtree(carpeta_temporal, ignore_errors=True)
+        raise
+
+    borrar_versiones_antiguas()
+    return carpeta
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def borrar_versiones_antiguas() -> None:
+    """
+    Borra las copias en Parquet de las versiones de los datos que no están entre las 'VERSIONES_PARQUET_EDA'
+    usadas más recientemente. Las conversiones a medio hacer (carpetas '.staging-') no se tocan.
+    """
+    carpetas = []
+    for nombre in os.listdir(CARPETA_PARQUET_EDA):
+        ruta = os.path.join(CARPETA_PARQUET_EDA, nombre)
+        if not nombre.startswith(".") and os.path.isdir(ruta):
+            with contextlib.suppress(FileNotFoundError):
+                carpetas.append((os.path.getmtime(ruta), ruta))
+
+    for _, ruta in sorted(carpetas, reverse=True)[VERSIONES_PARQUET_EDA:]:
+        shutil.rmtree(ruta, ignore_errors=True)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def conectar(version: str, ruta_datos: str):
+    """
+    Abre una conexión en memoria con las vistas 'pedidos' (los datos de entrenamiento) y 'eda' (los pedidos
+    unidos con los componentes, con las mismas columnas y en el mismo orden que 'preprocesar_datos_eda' más
+    'resultado').
+    """
+    carpeta = convertir_a_parquet(version, ruta_datos)
+    con = duckdb.connect()
+
+    capacidades = ", ".join(
+        f"({literal(reactor)}, {capacidad})" for reactor, capacidad in CAPACIDAD_REACTORES.items()
+    )
+    resultados = " ".join(
+        f"WHEN {target} THEN {literal(resultado)}" for target, resultado in MAPA_RESULTADO.items()
+    )
+
+    con.execute(
+        f"CREATE VIEW pedidos AS SELECT * FROM read_parquet({literal(os.path.join(carpeta, '*.parquet'))})"
+    )
+    con.execute(
+        f"CREATE VIEW capacidades AS SELECT * FROM (VALUES {capacidades}) AS c(reactor, capacidad_reactor)"
+    )
+    con.execute(
+        "CREATE VIEW componentes AS SELECT * FROM read_csv_auto('static_data/componentes.csv')"
+    )
+    con.execute(
+        f"""
+        CREATE VIEW eda AS
+        SELECT
+            p.* REPLACE (CAST(p.orden AS VARCHAR) AS orden, CAST(p.matcode AS VARCHAR) AS matcode),
+            c.capacidad_reactor,
+            round(p.cantidad / c.capacidad_reactor * 100, 2) AS grado_llenado,
+            m.* EXCLUDE (material),
+            CASE p.target {resultados} END AS resultado
+        FROM pedidos p
+        LEFT JOIN capacidades c ON p.reactor = c.reactor
+        LEFT JOIN componentes m ON p.matcode = m.material
+        """
+    )
+    return con
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def columnas_numericas(con) -> list[str]:
+    """
+    Devuelve las columnas numéricas de la vista 'eda', en su orden.
+    """
+    tipos = con.execute("SELECT column_name, column_type FROM (DESCRIBE eda)").fetchall()
+    return [nombre for nombre, tipo in tipos if tipo.startswith(TIPOS_NUMERICOS)]
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def describir(version: str, ruta_datos: str) -> pd.DataFrame:
+    """
+    Calcula la descripción estadística de las columnas numéricas con el formato de 'DataFrame.describe',
+    en una única pasada sobre los datos.
+    """
+    with conectar(version, ruta_datos) as con:
+        columnas = columnas_numericas(con)
+        expresiones = []
+        for nombre in columnas:
+            c = columna(nombre)
+            expresiones += [
+                f"count({c})",
+                f"avg({c})",
+                f"stddev_samp({c})",
+                f"min({c})",
+                *[f"quantile_cont({c}, {p})" for p in PERCENTILES_DESCRIPCION],
+                f"max({c})",
+            ]
+        fila = con.execute(f"SELECT {', '.join(expresiones)} FROM eda").fetchone()
+
+    indice = ["count", "mean", "std", "min", *[f"{p:.0%}" for p in PERCENTILES_DESCRIPCION], "max"]
+    valores = np.array([np.nan if v is None else float(v) for v in fila]).reshape(len(columnas), len(indice))
+    return pd.DataFrame(valores.T, index=indice, columns=columnas)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def correlacion(version: str, ruta_datos: str) -> pd.DataFrame:
+    """
+    Calcula la matriz de correlación de Pearson de las columnas numéricas, con observaciones completas por parejas
+    como 'DataFrame.corr'.
+    """
+    with conectar(version, ruta_datos) as con:
+        columnas = columnas_numericas(con)
+        parejas = [(i, j) for i in range(len(columnas)) for j in range(i, len(columnas))]
+        expresiones = [
+            f"corr({columna(columnas[i])}, {columna(columnas[j])})" for i, j in parejas
+        ]
+        fila = con.execute(f"SELECT {', '.join(expresiones)} FROM eda").fetchone()
+
+    matriz = np.full((len(columnas), len(columnas)), np.nan)
+    for (i, j), valor in zip(parejas, fila):
+        if valor is not None:
+            matriz[i, j] = matriz[j, i] = valor
+    return pd.DataFrame(matriz, index=columnas, columns=columnas)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def conteo_target(version: str, ruta_datos: str) -> pd.Series:
+    """
+    Cuenta los pedidos de cada valor de 'target', con el formato de 'Series.value_counts'.
+    """
+    with conectar(version, ruta_datos) as con:
+        conteo = con.execute(
+            "SELECT target, count(*) AS count FROM pedidos GROUP BY target ORDER BY count DESC"
+        ).df()
+    return conteo.set_index("target")["count"]
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def conteo_reactor(version: str, ruta_datos: str) -> pd.DataFrame:
+    """
+    Cuenta los pedidos por reactor y resultado, con las columnas 'reactor', 'resultado' y 'pedidos'.
+    """
+    with conectar(version, ruta_datos) as con:
+        return con.execute(
+            "SELECT reactor, resultado, count(*) AS pedidos FROM eda GROUP BY ALL ORDER BY ALL"
+        ).df()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def cubo(version: str, ruta_datos: str) -> pd.DataFrame:
+    """
+    Construye el cubo de defectos por día, reactor y matcode con el formato de 'cubo_eda.construir_cubo'.
+    """
+    with conectar(version, ruta_datos) as con:
+        return con.execute(
+            """
+            SELECT
+                date_trunc('day', CAST(p.fecha AS TIMESTAMP)) AS dia,
+                p.reactor,
+                p.matcode,
+                count(*) AS pedidos,
+                sum(p.target) AS defectuosos,
+                sum(p.cantidad) AS cantidad,
+                sum(p.cantidad / c.capacidad_reactor * 100) AS grado_llenado
+            FROM pedidos p
+            LEFT JOIN capacidades c ON p.reactor = c.reactor
+            GROUP BY ALL
+            ORDER BY ALL
+            """
+        ).df()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def histograma(
+    version: str, ruta_datos: str, variable: str, segmentar: bool, bins: int = NUM_BINS_HISTOGRAMA
+) -> pd.DataFrame:
+    """
+    Calcula el histograma de una variable, opcionalmente por resultado, con el formato de
+    'eda_agregados.calcular_histograma'.
+    """
+    v = columna(variable)
+    grupo = "resultado" if segmentar else "'Todos'"
+
+    with conectar(version, ruta_datos) as con:
+        minimo, maximo = con.execute(
+            f"SELECT min({v}), max({v}) FROM eda WHERE isfinite({v})"
+        ).fetchone()
+        if minimo is None:
+            return pd.DataFrame(columns=["grupo", "inicio", "fin", "centro", "conteo"])
+
+        bordes = np.histogram_bin_edges([minimo, maximo], bins=bins)
+        ancho = bordes[1] - bordes[0]
+        conteos = con.execute(
+            f"""
+            SELECT {grupo} AS grupo,
+                   least(greatest(floor(({v} - {bordes[0]}) / {ancho}), 0), {bins - 1}) AS intervalo,
+                   count(*) AS conteo
+            FROM eda WHERE isfinite({v})
+            GROUP BY ALL
+            """
+        ).df()
+
+    nombres = sorted(conteos["grupo"].unique())
+    matriz = np.zeros((len(nombres), bins), dtype=int)
+    matriz[
+        conteos["grupo"].map({nombre: i for i, nombre in enumerate(nombres)}),
+        conteos["intervalo"].astype(int),
+    ] = conteos["conteo"]
+    return histograma_desde_conteos(bordes, matriz, nombres)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def densidad_2d(
+    version: str, ruta_datos: str, x: str, y: str, bins: int = NUM_BINS_DENSIDAD
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, list]:
+    """
+    Calcula la rejilla de densidad 2-D por resultado con el formato de 'eda_agregados.calcular_densidad_2d'.
+    """
+    cx, cy = columna(x), columna(y)
+    finitos = f"isfinite({cx}) AND isfinite({cy})"
+
+    with conectar(version, ruta_datos) as con:
+        min_x, max_x, min_y, max_y = con.execute(
+            f"SELECT min({cx}), max({cx}), min({cy}), max({cy}) FROM eda WHERE {finitos}"
+        ).fetchone()
+        bordes_x = np.histogram_bin_edges([min_x or 0, max_x or 0], bins=bins)
+        bordes_y = np.histogram_bin_edges([min_y or 0, max_y or 0], bins=bins)
+        intervalo_x = (
+            f"least(greatest(floor(({cx} - {bordes_x[0]}) / {bordes_x[1] - bordes_x[0]}), 0), {bins - 1})"
+        )
+        intervalo_y = (
+            f"least(greatest(floor(({cy} - {bordes_y[0]}) / {bordes_y[1] - bordes_y[0]}), 0), {bins - 1})"
+        )
+        conteos = con.execute(
+            f"""
+            SELECT resultado AS grupo, {intervalo_y} AS iy, {intervalo_x} AS ix, count(*) AS conteo
+            FROM eda WHERE {finitos}
+            GROUP BY ALL
+            """
+        ).df()
+
+    nombres = sorted(conteos["grupo"].unique())
+    matriz = np.zeros((len(nombres), bins, bins), dtype=int)
+    matriz[
+        conteos["grupo"].map({nombre: i for i, nombre in enumerate(nombres)}),
+        conteos["iy"].astype(int),
+        conteos["ix"].astype(int),
+    ] = conteos["conteo"]
+
+    return (
+        (bordes_x[:-1] + bordes_x[1:]) / 2,
+        (bordes_y[:-1] + bordes_y[1:]) / 2,
+        matriz,
+        nombres,
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def cuantiles_caja(version: str, ruta_datos: str, variable: str) -> pd.DataFrame:
+    """
+    Calcula los estadísticos del diagrama de caja de una variable por resultado con el formato de
+    'eda_agregados.calcular_cuantiles_caja'.
+    """
+    v = columna(variable)
+    with conectar(version, ruta_datos) as con:
+        return con.execute(
+            f"""
+            WITH datos AS (
+                SELECT resultado AS grupo, CAST({v} AS DOUBLE) AS valor FROM eda WHERE isfinite({v})
+            ),
+            estadisticos AS (
+                SELECT grupo,
+                       quantile_cont(valor, 0.25) AS q1,
+                       quantile_cont(valor, 0.5) AS mediana,
+                       quantile_cont(valor, 0.75) AS q3,
+                       avg(valor) AS media,
+                       count(*) AS conteo
+                FROM datos GROUP BY grupo
+            )
+            SELECT e.grupo, e.q1, e.mediana, e.q3, e.media, e.conteo,
+                   min(d.valor) AS inferior, max(d.valor) AS superior
+            FROM estadisticos e
+            JOIN datos d ON d.grupo = e.grupo
+                AND d.valor BETWEEN e.q1 - 1.5 * (e.q3 - e.q1) AND e.q3 + 1.5 * (e.q3 - e.q1)
+            GROUP BY ALL
+            ORDER BY e.grupo
+            """
+        ).df()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def muestra_estratificada(
+    version: str, ruta_datos: str, columnas: list[str], n_max: int = MAX_PUNTOS_DISPERSION
+) -> pd.DataFrame:
+    """
+    Devuelve una muestra de las columnas indicadas y 'resultado' de como máximo 'n_max' filas que mantiene la
+    proporción de cada resultado, como 'eda_agregados.muestreo_estratificado'. La muestra es estable entre
+    ejecuciones porque se ordena por un hash del número de orden.
+    """
+    seleccion = ", ".join(columna(c) for c in dict.fromkeys([*columnas, "resultado"]))
+    with conectar(version, ruta_datos) as con:
+        return con.execute(
+            f"""
+            WITH numerados AS (
+                SELECT {seleccion},
+                       count(*) OVER () AS total,
+                       count(*) OVER (PARTITION BY resultado) AS tamano,
+                       row_number() OVER (PARTITION BY resultado ORDER BY hash(orden)) AS posicion
+                FROM eda
+            )
+            SELECT {seleccion} FROM numerados
+            WHERE total <= {n_max} OR posicion <= greatest(round(tamano * {n_max} / total), 1)
+            """
+        ).df()
@@ -0,0 +1,150 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from constants import MAX_LOTES_DIVISION, PASO_DIVISION_KG
+from reactores import (
+    CAPACIDADES,
+    crear_matriz_features,
+    indices_reactores,
+    predecir_probabilidades,
+)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Optimizador de división de pedidos en lotes
+#
+# La probabilidad de que todos los lotes salgan bien es el producto de (1 - p) de cada lote, así que minimizar la
+# probabilidad combinada de viscosidad incorrecta equivale a minimizar la suma de -log(1 - p). Con las cantidades
+# discretizadas en pasos de 'PASO_DIVISION_KG' el problema es una mochila que se resuelve con programación
+# dinámica. Todos los lotes candidatos (reactor, cantidad) se evalúan con una única llamada al modelo.
+# ----------------------------------------------------------------------------------------------------------------------
+def evaluar_lotes_candidatos(
+    model, componentes: pd.DataFrame, paso: int = PASO_DIVISION_KG
+) -> pd.DataFrame:
+    """
+    Calcula la probabilidad de viscosidad incorrecta de todos los lotes posibles: cada reactor con cada
+    cantidad múltiplo de 'paso' hasta su capacidad.
+
+    Args:
+        model: Modelo para la predicción.
+        componentes (pd.DataFrame): DataFrame de una fila con los componentes del tinte.
+        paso (int): Paso de cantidad en Kg.
+
+    Returns:
+        pd.DataFrame: Variables del modelo de cada lote candidato más las columnas 'unidades' y 'probabilidad'.
+    """
+    unidades_maximas = (CAPACIDADES // paso).astype(int)
+    indices = np.repeat(np.arange(len(CAPACIDADES)), unidades_maximas)
+    # Para cada reactor, 1, 2, ..., unidades_maximas pasos
+    unidades = np.concatenate([np.arange(1, maximo + 1) for maximo in unidades_maximas])
+
+    candidatos = crear_matriz_features(componentes, unidades * paso, indices)
+    candidatos["unidades"] = unidades
+    candidatos["probabilidad"] = predecir_probabilidades(model, candidatos)
+
+    return candidatos
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def optimizar_division(
+    model,
+    componentes: pd.DataFrame,
+    cantidad: float,
+    paso: int = PASO_DIVISION_KG,
+    max_lotes: int = MAX_LOTES_DIVISION,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Busca la división de un pedido en lotes que minimiza la probabilidad combinada de viscosidad incorrecta.
+
+    Args:
+        model: Modelo para la predicción.
+        componentes (pd.DataFrame): DataFrame de una fila con los componentes del tinte.
+        cantidad (float): Cantidad total del pedido en Kg.
+        paso (int): Paso de cantidad en Kg para la búsqueda.
+        max_lotes (int): Número máximo de lotes.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]:
+        - Lotes de la mejor división, con reactor, cantidad, grado de llenado y probabilidad.
+        - Mejor probabilidad combinada para cada número de lotes.
+
+    Raises:
+        ValueError: Si el pedido no se puede fabricar con 'max_lotes' lotes.
+    """
+    candidatos = evaluar_lotes_candidatos(model, componentes, paso)
+
+    unidades_pedido = math.ceil(cantidad / paso)
+    if unidades_pedido > max_lotes * int(CAPACIDADES.max() // paso):
+        raise ValueError(
+            f"El pedido de {cantidad} Kg no se puede fabricar en {max_lotes} lotes o menos"
+        )
+
+    unidades = candidatos["unidades"].to_numpy()
+    probabilidades = np.clip(candidatos["probabilidad"].to_numpy() / 100, 0, 1 - 1e-9)
+    costes = -np.log1p(-probabilidades)
+
+    # coste[k, t]: mínimo coste para fabricar t unidades en exactamente k lotes
+    # eleccion[k, t]: lote candidato elegido como último lote en esa solución
+    coste = np.full((max_lotes + 1, unidades_pedido + 1), np.inf)
+    coste[0, 0] = 0.0
+    eleccion = np.full((max_lotes + 1, unidades_pedido + 1), -1)
+
+    # Matriz (n_candidatos, unidades_pedido + 1) con la posición de partida de cada candidato
+    totales = np.arange(unidades_pedido + 1)
+    origen = totales[np.newaxis, :] - unidades[:, np.newaxis]
+    validos = origen >= 0
+    origen = np.where(validos, origen, 0)
+
+    for k in range(1, max_lotes + 1):
+        nuevos_costes = np.where(validos, coste[k - 1][origen], np.inf) + costes[:, np.newaxis]
+        eleccion[k] = np.argmin(nuevos_costes, axis=0)
+        coste[k] = nuevos_costes[eleccion[k], totales]
+
+    resumen = pd.DataFrame(
+        {
+            "lotes": np.arange(1, max_lotes + 1),
+            "probabilidad_combinada": np.round(
+                -np.expm1(-coste[1:, unidades_pedido]) * 100, 2
+            ),
+        }
+    )
+    resumen = resumen[np.isfinite(coste[1:, unidades_pedido])].reset_index(drop=True)
+
+    # Reconstruimos la mejor división recorriendo las elecciones hacia atrás
+    mejor_k = int(resumen.loc[resumen["probabilidad_combinada"].idxmin(), "lotes"])
+    elegidos = []
+    t = unidades_pedido
+    for k in range(mejor_k, 0, -1):
+        candidato = eleccion[k, t]
+        elegidos.append(candidato)
+        t -= unidades[candidato]
+
+    lotes = candidatos.iloc[elegidos].copy()
+    lotes = lotes.sort_values(by=["cantidad"], ascending=False).reset_index(drop=True)
+
+    # La búsqueda trabaja en pasos, ajustamos el lote más grande para que la suma sea la cantidad exacta
+    exceso = unidades_pedido * paso - cantidad
+    if exceso > 0:
+        ajuste = crear_matriz_features(
+            componentes,
+            np.array([lotes.loc[0, "cantidad"] - exceso]),
+            indices_reactores(lotes.loc[:0, "reactor"]),
+        )
+        ajuste["probabilidad"] = predecir_probabilidades(model, ajuste)
+        for columna in ["cantidad", "grado_llenado", "probabilidad"]:
+            lotes.loc[0, columna] = ajuste.loc[0, columna]
+
+    lotes.insert(0, "lote", np.arange(1, len(lotes) + 1))
+    lotes["cantidad"] = lotes["cantidad"].round(2)
+
+    return lotes[["lote", "reactor", "cantidad", "grado_llenado", "probabilidad"]], resumen
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def probabilidad_combinada(probabilidades: pd.Series) -> float:
+    """
+    Probabilidad (%) de que al menos uno de los lotes tenga viscosidad incorrecta.
+    """
+    return round((1 - np.prod(1 - probabilidades.to_numpy() / 100)) * 100, 2)
@@ -0,0 +1,147 @@
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable
+
+from constants import CARPETA_PERFILES, INTERVALO_MUESTREO_PERFIL_S
+
+# Modos de perfilado y extensión de sus ficheros: el de muestreo guarda pilas colapsadas ('a;b;c muestras'), que se
+# abren directamente con flamegraph.pl o speedscope, y el determinista un fichero de cProfile (snakeviz, pstats)
+MODOS_PERFILADO = {"muestreo": ".collapsed.txt", "determinista": ".prof"}
+PATRON_PERFIL = re.compile(r"(\d{8}-\d{6})-(.+)-(\d+)-[0-9a-f]{6}(\.collapsed\.txt|\.prof)")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Perfilado bajo demanda
+#
+# Desde la página de administración se pide perfilar las próximas N ejecuciones completas de una página, de
+# cualquier sesión del proceso. 'create_menu' consulta las peticiones pendientes antes de ejecutar la página: si no
+# hay ninguna, solo cuesta buscar en un diccionario vacío. Las ejecuciones de fragmentos no pasan por 'create_menu'
+# y no se perfilan.
+# ----------------------------------------------------------------------------------------------------------------------
+class PeticionesPerfilado:
+    """
+    Peticiones de perfilado pendientes del proceso: página -> (modo, ejecuciones restantes).
+    """
+
+    def __init__(self):
+        self._peticiones: dict[str, tuple[str, int]] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def solicitar(self, pagina: str, modo: str, ejecuciones: int) -> None:
+        if modo not in MODOS_PERFILADO:
+            raise ValueError(f"Modo de perfilado desconocido: {modo}")
+        with self._lock:
+            self._peticiones[pagina] = (modo, ejecuciones)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def cancelar(self, pagina: str) -> None:
+        with self._lock:
+            self._peticiones.pop(pagina, None)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def pendientes(self) -> dict[str, tuple[str, int]]:
+        with self._lock:
+            return dict(self._peticiones)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def tomar(self, pagina: str) -> str | None:
+        """
+        Consume una ejecución de la petición de la página y devuelve su modo, o None si no hay petición.
+        """
+        # Camino rápido sin bloqueo, el habitual cuando no se está perfilando
+        if not self._peticiones:
+            return None
+        with self._lock:
+            if pagina not in self._peticiones:
+                return None
+            modo, restantes = self._peticiones[pagina]
+            if restantes > 1:
+                self._peticiones[pagina] = (modo, restantes - 1)
+            else:
+                del self._peticiones[pagina]
+            return modo
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+class PerfiladorMuestreo:
+    """
+    Perfilador de muestreo: un hilo toma la pila del hilo perfilado cada 'intervalo' segundos y cuenta cuántas veces
+    aparece cada pila. El coste no depende del número de llamadas del código perfilado. Las pilas empiezan en la
+    función que crea el perfilador, sin los marcos de Streamlit que hay por debajo.
+    """
+
+    def __init__(self, intervalo: float = INTERVALO_MUESTREO_PERFIL_S):
+        self.intervalo = intervalo
+        self.pilas: Counter[str] = Counter()
+        self._parar = threading.Event()
+        self._hilo_perfilado = threading.get_ident()
+        self._raiz = sys._getframe(1)
+        self._hilo = threading.Thread(target=self._muestrear, name="perfilador", daemon=True)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def __enter__(self) -> "PerfiladorMuestreo":
+        self._hilo.start()
+        return self
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def __exit__(self, *excepcion) -> None:
+        self._parar.set()
+        self._hilo.join()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def _muestrear(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self._hilo_perfilado)
+            marcos = []
+            while frame is not None:
+                codigo = frame.f_code
+                marcos.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                if frame is self._raiz:
+                    break
+                frame = frame.f_back
+            if marcos:
+                self.pilas[";".join(reversed(marcos))] += 1
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def guardar(self, ruta: str) -> None:
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.writelines(f"{pila} {muestras}\n" for pila, muestras in self.pilas.most_common())
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def ejecutar_perfilado(pagina: str, funcion: Callable[[], None], modo: str) -> None:
+    """
+    Ejecuta la función de una página con el perfilador del modo indicado y guarda el perfil en 'CARPETA_PERFILES'.
+    El perfil se guarda también si la ejecución se interrumpe (p. ej. con 'st.rerun' o 'st.stop').
+    """
+    os.makedirs(CARPETA_PERFILES, exist_ok=True)
+    nombre = re.sub(r"[^\w]", "_", pagina)
+    ruta = os.path.join(
+        CARPETA_PERFILES,
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{nombre}-{os.getpid()}-{uuid.uuid4().hex[:6]}{MODOS_PERFILADO[modo]}",
+    )
+
+    if modo == "muestreo":
+        perfilador = PerfiladorMuestreo()
+        try:
+            with perfilador:
+                funcion()
+        finally:
+            perfilador.guardar(ruta)
+    else:
+        perfilador = cProfile.Profile()
+        try:
+            perfilador.runcall(funcion)
+        finally:
+            perfilador.dump_stats(ruta)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+peticiones_perfilado = PeticionesPerfilado()
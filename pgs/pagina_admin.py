@@ -1,10 +1,37 @@
 import os
 import platform
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
 import streamlit as st
-from constants import TEMP_FOLDER, USUARIO_FOLDER
+from constants import (
+    CALENTAR_SERVIDOR,
+    CARPETA_LOGS,
+    CARPETA_PERFILES,
+    ENTRADAS_PAGINA_LOGS,
+    INTERVALO_PANEL_METRICAS_S,
+    MAX_EJECUCIONES_PERFILADO,
+    PAGINAS,
+    TEMP_FOLDER,
+    USUARIO_FOLDER,
+)
+from data_repo import get_tintes
 
+from auditoria_predicciones import ETAPAS_PREDICCION, consultar_predicciones
+from cache_figuras import obtener_cache_figuras
+from calentamiento import calentar_servidor
+from consulta_perfiles import listar_perfiles, resumir_determinista, resumir_muestreo
 from util import download_link
 from logger_config import logger
+from metricas import registro_metricas
+from perfilado import peticiones_perfilado
+from model_registry import (
+    activar_version,
+    listar_versiones,
+    obtener_pool_modelos,
+    obtener_version_actual,
+)
+from visor_logs import NIVELES_LOG, leer_entradas
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -15,8 +42,16 @@ def pagina_admin() -> None:
     Esta página proporciona funcionalidades de administración para la aplicación, incluyendo la visualización
     de archivos de log y la opción de restaurar los datos de entrenamiento y el modelo de predicción.
 
-    Utiliza dos funciones auxiliares:
+    Utiliza nueve funciones auxiliares:
     - `show_log_files`: Para mostrar los archivos de log.
+    - `show_log_viewer`: Para consultar las entradas de los logs con filtros.
+    - `show_model_versions`: Para consultar las versiones del modelo y restaurar una anterior.
+    - `show_model_pool`: Para consultar el uso del pool de modelos en memoria.
+    - `show_warmup`: Para consultar los tiempos del calentamiento del servidor.
+    - `show_prediction_audit`: Para consultar las predicciones realizadas y su latencia.
+    - `show_stage_metrics`: Para consultar los percentiles de latencia de cada etapa de la aplicación.
+    - `show_profiling`: Para perfilar las próximas ejecuciones de una página y consultar los perfiles (solo
+      administradores).
     - `reset_model_data`: Para proporcionar una opción de restaurar (borrar) los datos del modelo.
 
     No se reciben parámetros y no se retorna ningún valor. La función solo afecta la interfaz de usuario
@@ -29,6 +64,14 @@ def pagina_admin() -> None:
         return
 
     show_log_files()
+    show_log_viewer()
+    show_model_versions()
+    show_model_pool()
+    show_warmup()
+    show_prediction_audit()
+    show_stage_metrics()
+    if st.session_state.get("es_admin"):
+        show_profiling()
     reset_model_data()
 
 
@@ -37,7 +80,7 @@ def show_log_files() -> None:
     """
     Muestra los archivos de log en la página de administración.
 
-    Esta función busca en la carpeta 'logs' todos los archivos con extensión '.log' y los presenta
+    Esta función busca en la carpeta 'logs' todos los archivos con extensión '.log' o '.log.gz' y los presenta
     en la interfaz de usuario con un enlace para su descarga. En caso de no encontrar archivos de log,
     muestra un mensaje informativo.
 
@@ -51,16 +94,305 @@ def show_log_files() -> None:
         """
     )
 
-    logs = os.listdir("logs")
+    logs = os.listdir(CARPETA_LOGS)
 
     if not logs:
         st.info("No hay logs disponibles")
         return
 
-    logs = [log for log in logs if log.endswith(".log")]
+    # Los logs de días anteriores están comprimidos con gzip
+    logs = sorted((log for log in logs if log.endswith((".log", ".log.gz"))), reverse=True)
 
     for log in logs:
-        download_link(f"logs/{log}", "")
+        download_link(f"{CARPETA_LOGS}/{log}", "")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.fragment
+def show_log_viewer() -> None:
+    """
+    Muestra las últimas entradas de un log, con filtros por nivel, fecha y texto y paginación hacia las entradas
+    anteriores. Los filtros se aplican leyendo el fichero hacia atrás, sin cargarlo en memoria.
+    """
+    st.markdown(
+        """
+        ##### Visor de logs
+        """
+    )
+
+    # Los logs comprimidos no se pueden leer con seek, solo se descargan
+    logs = sorted((log for log in os.listdir(CARPETA_LOGS) if log.endswith(".log")), reverse=True)
+    if not logs:
+        st.info("No hay logs disponibles")
+        return
+
+    col1, col2, col3, col4 = st.columns([2, 2, 3, 1])
+    with col1:
+        log = st.selectbox("Fichero", logs, key="visor_logs_fichero")
+    with col2:
+        niveles = st.multiselect("Niveles", NIVELES_LOG, key="visor_logs_niveles")
+    with col3:
+        texto = st.text_input("Texto", key="visor_logs_texto")
+    with col4:
+        n_entradas = st.selectbox("Entradas", ENTRADAS_PAGINA_LOGS, key="visor_logs_entradas")
+
+    desde = hasta = None
+    if st.toggle("Filtrar por fecha", key="visor_logs_filtrar_fecha"):
+        fechas = st.date_input("Fechas", value=(date.today(), date.today()), key="visor_logs_fechas")
+        if len(fechas) == 2:
+            desde, hasta = datetime.combine(fechas[0], time.min), datetime.combine(fechas[1], time.max)
+
+    # Pila con el final de cada página visitada, la última es la página actual. Se reinicia al cambiar los filtros
+    filtros = (log, tuple(niveles), texto, n_entradas, desde, hasta)
+    if st.session_state.get("visor_logs_filtros") != filtros:
+        st.session_state["visor_logs_filtros"] = filtros
+        st.session_state["visor_logs_paginas"] = [None]
+    paginas = st.session_state["visor_logs_paginas"]
+
+    entradas, siguiente = leer_entradas(
+        os.path.join(CARPETA_LOGS, log), paginas[-1], n_entradas, niveles, desde, hasta, texto
+    )
+
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        st.button("Más recientes", on_click=paginas.pop, disabled=len(paginas) == 1)
+    with col2:
+        st.button("Anteriores", on_click=paginas.append, args=(siguiente,), disabled=siguiente is None)
+    with col3:
+        st.caption(f"Página {len(paginas)}, {len(entradas)} entradas")
+
+    st.code("\n".join(entrada["mensaje"] for entrada in entradas) or "No hay entradas", language=None)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def show_model_versions() -> None:
+    """
+    Muestra las versiones del modelo publicadas en el registro del usuario y permite activar cualquiera de ellas.
+
+    Activar una versión anterior solo sustituye el puntero a la versión activa, por lo que la vuelta atrás
+    es inmediata y no requiere reentrenar el modelo.
+    """
+    st.markdown(
+        """
+        ##### Versiones del modelo de predicción
+        """
+    )
+
+    usuario = st.session_state["username"]
+    versiones = listar_versiones(usuario)
+
+    if not versiones:
+        st.info("No tienes versiones publicadas, se usa el modelo compartido o el modelo por defecto")
+        return
+
+    version_actual = obtener_version_actual(usuario)
+
+    tabla_versiones = pd.DataFrame(
+        [
+            {
+                "version": v["version"],
+                "activa": v["version"] == version_actual,
+                "fecha": v["fecha"],
+                **v["metricas"],
+                "hash_datos": v["hash_datos"][:12],
+            }
+            for v in versiones
+        ]
+    )
+    st.dataframe(tabla_versiones, hide_index=True)
+
+    version_seleccionada = st.selectbox(
+        "Versión a activar", [v["version"] for v in versiones]
+    )
+
+    if st.button("Activar versión"):
+        try:
+            activar_version(usuario, version_seleccionada)
+        except Exception as e:
+            st.error(f"Error al activar la versión: {e}")
+            logger.error(f"Error al activar la versión: {e}")
+        else:
+            logger.info(
+                f"Activada la versión {version_seleccionada} del modelo de {usuario}"
+            )
+            st.success(f"Versión {version_seleccionada} activada correctamente")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def show_model_pool() -> None:
+    """
+    Muestra las métricas del pool de modelos en memoria y de la caché de figuras: elementos cargados,
+    memoria ocupada, aciertos, fallos y expulsiones.
+    """
+    st.markdown(
+        """
+        ##### Pool de modelos en memoria
+        """
+    )
+
+    st.dataframe(
+        pd.DataFrame([obtener_pool_modelos().metricas()]), hide_index=True
+    )
+
+    st.markdown(
+        """
+        ##### Caché de figuras
+        """
+    )
+
+    st.dataframe(
+        pd.DataFrame([obtener_cache_figuras().metricas()]), hide_index=True
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def show_warmup() -> None:
+    """
+    Muestra el informe del calentamiento del servidor: versión del modelo, fecha y tiempo de cada etapa.
+    Si el calentamiento automático está desactivado ('CALENTAR_SERVIDOR'), solo se calienta al pulsar el botón.
+    """
+    st.markdown(
+        """
+        ##### Calentamiento del servidor
+        """
+    )
+
+    if not CALENTAR_SERVIDOR and not st.button("Calentar manualmente"):
+        st.info("El calentamiento automático está desactivado")
+        return
+
+    try:
+        informe = calentar_servidor()
+    except Exception as e:
+        logger.warning(f"Error al calentar el servidor: {e}")
+        st.warning(f"El calentamiento ha fallado: {e}")
+        return
+
+    st.caption(f"Modelo {informe['version']}, calentado el {informe['fecha']} en {informe['total_ms']} ms")
+    st.dataframe(pd.DataFrame([informe["etapas_ms"]]), hide_index=True)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.fragment
+def show_prediction_audit() -> None:
+    """
+    Muestra las predicciones registradas en la auditoría en un rango de días, opcionalmente de un tinte, con los
+    percentiles de latencia de cada etapa.
+    """
+    st.markdown(
+        """
+        ##### Auditoría de predicciones
+        """
+    )
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        fechas = st.date_input(
+            "Fechas", value=(date.today() - timedelta(days=7), date.today()), key="auditoria_fechas"
+        )
+    with col2:
+        tinte = st.selectbox("Tinte", ["Todos", *get_tintes()], key="auditoria_tinte")
+
+    if len(fechas) != 2:
+        return
+
+    eventos = consultar_predicciones(fechas[0], fechas[1], None if tinte == "Todos" else tinte)
+    if eventos.empty:
+        st.info("No hay predicciones en el periodo seleccionado")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Predicciones", len(eventos))
+    col2.metric("Usuarios", eventos["usuario"].nunique())
+    col3.metric("Errores", int((eventos["estado"] != "ok").sum()))
+
+    # Percentiles de latencia de cada etapa en milisegundos
+    columnas_latencia = [f"{etapa}_ms" for etapa in ETAPAS_PREDICCION] + ["total_ms"]
+    latencias = eventos[columnas_latencia].quantile([0.5, 0.95, 0.99]).round(2)
+    latencias.index = ["p50", "p95", "p99"]
+    st.dataframe(latencias)
+
+    st.dataframe(eventos.sort_values("fecha", ascending=False), hide_index=True)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.fragment(run_every=INTERVALO_PANEL_METRICAS_S)
+def show_stage_metrics() -> None:
+    """
+    Muestra los percentiles de latencia en milisegundos de cada etapa instrumentada del proceso. El panel se
+    actualiza solo cada 'INTERVALO_PANEL_METRICAS_S' segundos.
+    """
+    st.markdown(
+        """
+        ##### Latencia por etapa (ms)
+        """
+    )
+
+    resumen = registro_metricas.resumen()
+    if resumen.empty:
+        st.info("Aún no hay medidas")
+    else:
+        st.dataframe(resumen, hide_index=True)
+
+    col1, col2 = st.columns([1, 4])
+    with col1:
+        st.button("Reiniciar métricas", on_click=registro_metricas.reiniciar)
+    with col2:
+        st.caption(f"Exportadas en formato Prometheus en '{registro_metricas.ruta_prometheus}'")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.fragment
+def show_profiling() -> None:
+    """
+    Permite perfilar las próximas ejecuciones de una página, en cualquier sesión del proceso, y consultar y
+    descargar los perfiles guardados. Los de muestreo son pilas colapsadas para flamegraph.pl o speedscope y los
+    deterministas ficheros de cProfile para snakeviz.
+    """
+    st.markdown(
+        """
+        ##### Perfilado de páginas
+        """
+    )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        pagina = st.selectbox("Página", list(PAGINAS), key="perfilado_pagina")
+    with col2:
+        ejecuciones = st.number_input(
+            "Ejecuciones", min_value=1, max_value=MAX_EJECUCIONES_PERFILADO, value=1, key="perfilado_ejecuciones"
+        )
+    with col3:
+        modo = st.radio("Perfilador", ["muestreo", "determinista"], horizontal=True, key="perfilado_modo")
+
+    if st.button("Perfilar"):
+        peticiones_perfilado.solicitar(pagina, modo, int(ejecuciones))
+        logger.info(f"Perfilado de {ejecuciones} ejecuciones de {pagina} ({modo}) solicitado")
+
+    for pendiente, (modo_pendiente, restantes) in peticiones_perfilado.pendientes().items():
+        col1, col2 = st.columns([4, 1])
+        col1.caption(f"{pendiente}: quedan {restantes} ejecuciones por perfilar ({modo_pendiente})")
+        col2.button(
+            "Cancelar",
+            key=f"perfilado_cancelar_{pendiente}",
+            on_click=peticiones_perfilado.cancelar,
+            args=(pendiente,),
+        )
+
+    perfiles = listar_perfiles()
+    if perfiles.empty:
+        st.info("No hay perfiles guardados")
+        return
+
+    fichero = st.selectbox("Perfil", perfiles["fichero"], key="perfilado_fichero")
+    st.dataframe(perfiles, hide_index=True)
+
+    ruta = os.path.join(CARPETA_PERFILES, fichero)
+    if fichero.endswith(".prof"):
+        st.code(resumir_determinista(ruta), language=None)
+    else:
+        st.dataframe(resumir_muestreo(ruta), hide_index=True)
+    download_link(ruta, "Descargar perfil", comprimir=False)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -1,10 +1,41 @@
+import math
+from functools import partial
+from typing import Callable
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import streamlit as st
 
-from constants import EDA_DESCRIPTION, PLOTLY_THEMES
-from data_repo import preprocess_data_eda
+from cache_figuras import figura_cacheada
+from constants import (
+    EDA_DESCRIPTION,
+    GRANULARIDADES_CUBO,
+    MAPA_RESULTADO,
+    MAX_MATCODES_MAPA_CALOR,
+    PLOTLY_THEMES,
+    TAMANOS_PAGINA_EDA,
+)
+from cubo_eda import agregar_cubo
+from data_repo import (
+    calcular_caja_eda,
+    calcular_conteo_reactor,
+    calcular_conteo_target,
+    calcular_correlacion_eda,
+    calcular_cubo_eda,
+    calcular_densidad_eda,
+    calcular_descripcion_eda,
+    calcular_histograma_eda,
+    calcular_muestra_eda,
+    calcular_opciones_filtro,
+    filtrar_pedidos,
+    obtener_pagina_pedidos,
+    resolver_datos_entrenamiento,
+)
 from logger_config import logger
+from metricas import span
+from snapshot_eda import obtener_snapshot
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -44,6 +75,7 @@ def pagina_eda() -> None:
 
 
 # ----------------------------------------------------------------------------------------------------------------------
+@span("eda.run_eda")
 def run_eda() -> None:
     """
     Realiza y muestra un Análisis Exploratorio de Datos (EDA) en la aplicación Streamlit.
@@ -52,14 +84,24 @@ def run_eda() -> None:
     más legibles y despliega varios elementos en la interfaz de usuario para explorar los datos.
     Incluye visualizaciones y estadísticas descriptivas de los datos.
 
+    Los datos preprocesados y los agregados costosos (descripción estadística, correlaciones y conteos) se
+    cachean por versión de los datos de entrenamiento y se comparten entre sesiones.
+
+    Si se ha generado el snapshot de la versión de los datos (ver 'snapshot_eda'), los agregados se leen de
+    él salvo que el usuario active 'Recalcular en vivo'.
+
+    Cada sección se muestra con 'seccion_eda': solo calcula y envía su gráfico cuando el usuario la abre,
+    y al interactuar con ella solo se vuelve a ejecutar esa sección.
+
     El EDA se realiza mediante los siguientes pasos:
     - Preprocesamiento de datos para el EDA.
     - Mapeo de los valores de 'target' a categorías de viscosidad.
-    - Despliegue de un dataframe con los datos procesados.
+    - Despliegue de una tabla paginada y filtrable con los datos procesados.
     - Selección de un tema de colores para las visualizaciones.
     - Visualización de la distribución del 'target' en un gráfico de tarta.
     - Presentación de estadísticas descriptivas de los datos.
     - Visualización de la distribución de la producción por reactor.
+    - Evolución y mapa de calor de la tasa de defectos por periodo, reactor y matcode.
     - Histogramas de variables numéricas.
     - Gráficos que muestran la relación entre variables y la viscosidad.
     - Gráficos de dispersión para explorar relaciones entre distintas variables.
@@ -68,74 +110,241 @@ def run_eda() -> None:
     No se reciben parámetros y no se retorna ningún valor. La función solo afecta la interfaz de usuario
     de la aplicación Streamlit, mostrando visualizaciones y estadísticas para análisis de datos.
     """
-    eda_data = preprocess_data_eda()
-    eda_data["resultado"] = eda_data["target"].map(
-        {0: "Viscosidad correcta", 1: "Viscosidad incorrecta"}
-    )
+    version, ruta_datos = resolver_datos_entrenamiento(st.session_state["username"])
+
+    snapshot = obtener_snapshot(version)
+    if snapshot is not None:
+        en_vivo = st.toggle(
+            "Recalcular en vivo",
+            key="eda_en_vivo",
+            help="Calcula los agregados a partir de los datos en lugar de leerlos del snapshot",
+        )
+        if not en_vivo:
+            st.caption(f"Agregados del snapshot generado el {snapshot['fecha']}")
 
     col1, col2 = st.columns([3, 1])
     with col1:
-        with st.expander("Datos de entrenamiento"):
-            st.dataframe(eda_data)
+        seccion_eda(
+            "Datos de entrenamiento",
+            partial(mostrar_datos_entrenamiento, version, ruta_datos),
+            partial(agregado_eda, ("opciones_filtro",), calcular_opciones_filtro),
+            version,
+            ruta_datos,
+        )
     with col2:
         with st.expander("Tema colores"):
             tema_seleccionado = st.selectbox("", PLOTLY_THEMES)
             px.defaults.template = tema_seleccionado
 
-    # Creamos dos columnas, una con un expander con la distribución de la columna target y otro con un expander con la
-    # distribución de la columna target en un gráfico de tarta
+    # Creamos dos columnas, una con la distribución de la columna target en un gráfico de tarta
+    # y otra con la descripción estadística de los datos
     col1, col2 = st.columns(2)
 
     with col1:
-        with st.expander(
+        seccion_eda(
             "Distribución de la predicción de viscosidad en un gráfico de tarta",
-            expanded=True,
-        ):
-            st.plotly_chart(
-                plot_target_distribution(eda_data), use_container_width=True
-            )
+            partial(mostrar_target_distribution, version),
+            partial(agregado_eda, ("conteo_target",), calcular_conteo_target),
+            version,
+            ruta_datos,
+            abierta=True,
+        )
 
     with col2:
-        with st.expander("Descripción estádistica de los datos", expanded=True):
-            plot_descripcion_estadistica(eda_data)
+        seccion_eda(
+            "Descripción estádistica de los datos",
+            plot_descripcion_estadistica,
+            partial(agregado_eda, ("descripcion",), calcular_descripcion_eda),
+            version,
+            ruta_datos,
+            abierta=True,
+        )
+
+    seccion_eda(
+        "Distribución de la producción por  reactor",
+        partial(plot_distribucion_reactores, version),
+        partial(agregado_eda, ("conteo_reactor",), calcular_conteo_reactor),
+        version,
+        ruta_datos,
+        abierta=True,
+    )
+
+    seccion_eda(
+        "Evolución de la tasa de defectos",
+        plot_tendencia_defectos,
+        partial(agregado_eda, ("cubo",), calcular_cubo_eda),
+        version,
+        ruta_datos,
+    )
+
+    seccion_eda(
+        "Mapa de calor de la tasa de defectos",
+        plot_mapa_calor_defectos,
+        partial(agregado_eda, ("cubo",), calcular_cubo_eda),
+        version,
+        ruta_datos,
+    )
+
+    seccion_eda(
+        "Histográma de variables numéricas",
+        partial(plot_histograma_variable, version, ruta_datos),
+        partial(agregado_eda, ("descripcion",), calcular_descripcion_eda),
+        version,
+        ruta_datos,
+    )
+
+    seccion_eda(
+        "Relación entre las variables y la visocidad",
+        partial(plot_relacion_variable_target, version, ruta_datos),
+        partial(agregado_eda, ("descripcion",), calcular_descripcion_eda),
+        version,
+        ruta_datos,
+    )
+
+    seccion_eda(
+        "Relación entre las variables - gráfico de dispersión",
+        partial(plot_relacion_variable_variable, version, ruta_datos),
+        partial(agregado_eda, ("descripcion",), calcular_descripcion_eda),
+        version,
+        ruta_datos,
+    )
+
+    seccion_eda(
+        "Correlación entre las variables",
+        partial(plot_correlacion_variables, version),
+        partial(agregado_eda, ("correlacion",), calcular_correlacion_eda),
+        version,
+        ruta_datos,
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def agregado_eda(clave: tuple, calcular: Callable, version: str, ruta_datos: str, *args):
+    """
+    Devuelve un agregado del EDA: del snapshot de la versión si existe y el usuario no ha pedido recalcular
+    en vivo, o calculado con 'calcular' en otro caso.
 
-    with st.expander("Distribución de la producción por  reactor", expanded=True):
-        plot_distribucion_reactores(eda_data)
+    Args:
+        clave (tuple): Clave del agregado en el snapshot, su nombre y sus parámetros.
+        calcular (Callable): Función cacheada que calcula el agregado a partir de la versión, la ruta y 'args'.
+        version (str): Versión de los datos de entrenamiento.
+        ruta_datos (str): Ruta de los datos de entrenamiento.
+    """
+    if not st.session_state.get("eda_en_vivo", False):
+        snapshot = obtener_snapshot(version)
+        if snapshot is not None and clave in snapshot["agregados"]:
+            return snapshot["agregados"][clave]
+    return calcular(version, ruta_datos, *args)
 
-    with st.expander("Histográma de variables numéricas"):
-        plot_histograma_variable(eda_data)
 
-    with st.expander("Relación entre las variables y la visocidad"):
-        plot_relacion_variable_target(eda_data)
+# ----------------------------------------------------------------------------------------------------------------------
+@st.fragment
+def seccion_eda(
+    titulo: str,
+    mostrar: Callable,
+    cargar: Callable,
+    version: str,
+    ruta_datos: str,
+    abierta: bool = False,
+) -> None:
+    """
+    Muestra una sección del EDA que solo se calcula cuando está abierta.
 
-    with st.expander("Relación entre las variables - gráfico de dispersión"):
-        plot_relacion_variable_variable(eda_data)
+    A diferencia de 'st.expander', que ejecuta su contenido aunque esté plegado, la sección solo carga sus datos
+    y construye su gráfico cuando el interruptor está activado. Al ser un fragmento, abrirla o interactuar con
+    sus controles solo vuelve a ejecutar esta sección.
 
-    with st.expander("Correlación entre las variables"):
-        plot_correlacion_variables(eda_data)
+    Args:
+        titulo (str): Título de la sección.
+        mostrar (Callable): Función que muestra la sección a partir de los datos.
+        cargar (Callable): Función cacheada que obtiene los datos a partir de la versión y la ruta.
+        version (str): Versión de los datos de entrenamiento.
+        ruta_datos (str): Ruta de los datos de entrenamiento.
+        abierta (bool): Si la sección empieza abierta.
+    """
+    with st.container(border=True):
+        if st.toggle(titulo, value=abierta, key=f"seccion_eda_{titulo}"):
+            with span(f"eda.{titulo}.datos"):
+                datos = cargar(version, ruta_datos)
+            with span(f"eda.{titulo}.grafico"):
+                mostrar(datos)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def plot_correlacion_variables(eda_data: pd.DataFrame) -> None:
+def mostrar_datos_entrenamiento(version: str, ruta_datos: str, opciones: dict) -> None:
     """
-    Muestra una matriz de correlación de las variables numéricas del DataFrame proporcionado.
+    Muestra los datos de entrenamiento en una tabla paginada con filtros por reactor, matcode, fechas y resultado.
+
+    Los filtros se aplican en 'data_repo' sobre los pedidos y solo se construyen y envían al navegador las filas
+    de la página actual, de modo que la tabla no depende del tamaño del histórico.
+
     Args:
-        eda_data (pd.DataFrame): DataFrame que contiene los datos para el análisis.
+        version (str): Versión de los datos de entrenamiento.
+        ruta_datos (str): Ruta de los datos de entrenamiento.
+        opciones (dict): Valores disponibles para cada filtro, de 'calcular_opciones_filtro'.
+    """
+    col1, col2 = st.columns(2)
+    with col1:
+        reactores = st.multiselect("Reactor", opciones["reactores"])
+        fechas = st.date_input(
+            "Fechas",
+            value=(opciones["fecha_min"], opciones["fecha_max"]),
+            min_value=opciones["fecha_min"],
+            max_value=opciones["fecha_max"],
+        )
+    with col2:
+        matcodes = st.multiselect("Matcode", opciones["matcodes"])
+        resultados = st.multiselect("Resultado", opciones["resultados"])
+
+    posiciones = filtrar_pedidos(version, ruta_datos, reactores, matcodes, fechas, resultados)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        tamano_pagina = st.selectbox("Filas por página", TAMANOS_PAGINA_EDA)
+    with col2:
+        n_paginas = max(1, math.ceil(len(posiciones) / tamano_pagina))
+        pagina = st.number_input("Página", min_value=1, max_value=n_paginas, value=1)
+
+    inicio = (pagina - 1) * tamano_pagina
+    fin = min(inicio + tamano_pagina, len(posiciones))
+    st.dataframe(
+        obtener_pagina_pedidos(version, ruta_datos, posiciones[inicio:fin]), hide_index=True
+    )
+    st.caption(f"Filas {min(inicio + 1, fin)}-{fin} de {len(posiciones)} (página {pagina} de {n_paginas})")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def mostrar_target_distribution(version: str, target_counts: pd.Series) -> None:
     """
+    Muestra el gráfico de tarta de la distribución de la variable objetivo, desde la caché de figuras.
+    """
+    fig = figura_cacheada(
+        "distribucion_target", version, {}, lambda: plot_target_distribution(target_counts)
+    )
+    st.plotly_chart(fig, use_container_width=True)
 
-    # Verifica que las columnas a excluir existan en el DataFrame
-    columns_to_drop = [
-        col for col in ["fecha", "reactor", "resultado"] if col in eda_data.columns
-    ]
-    corr_matrix = eda_data.drop(columns=columns_to_drop).corr().round(2)
+
+# ----------------------------------------------------------------------------------------------------------------------
+def plot_correlacion_variables(version: str, corr_matrix: pd.DataFrame) -> None:
+    """
+    Muestra una matriz de correlación de las variables numéricas.
+    Args:
+        version (str): Versión de los datos de entrenamiento, clave de la caché de figuras.
+        corr_matrix (pd.DataFrame): Matriz de correlación precalculada con 'calcular_correlacion_eda'.
+    """
 
     # Crea un mapa de calor para visualizar la matriz de correlación
-    fig = px.imshow(
-        corr_matrix,
-        text_auto=True,
-        aspect="auto",
-        color_continuous_scale="RdBu",
-        labels=dict(x="Variable", y="Variable", color="Coeficiente de Correlación"),
+    fig = figura_cacheada(
+        "correlacion_variables",
+        version,
+        {},
+        lambda: px.imshow(
+            corr_matrix,
+            text_auto=True,
+            aspect="auto",
+            color_continuous_scale="RdBu",
+            labels=dict(x="Variable", y="Variable", color="Coeficiente de Correlación"),
+        ),
     )
 
     # Muestra la figura en Streamlit ajustándose al ancho del contenedor
@@ -143,91 +352,123 @@ def plot_correlacion_variables(eda_data: pd.DataFrame) -> None:
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def plot_relacion_variable_variable(eda_data: pd.DataFrame) -> None:
+def plot_relacion_variable_variable(version: str, ruta_datos: str, description: pd.DataFrame) -> None:
     """
-    Crea y muestra un gráfico de dispersión para dos variables seleccionadas por el usuario.
+    Crea y muestra la relación entre dos variables seleccionadas por el usuario.
 
-    El gráfico de dispersión permite explorar la relación entre dos variables numéricas. El usuario
-    elige las variables para los ejes X e Y a través de dos selectboxes en la interfaz de Streamlit.
+    Por defecto se muestra un mapa de densidad calculado en el servidor, cuyo tamaño no depende del número de
+    filas. La vista de puntos muestra una muestra estratificada por resultado de como máximo
+    'MAX_PUNTOS_DISPERSION' filas.
 
     Args:
-        eda_data (pd.DataFrame): DataFrame que contiene los datos para el análisis.
+        version (str): Versión de los datos de entrenamiento.
+        ruta_datos (str): Ruta de los datos de entrenamiento.
+        description (pd.DataFrame): Descripción estadística de los datos, sus columnas son las variables numéricas.
     """
 
     # Seleccionar variables para los ejes X e Y
-    numeric_columns = eda_data.select_dtypes(include=["int64", "float64"]).columns
+    numeric_columns = description.columns
+    n_filas = int(description.loc["count"].max())
     x_var = st.selectbox("Variable eje X", numeric_columns)
     y_var = st.selectbox("Variable eje Y", numeric_columns)
-
-    # Crear gráfico de dispersión con Plotly
-    fig = px.scatter(
-        eda_data,
-        x=x_var,
-        y=y_var,
-        color="resultado",  # Categoriza los puntos por el campo 'resultado'
-        size_max=15,  # Tamaño máximo para los marcadores
-        opacity=0.5,  # Opacidad de los marcadores
-    )
-    fig.update_traces(marker={"size": 15})  # Tamaño de los marcadores en el gráfico
+    vista = st.radio("Vista", ["Densidad", "Puntos"], horizontal=True)
+
+    if vista == "Densidad":
+        centros_x, centros_y, conteos, grupos = calcular_densidad_eda(version, ruta_datos, x_var, y_var)
+        grupo = st.selectbox("Resultado", ["Todos"] + grupos)
+        conteo = conteos.sum(axis=0) if grupo == "Todos" else conteos[grupos.index(grupo)]
+
+        fig = go.Figure(
+            go.Heatmap(
+                x=centros_x,
+                y=centros_y,
+                z=np.where(conteo > 0, conteo, np.nan),  # Las celdas vacías se dejan en blanco
+                colorscale="Viridis",
+                colorbar={"title": "Filas"},
+            )
+        )
+        fig.update_layout(xaxis_title=x_var, yaxis_title=y_var)
+        st.caption(f"Densidad de {n_filas} filas")
+    else:
+        muestra = calcular_muestra_eda(version, ruta_datos, [x_var, y_var])
+
+        # Crear gráfico de dispersión con Plotly
+        fig = px.scatter(
+            muestra,
+            x=x_var,
+            y=y_var,
+            color="resultado",  # Categoriza los puntos por el campo 'resultado'
+            opacity=0.5,  # Opacidad de los marcadores
+        )
+        fig.update_traces(marker={"size": 8})  # Tamaño de los marcadores en el gráfico
+        st.caption(f"Mostrando {len(muestra)} de {n_filas} filas")
 
     # Mostrar el gráfico en Streamlit
     st.plotly_chart(fig, use_container_width=True)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def plot_relacion_variable_target(eda_data: pd.DataFrame) -> None:
+def plot_relacion_variable_target(version: str, ruta_datos: str, description: pd.DataFrame) -> None:
     """
     Crea y muestra un gráfico de caja (boxplot) para explorar la relación entre una variable objetivo
     y otra variable numérica seleccionada por el usuario.
 
-    Esta visualización es útil para identificar tendencias, outliers y distribuciones en los datos en relación
-    con la variable objetivo.
+    Los cuartiles y los bigotes se calculan en el servidor, de modo que al navegador solo se envían
+    los estadísticos de cada caja y no todos los puntos.
 
     Args:
-        eda_data (pd.DataFrame): DataFrame que contiene los datos para el análisis.
+        version (str): Versión de los datos de entrenamiento.
+        ruta_datos (str): Ruta de los datos de entrenamiento.
+        description (pd.DataFrame): Descripción estadística de los datos, sus columnas son las variables numéricas.
     """
 
     # Seleccionar la variable numérica para analizar su relación con la variable objetivo
-    numeric_columns = eda_data.select_dtypes(include=["int64", "float64"]).columns
+    numeric_columns = description.columns
     target_variable = st.selectbox(
         "Selecciona la variable a analizar",
         numeric_columns[numeric_columns != "target"],
     )
 
-    # Crear y configurar el gráfico de caja
-    fig = px.box(
-        eda_data,
-        x="resultado",
-        y=target_variable,
-        points="all",  # Muestra todos los puntos de datos
+    # Crear y configurar el gráfico de caja a partir de los estadísticos de cada resultado
+    cajas = agregado_eda(
+        ("caja", target_variable), calcular_caja_eda, version, ruta_datos, target_variable
+    )
+    fig = go.Figure(
+        go.Box(
+            x=cajas["grupo"],
+            q1=cajas["q1"],
+            median=cajas["mediana"],
+            q3=cajas["q3"],
+            mean=cajas["media"],
+            lowerfence=cajas["inferior"],
+            upperfence=cajas["superior"],
+        )
     )
+    fig.update_layout(xaxis_title="resultado", yaxis_title=target_variable)
 
     # Mostrar el gráfico en Streamlit
     st.plotly_chart(fig, use_container_width=True)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def plot_descripcion_estadistica(eda_data: pd.DataFrame) -> None:
+def plot_descripcion_estadistica(description: pd.DataFrame) -> None:
     """
-    Muestra un resumen estadístico del DataFrame proporcionado.
+    Muestra un resumen estadístico de los datos.
 
-    La función calcula estadísticas descriptivas como media, desviación estándar, mínimo,
-    máximo y los percentiles para todas las columnas numéricas del DataFrame, y luego muestra
-    estos datos en forma de tabla en Streamlit.
+    Las estadísticas descriptivas (media, desviación estándar, mínimo, máximo y percentiles de todas las
+    columnas numéricas) se calculan una vez por versión de los datos en 'calcular_descripcion_eda'; esta función
+    solo las muestra en forma de tabla en Streamlit.
 
     Args:
-        eda_data (pd.DataFrame): DataFrame que contiene los datos para el análisis.
+        description (pd.DataFrame): Resultado de 'describe()' redondeado a 2 decimales.
     """
 
-    # Calcular estadísticas descriptivas y redondear a 2 decimales
-    description = eda_data.describe().round(2)
-
     # Mostrar el resumen estadístico en Streamlit
     st.dataframe(description)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def plot_distribucion_reactores(eda_data: pd.DataFrame) -> None:
+def plot_distribucion_reactores(version: str, conteo_reactor: pd.DataFrame) -> None:
     """
     Crea y muestra un histograma que ilustra la distribución de la producción por tipo de reactor.
 
@@ -236,16 +477,24 @@ def plot_distribucion_reactores(eda_data: pd.DataFrame) -> None:
     en la distribución de la producción entre diferentes reactores.
 
     Args:
-        eda_data (pd.DataFrame): DataFrame que contiene los datos para el análisis.
+        version (str): Versión de los datos de entrenamiento, clave de la caché de figuras.
+        conteo_reactor (pd.DataFrame): Pedidos por reactor y resultado, con las columnas
+            'reactor', 'resultado' y 'pedidos'.
     """
 
-    # Crear y configurar el histograma
-    fig = px.histogram(
-        eda_data,
-        x="reactor",  # Variable para el eje X
-        color="resultado",  # Categoriza los datos por 'resultado'
-        barmode="group",  # Modo de agrupamiento para las barras
-        title="Distribución de la producción por reactor",  # Título del gráfico
+    # Crear y configurar el histograma a partir de los conteos precalculados
+    fig = figura_cacheada(
+        "distribucion_reactores",
+        version,
+        {},
+        lambda: px.bar(
+            conteo_reactor,
+            x="reactor",  # Variable para el eje X
+            y="pedidos",  # Número de pedidos
+            color="resultado",  # Categoriza los datos por 'resultado'
+            barmode="group",  # Modo de agrupamiento para las barras
+            title="Distribución de la producción por reactor",  # Título del gráfico
+        ),
     )
 
     # Mostrar el histograma en Streamlit
@@ -253,46 +502,129 @@ def plot_distribucion_reactores(eda_data: pd.DataFrame) -> None:
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def plot_histograma_variable(eda_data: pd.DataFrame) -> None:
+def plot_tendencia_defectos(cubo: pd.DataFrame) -> None:
+    """
+    Crea y muestra la evolución de la tasa de defectos por día, semana o mes, opcionalmente separada por reactor.
+
+    El gráfico se construye agregando el cubo de defectos, sin volver a agrupar los pedidos.
+
+    Args:
+        cubo (pd.DataFrame): Cubo de defectos de 'calcular_cubo_eda'.
+    """
+    col1, col2 = st.columns(2)
+    with col1:
+        granularidad = st.selectbox("Periodo", GRANULARIDADES_CUBO, index=1, key="periodo_tendencia")
+    with col2:
+        por_reactor = st.checkbox("Separar por reactor", value=True)
+
+    tendencia = agregar_cubo(
+        cubo, GRANULARIDADES_CUBO[granularidad], ["reactor"] if por_reactor else None
+    )
+
+    fig = px.line(
+        tendencia,
+        x="periodo",
+        y="tasa_defectos",
+        color="reactor" if por_reactor else None,
+        markers=True,
+        hover_data=["pedidos", "defectuosos", "grado_llenado_medio"],
+        labels={"periodo": granularidad, "tasa_defectos": "Tasa de defectos (%)"},
+    )
+
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def plot_mapa_calor_defectos(cubo: pd.DataFrame) -> None:
+    """
+    Crea y muestra un mapa de calor de la tasa de defectos por periodo y reactor o matcode.
+
+    Por matcode solo se muestran los 'MAX_MATCODES_MAPA_CALOR' tintes con más pedidos. Las celdas sin pedidos
+    se dejan en blanco.
+
+    Args:
+        cubo (pd.DataFrame): Cubo de defectos de 'calcular_cubo_eda'.
+    """
+    col1, col2 = st.columns(2)
+    with col1:
+        granularidad = st.selectbox("Periodo", GRANULARIDADES_CUBO, index=2, key="periodo_mapa_calor")
+    with col2:
+        dimension = st.selectbox("Eje vertical", ["reactor", "matcode"])
+
+    matcodes = None
+    if dimension == "matcode":
+        pedidos_matcode = cubo.groupby("matcode")["pedidos"].sum()
+        matcodes = list(pedidos_matcode.nlargest(MAX_MATCODES_MAPA_CALOR).index)
+
+    agregado = agregar_cubo(cubo, GRANULARIDADES_CUBO[granularidad], [dimension], matcodes=matcodes)
+    tasas = agregado.pivot(index=dimension, columns="periodo", values="tasa_defectos")
+    pedidos = agregado.pivot(index=dimension, columns="periodo", values="pedidos")
+
+    fig = go.Figure(
+        go.Heatmap(
+            x=tasas.columns,
+            y=tasas.index.astype(str),
+            z=tasas.to_numpy(),
+            customdata=pedidos.to_numpy(),
+            colorscale="Reds",
+            colorbar={"title": "Defectos (%)"},
+            hovertemplate="%{x}<br>%{y}<br>Tasa de defectos: %{z}%<br>Pedidos: %{customdata}<extra></extra>",
+        )
+    )
+    fig.update_layout(xaxis_title=granularidad, yaxis_title=dimension, yaxis_type="category")
+
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def plot_histograma_variable(version: str, ruta_datos: str, description: pd.DataFrame) -> None:
     """
     Crea y muestra un histograma para una variable numérica seleccionada por el usuario.
 
     El usuario puede elegir una variable numérica del DataFrame y decidir si quiere visualizar
-    el histograma segmentado por el resultado de la viscosidad. Esto proporciona una visión
-    sobre la distribución de la variable seleccionada y, opcionalmente, cómo se relaciona con
-    el resultado de la viscosidad.
+    el histograma segmentado por el resultado de la viscosidad. Los conteos de cada intervalo se
+    calculan en el servidor, de modo que al navegador solo se envían 'NUM_BINS_HISTOGRAMA' barras por grupo.
 
     Args:
-        eda_data (pd.DataFrame): DataFrame que contiene los datos para el análisis.
+        version (str): Versión de los datos de entrenamiento.
+        ruta_datos (str): Ruta de los datos de entrenamiento.
+        description (pd.DataFrame): Descripción estadística de los datos, sus columnas son las variables numéricas.
     """
 
     # Seleccionar una variable numérica para el histograma
-    numeric_columns = eda_data.select_dtypes(include=["int64", "float64"]).columns
+    numeric_columns = description.columns
     hist_variable = st.selectbox("Selecciona una variable", numeric_columns)
 
     # Opción para segmentar por resultado de viscosidad
     segment_by_result = st.checkbox("Mostrar por resultado de viscosidad", value=True)
 
-    # Crear y configurar el histograma
-    histogram_params = {
-        "data_frame": eda_data,
-        "x": hist_variable,
-        "title": f"Histograma de la variable {hist_variable}",
-    }
-
-    if segment_by_result:
-        histogram_params["color"] = "resultado"
-        histogram_params["barmode"] = "group"
-        histogram_params["labels"] = {"target": "Resultado de viscosidad"}
-
-    fig = px.histogram(**histogram_params)
+    # Calcular el histograma y crear el gráfico de barras
+    histograma = agregado_eda(
+        ("histograma", hist_variable, segment_by_result),
+        calcular_histograma_eda,
+        version,
+        ruta_datos,
+        hist_variable,
+        segment_by_result,
+    )
+    fig = px.bar(
+        histograma,
+        x="centro",
+        y="conteo",
+        color="grupo" if segment_by_result else None,
+        barmode="group",
+        hover_data=["inicio", "fin"],
+        labels={"centro": hist_variable, "conteo": "count", "grupo": "Resultado de viscosidad"},
+        title=f"Histograma de la variable {hist_variable}",
+    )
+    st.caption(f"Histograma de {description.loc['count', hist_variable]:.0f} filas")
 
     # Mostrar el histograma en Streamlit
     st.plotly_chart(fig, use_container_width=True)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def plot_target_distribution(eda_data: pd.DataFrame) -> px.pie:
+def plot_target_distribution(target_counts: pd.Series) -> px.pie:
     """
     Crea un gráfico de tarta que muestra la distribución de las categorías de la variable objetivo 'target'.
 
@@ -301,23 +633,17 @@ def plot_target_distribution(eda_data: pd.DataFrame) -> px.pie:
     versus incorrecta en un conjunto de datos.
 
     Args:
-        eda_data (pd.DataFrame): DataFrame que contiene los datos, incluyendo la columna 'target'.
+        target_counts (pd.Series): Conteo de valores de la columna 'target'.
 
     Returns:
         plotly.graph_objs._figure.Figure: Un objeto de figura de Plotly que representa el gráfico de tarta.
     """
 
-    # Calcula el conteo de valores para la variable objetivo
-    target_counts = eda_data["target"].value_counts()
-
-    # Crea el gráfico de tarta
+    # Crea el gráfico de tarta con nombres descriptivos para las categorías
     pie_chart = px.pie(
-        names=target_counts.index,  # Nombres de las categorías
+        names=target_counts.index.map(MAPA_RESULTADO),  # Nombres de las categorías
         values=target_counts.values,  # Valores correspondientes a cada categoría
         title="Distribución del objetivo 'target'",  # Título del gráfico
     )
 
-    # Asigna nombres más descriptivos a las categorías
-    pie_chart.update_traces(labels=["Viscosidad correcta", "Viscosidad incorrecta"])
-
     return pie_chart
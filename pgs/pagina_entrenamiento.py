@@ -1,24 +1,26 @@
-import os
-import shutil
-import joblib
+from io import BytesIO
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 import plotly.figure_factory as ff
 import plotly.graph_objects as go
 import seaborn as sns
 import streamlit as st
 from matplotlib import pyplot as plt
-from sklearn.metrics import auc, classification_report, confusion_matrix, roc_curve
+from sklearn.metrics import (
+    accuracy_score,
+    auc,
+    classification_report,
+    confusion_matrix,
+    roc_auc_score,
+    roc_curve,
+)
 from sklearn.model_selection import train_test_split
 from xgboost import XGBClassifier
 
 from constants import (
-    ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO,
     CAPACIDAD_REACTORES,
-    RUTA_DATOS_ENTRENAMIENTO_USUARIO,
-    RUTA_MODELO_USUARIO,
-    TEMP_FOLDER,
     TOOLTIO_SUBSAMPLE,
     TOOLTIP_ALPHA,
     TOOLTIP_COLSAMPLE_BYTREE,
@@ -30,10 +32,13 @@ from constants import (
     TOOLTIP_SCALE_POS_WEIGHT,
     TOOLTIP_SEED,
     TOOLTIP_TEST_SIZE,
-    USUARIO_FOLDER,
 )
+from cache_figuras import figura_cacheada
 from data_repo import read_data
 from logger_config import logger
+from metricas import span
+from model_registry import calcular_hash_datos, publicar_version
+from reactores import codificar_reactores, indices_reactores
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -112,7 +117,6 @@ def pagina_entrenamiento() -> None:
     if st.button("Entrenar modelo"):
         if training_file is not None:
             try:
-                ruta_fichero = save_training_data(training_file)
                 train_data(
                     alpha=alpha,
                     colsample_bytree=colsample_bytree,
@@ -125,7 +129,7 @@ def pagina_entrenamiento() -> None:
                     seed=seed,
                     subsample=subsample,
                     test_size=test_size,
-                    training_file=ruta_fichero,
+                    training_file=training_file,
                     predeterminar=predeterminar,
                 )
             except Exception as e:
@@ -135,50 +139,6 @@ def pagina_entrenamiento() -> None:
             st.error("Por favor, sube un fichero de entrenamiento")
 
 
-# ----------------------------------------------------------------------------------------------------------------------
-def save_training_data(training_file: str) -> str:
-    """
-    Guarda un archivo de entrenamiento en una carpeta temporal.
-
-    Esta función realiza varias tareas para manejar el almacenamiento de un archivo de entrenamiento.
-    Se asume que 'training_file' es un objeto de tipo archivo (como el retornado por 'st.file_uploader' en Streamlit).
-
-    Parámetros:
-    - training_file: str
-        El archivo de entrenamiento a guardar. Debe ser un objeto de archivo con un método 'getbuffer'.
-
-    Return:
-    - str
-        Ruta del archivo de entrenamiento guardado.
-
-    Funcionamiento:
-    1. Verificación y manejo de la carpeta temporal:
-        - Se comprueba si existe una carpeta llamada "tmp" (temp_folder).
-        - Si la carpeta existe, se elimina junto con todo su contenido.
-        - Se crea una nueva carpeta "tmp", asegurando su existencia.
-
-    2. Guardado del archivo de entrenamiento:
-        - El archivo de entrenamiento se guarda en la carpeta "tmp" con el nombre "training.csv".
-        - Se utiliza 'os.path.join' para asegurar la correcta formación del path del archivo.
-        - Se abre el archivo en modo de escritura binaria ('wb').
-        - Se escribe el contenido del 'training_file' en el nuevo archivo usando 'getbuffer'.
-    """
-
-    # Comprobamos que existe la carpeta temporal, si no existe la creamos
-    # Si existe, borramos su contenido
-
-    if os.path.exists(TEMP_FOLDER):
-        shutil.rmtree(TEMP_FOLDER)
-    os.makedirs(TEMP_FOLDER, exist_ok=True)
-
-    # Guardamos el fichero de entrenamiento en la carpeta temporal y le cambiamos el nombre a "training.csv"
-    ruta_fichero = os.path.join(TEMP_FOLDER, ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO)
-    with open(ruta_fichero, "wb") as f:
-        f.write(training_file.getbuffer())
-
-    return ruta_fichero
-
-
 # ----------------------------------------------------------------------------------------------------------------------
 def train_data(
     alpha: float,
@@ -192,7 +152,7 @@ def train_data(
     seed: int,
     subsample: float,
     test_size: float,
-    training_file: str,
+    training_file: BytesIO,
     predeterminar: bool,
 ) -> None:
     """
@@ -201,54 +161,43 @@ def train_data(
     Parámetros:
     - alpha, colsample_bytree, gamma, learning_rate, max_depth, min_child_weight,
     n_estimators, scale_pos_weight, seed, subsample, test_size: Parámetros del modelo XGBoost.
-    - training_file: Ruta al archivo CSV que contiene los datos de entrenamiento.
+    - training_file: Fichero CSV subido con los datos de entrenamiento (el devuelto por 'st.file_uploader').
     - predeterminar: Bool que indica si se debe predeterminar el modelo y los datos después del entrenamiento.
 
     La función procesa los datos de entrenamiento, entrena el modelo de XGBoost con los parámetros especificados,
     y muestra los resultados del entrenamiento en la interfaz de usuario de Streamlit. Si 'predeterminar' es True,
     guarda el modelo y los datos de entrenamiento para uso futuro.
 
+    Los datos se leen directamente del buffer en memoria del fichero subido, sin copiarlo ni escribirlo a disco. El
+    mismo buffer sirve para calcular su hash y para guardarlo en la versión si se predetermina.
+
     No se retorna ningún valor.
     """
     # Creo un spinner para mostrar que se está entrenando el modelo
     with st.spinner("Entrenando modelo, por favor, espera..."):
-        training_data_df = pd.read_csv(training_file)
-        training_data_df["capacidad_reactor"] = training_data_df["reactor"].map(
-            CAPACIDAD_REACTORES
-        )
-        training_data_df["grado_llenado"] = (
-            (training_data_df["cantidad"] / training_data_df["capacidad_reactor"]) * 100
-        ).round(2)
-        components_df = read_data("componentes.csv")
-        training_data_df = pd.merge(
-            training_data_df,
-            components_df,
-            left_on="matcode",
-            right_on="material",
-            how="left",
-        )
-
-        # Elimino las columnas que no se van a utilizar en el entrenamiento
-        training_data_df.drop(
-            columns=[
-                "orden",
-                "fecha",
-                "matcode",
-                "capacidad_reactor",
-                "material",
-            ],
-            inplace=True,
-        )
-
-        # Separo los datos de entrenamiento en X e y
-        X = training_data_df.drop(columns=["target"])
-        y = training_data_df["target"]
-        # One-hot encoding para la columna reactor
-        X_encoded = pd.get_dummies(X, columns=["reactor"], drop_first=True)
-        # Separo los datos en train y test
-        X_train, X_test, y_train, y_test = train_test_split(
-            X_encoded, y, test_size=test_size, random_state=seed
-        )
+        with span("entrenamiento.preparar_datos"):
+            datos = training_file.getbuffer()
+            X_encoded, y = preparar_datos_entrenamiento(
+                pd.read_csv(pa.BufferReader(datos)), read_data("componentes.csv")
+            )
+            # Separo los datos en train y test
+            X_train, X_test, y_train, y_test = train_test_split(
+                X_encoded, y, test_size=test_size, random_state=seed
+            )
+
+        parametros = {
+            "alpha": alpha,
+            "colsample_bytree": colsample_bytree,
+            "gamma": gamma,
+            "learning_rate": learning_rate,
+            "max_depth": max_depth,
+            "min_child_weight": min_child_weight,
+            "n_estimators": n_estimators,
+            "scale_pos_weight": scale_pos_weight,
+            "seed": seed,
+            "subsample": subsample,
+            "test_size": test_size,
+        }
 
         xgb_clf = XGBClassifier(
             alpha=alpha,
@@ -263,14 +212,85 @@ def train_data(
             subsample=subsample,
         )
 
-        xgb_clf.fit(X_train, y_train)
+        with span("entrenamiento.fit"):
+            xgb_clf.fit(X_train, y_train)
+
+        show_trainning_results(
+            xgb_clf,
+            X_train,
+            y_train,
+            X_test,
+            y_test,
+            predeterminar,
+            parametros,
+            datos,
+        )
+
 
-        show_trainning_results(xgb_clf, X_train, y_train, X_test, y_test, predeterminar)
+# ----------------------------------------------------------------------------------------------------------------------
+def preparar_datos_entrenamiento(
+    training_data_df: pd.DataFrame, components_df: pd.DataFrame
+) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Prepara las variables del modelo a partir de los pedidos de entrenamiento: añade el grado de llenado del
+    reactor, los componentes de cada tinte y las variables indicadoras del reactor.
+
+    Parámetros:
+    - training_data_df: Pedidos de entrenamiento, con las columnas del CSV de entrenamiento.
+    - components_df: Componentes de cada tinte, leídos de 'componentes.csv'.
+
+    Return:
+    - tuple[pd.DataFrame, pd.Series]: Variables del modelo (X) y objetivo (y).
+    """
+    # 'assign' no modifica el DataFrame recibido
+    capacidad_reactor = training_data_df["reactor"].map(CAPACIDAD_REACTORES)
+    training_data_df = training_data_df.assign(
+        grado_llenado=((training_data_df["cantidad"] / capacidad_reactor) * 100).round(2)
+    )
+    training_data_df = pd.merge(
+        training_data_df,
+        components_df,
+        left_on="matcode",
+        right_on="material",
+        how="left",
+    )
+
+    # Elimino las columnas que no se van a utilizar en el entrenamiento
+    training_data_df.drop(
+        columns=[
+            "orden",
+            "fecha",
+            "matcode",
+            "material",
+        ],
+        inplace=True,
+    )
+
+    # Separo los datos de entrenamiento en X e y
+    X = training_data_df.drop(columns=["target"])
+    y = training_data_df["target"]
+    # Variables indicadoras del reactor, con las columnas definidas en REACTORES
+    X_encoded = pd.concat(
+        [
+            X.drop(columns=["reactor"]).reset_index(drop=True),
+            codificar_reactores(indices_reactores(X["reactor"])),
+        ],
+        axis=1,
+    )
+    return X_encoded, y.reset_index(drop=True)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
+@span("entrenamiento.resultados")
 def show_trainning_results(
-    model, X_train, y_train, X_test, y_test, predeterminar: bool
+    model,
+    X_train,
+    y_train,
+    X_test,
+    y_test,
+    predeterminar: bool,
+    parametros: dict,
+    datos: memoryview,
 ):
     """
     Muestra los resultados del entrenamiento de un modelo en la interfaz de usuario de Streamlit.
@@ -280,6 +300,8 @@ def show_trainning_results(
     - X_train, y_train: Datos de entrenamiento y sus etiquetas.
     - X_test, y_test: Datos de prueba y sus etiquetas.
     - predeterminar: Bool que indica si se debe guardar el modelo y los datos de entrenamiento.
+    - parametros: Parámetros de entrenamiento, se guardan en los metadatos de la versión.
+    - datos: Buffer del fichero CSV subido con los datos de entrenamiento.
 
     Esta función visualiza el reporte de clasificación, la matriz de confusión y las curvas ROC y AUC.
     Si 'predeterminar' es True, también guarda el modelo y los datos de entrenamiento.
@@ -301,14 +323,21 @@ def show_trainning_results(
             show_confusion_matrix(y_test, y_pred)
 
     with st.expander("Curvas ROC y AUC", expanded=True):
-        fig = plot_ROC_AUC_curves(
-            model, X_train, y_train, X_test, y_test, model_name="XGBoost"
+        # El entrenamiento es determinista, así que los datos y los parámetros identifican las curvas
+        fig = figura_cacheada(
+            "curvas_roc",
+            calcular_hash_datos(datos),
+            parametros,
+            lambda: plot_ROC_AUC_curves(
+                model, X_train, y_train, X_test, y_test, model_name="XGBoost"
+            ),
         )
         st.plotly_chart(fig, use_container_width=True)
 
     if predeterminar:
         try:
-            save_user_data_model(model)
+            metricas = calcular_metricas(model, X_train, y_train, X_test, y_test)
+            save_user_data_model(model, datos, parametros, metricas)
         except Exception as e:
             logger.error(e)
             st.error(f"Error: {e}")
@@ -318,36 +347,46 @@ def show_trainning_results(
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def save_user_data_model(model):
+def calcular_metricas(model, X_train, y_train, X_test, y_test) -> dict:
+    """
+    Calcula las métricas del modelo que se guardan en los metadatos de la versión publicada.
+    """
+    test_probs = model.predict_proba(X_test)[:, 1]
+    return {
+        "accuracy_test": round(float(accuracy_score(y_test, model.predict(X_test))), 4),
+        "auc_train": round(
+            float(roc_auc_score(y_train, model.predict_proba(X_train)[:, 1])), 4
+        ),
+        "auc_test": round(float(roc_auc_score(y_test, test_probs)), 4),
+    }
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def save_user_data_model(
+    model, datos: memoryview, parametros: dict, metricas: dict
+) -> str:
     """
-    Guarda el modelo entrenado y los datos de entrenamiento en una ubicación específica.
+    Publica el modelo entrenado y los datos de entrenamiento como una nueva versión del registro del usuario
+    que ha iniciado sesión. El resto de usuarios siguen usando sus propios modelos.
 
     Parámetros:
     - model: El modelo de XGBoost entrenado.
+    - datos: Buffer del fichero CSV subido con los datos de entrenamiento.
+    - parametros: Parámetros de entrenamiento del modelo.
+    - metricas: Métricas obtenidas en el entrenamiento.
 
-    Esta función guarda el modelo en la carpeta 'user_data' y los datos de entrenamiento en una carpeta temporal.
-    Se utilizan las rutas definidas en las constantes del módulo.
+    La versión se escribe en un directorio nuevo y después se activa, de modo que las predicciones en curso
+    nunca ven un modelo a medio escribir y las versiones anteriores se pueden restaurar desde la página de
+    administración.
 
-    No se retorna ningún valor.
+    Los datos se escriben una sola vez, directamente desde memoria en el directorio de la versión.
+
+    Return:
+    - str: Identificador de la versión publicada.
     """
-    # El archivo de entrenamiento se guarda en la carpeta "tmp" con el nombre "datos_entrenamiento.csv".
-    # lo guardo en la carpeta user_data
-    ruta_fichero_tmp = os.path.join(TEMP_FOLDER, ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO)
-
-    # Compruebo si existe la carpeta user_data, si no existe la creo
-    if not os.path.exists(USUARIO_FOLDER):
-        os.makedirs(USUARIO_FOLDER, exist_ok=True)
-
-    # Si existen los datos de entrenamiento en la carpeta user_data, los borro
-    if os.path.exists(RUTA_DATOS_ENTRENAMIENTO_USUARIO):
-        os.remove(RUTA_DATOS_ENTRENAMIENTO_USUARIO)
-    # Si existe el modelo en la carpeta user_data, lo borro
-    if os.path.exists(RUTA_MODELO_USUARIO):
-        os.remove(RUTA_MODELO_USUARIO)
-
-    shutil.copyfile(ruta_fichero_tmp, RUTA_DATOS_ENTRENAMIENTO_USUARIO)
-    # Guardamos el modelo en la carpeta user_data usando joblib
-    joblib.dump(model, RUTA_MODELO_USUARIO)
+    return publicar_version(
+        st.session_state["username"], model, datos, parametros, metricas
+    )
 
 
 # ----------------------------------------------------------------------------------------------------------------------
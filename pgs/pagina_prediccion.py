@@ -1,12 +1,23 @@
-import os
-import joblib
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 
-from constants import CAPACIDAD_REACTORES, RUTA_MODELO, RUTA_MODELO_USUARIO
-from data_repo import get_tintes, read_data
+from auditoria_predicciones import Cronometro, registrar_prediccion
+from constants import CANTIDAD_MAXIMA_PEDIDO
+from data_repo import cargar_componentes, get_tintes
 from logger_config import logger
+from metricas import span
+from model_registry import cargar_modelo
+from optimizador_lotes import optimizar_division, probabilidad_combinada
+from reactores import (
+    CAPACIDADES,
+    NOMBRES_REACTORES,
+    calcular_grados_llenado,
+    crear_matriz_features,
+    indices_reactores,
+    predecir_probabilidades,
+)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -28,6 +39,12 @@ def pagina_prediccion() -> None:
         st.warning("Inicia sesión para acceder a la predicción")
         return
 
+    # Los pedidos que superan la capacidad de los reactores solo se pueden planificar dividiéndolos en lotes
+    dividir = st.checkbox(
+        "Dividir el pedido en varios lotes",
+        help="Busca la división del pedido entre los reactores con menor probabilidad combinada de viscosidad incorrecta",
+    )
+
     # Creo dos columnas para aprovechar el espacio,
     # quiero que la primera columna tenga el doble de ancho que la segunda
     col1, col2 = st.columns([2, 1])
@@ -39,7 +56,7 @@ def pagina_prediccion() -> None:
         cantidad = st.number_input(
             "Cantidad de tinte a producir (Kg):",
             min_value=1,
-            max_value=3000,
+            max_value=CANTIDAD_MAXIMA_PEDIDO if dividir else int(CAPACIDADES.max()),
             value=1,
             step=1,
         )
@@ -51,6 +68,7 @@ def pagina_prediccion() -> None:
         max_value=50,
         value=0,
         step=1,
+        disabled=dividir,
     )
 
     # Pongo un botón para ejecutar la predicción alineado a la derecha
@@ -59,7 +77,10 @@ def pagina_prediccion() -> None:
         with st.spinner("Prediciendo..."):
             try:
                 # Ejecuto la predicción
-                run_prediccion(tinte, cantidad, rango)
+                if dividir:
+                    run_division(tinte, cantidad)
+                else:
+                    run_prediccion(tinte, cantidad, rango)
                 # Muestro animación de éxito
                 st.balloons()
             except Exception as e:
@@ -70,7 +91,7 @@ def pagina_prediccion() -> None:
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def grado_llenado(cantidad: int, show_warning=True) -> tuple[float, float, float]:
+def grado_llenado(cantidad: int, show_warning=True) -> np.ndarray:
     """En esta función validamos la cantidad de tinte a producir,
     a su vez, devolveremos el grado de llenado para cada uno de los reactores.
 
@@ -78,75 +99,47 @@ def grado_llenado(cantidad: int, show_warning=True) -> tuple[float, float, float
         cantidad (int): Cantidad de tinte a producir en Kg
 
     Returns:
-        tuple[float, float, float]: Grado de llenado para cada uno de los reactores, grande, mediano, pequeño
+        np.ndarray: Grado de llenado para cada uno de los reactores, en el orden de 'REACTORES'.
+        Es 0 en los reactores cuya capacidad se supera.
 
     """
-    grados_llenado = {}
-    for reactor, capacidad in CAPACIDAD_REACTORES.items():
-        if cantidad <= capacidad:
-            grados_llenado[reactor] = round((cantidad / capacidad) * 100, 2)
-        else:
-            grados_llenado[reactor] = 0
-            if show_warning:
-                st.warning(
-                    f"La cantidad de tinte a producir supera la capacidad del reactor {reactor}"
-                )
-
-    return (
-        grados_llenado["grande"],
-        grados_llenado["mediano"],
-        grados_llenado["pequeño"],
-    )
+    grados_llenado = calcular_grados_llenado(cantidad)[0]
+
+    if show_warning:
+        for reactor in np.array(NOMBRES_REACTORES)[grados_llenado == 0]:
+            st.warning(
+                f"La cantidad de tinte a producir supera la capacidad del reactor {reactor}"
+            )
+
+    return grados_llenado
 
 
 # ----------------------------------------------------------------------------------------------------------------------
 def crear_df_reactores(
-    components: pd.DataFrame, grados_llenado: tuple[float, float, float], cantidad: int
-) -> list[pd.DataFrame]:
+    components: pd.DataFrame, grados_llenado: np.ndarray, cantidad: int
+) -> pd.DataFrame:
     """
-    Genera una lista de DataFrames con características adicionales para cada reactor.
+    Genera un DataFrame con las variables del modelo para cada reactor en el que cabe la cantidad.
 
     :param components: DataFrame con los componentes.
-    :param grados_llenado: Tuple con los grados de llenado para cada reactor.
-    :param cantidad: Cantidad a añadir en cada DataFrame.
-    :return: Lista con tres DataFrames, uno para cada reactor.
+    :param grados_llenado: Array con los grados de llenado para cada reactor.
+    :param cantidad: Cantidad a añadir en cada fila.
+    :return: DataFrame con una fila por reactor válido y la columna 'reactor' con su nombre.
     """
-    # Nombres de las columnas adicionales
-    columnas_reactor = ["reactor_mediano", "reactor_pequeño"]
-
-    # Inicializar los DataFrames resultantes
-    dfs = []
-
-    for i, grado_llenado in enumerate(grados_llenado):
-        df_temp = components.copy()
-        # Establecer las columnas del reactor
-        df_temp["reactor_mediano"] = int(i == 1)
-        df_temp["reactor_pequeño"] = int(i == 2)
-        # Añadir grado de llenado y cantidad
-        df_temp["grado_llenado"] = grado_llenado
-        # En el caso que el grado de llenado sea 0, el dataframe es None
-        if grado_llenado == 0:
-            dfs.append(None)
-            continue
-        df_temp["cantidad"] = cantidad
-        # Reordenar las columnas
-        columnas_ordenadas = ["cantidad", "grado_llenado"] + [
-            col for col in df_temp.columns if col not in ["cantidad", "grado_llenado"]
-        ]
-        dfs.append(df_temp[columnas_ordenadas])
-
-    return dfs
+    # Los reactores con grado de llenado 0 no tienen capacidad suficiente y se descartan
+    indices = np.flatnonzero(grados_llenado > 0)
+    return crear_matriz_features(components, np.full(len(indices), cantidad), indices)
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def mostrar_resultado_sin_rango(dfs: list[pd.DataFrame], tinte: str) -> None:
+def mostrar_resultado_sin_rango(df: pd.DataFrame, tinte: str) -> None:
     """
     Muestra la probabilidad de viscosidad para un tinte dado.
 
     Parameters
     ----------
-    dfs : list[pd.DataFrame]
-        Una lista de DataFrames que contienen información sobre la probabilidad de viscosidad para el tinte dado.
+    df : pd.DataFrame
+        DataFrame con una fila por reactor y la probabilidad de viscosidad para el tinte dado.
     tinte : str
         El nombre del tinte para el cual se desea mostrar la probabilidad de viscosidad.
 
@@ -155,23 +148,11 @@ def mostrar_resultado_sin_rango(dfs: list[pd.DataFrame], tinte: str) -> None:
     None
     """
     st.markdown(f"**Probabilidad de viscosidad para el tinte {tinte}**")
-    # Concatenamos los DataFrames
-    df = pd.concat(dfs)
-    # Ordenamos por probabilidad descendente
+    # Ordenamos por probabilidad ascendente, el primer reactor es el recomendado
     df = df.sort_values(by=["probabilidad"])
 
-    # Si reactor_mediano y reactor_pequeño son 0, creamos una columna de nombre reactor que tenga el valor Grande
-    # Si reactor_mediano es 1, creamos una columna de nombre reactor que tenga el valor Mediano
-    # Si reactor_pequeño es 1, creamos una columna de nombre reactor que tenga el valor Pequeño
-    df["reactor"] = df.apply(
-        lambda x: ["Grande", "Mediano", "Pequeño"][
-            int(x["reactor_mediano"]) + int(x["reactor_pequeño"]) * 2
-        ],
-        axis=1,
-    )
-
     for i, row in enumerate(df.itertuples(index=False)):
-        message = f"Reactor {row.reactor}: {row.probabilidad:.2f}% de probabilidad de viscosidad negativa"
+        message = f"Reactor {row.reactor.capitalize()}: {row.probabilidad:.2f}% de probabilidad de viscosidad negativa"
         if i == 0:
             st.success(message)
             logger.info(message)
@@ -180,46 +161,37 @@ def mostrar_resultado_sin_rango(dfs: list[pd.DataFrame], tinte: str) -> None:
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def mostrar_resultado_con_rango(
-    dfs: list[pd.DataFrame], tinte: str, variable: str
-) -> None:
+def mostrar_resultado_con_rango(df: pd.DataFrame, tinte: str, variable: str) -> None:
     """
     Plots the probability of negative viscosity for a given dye, based on the amount produced,
     and prints the minimum probability for each reactor with the corresponding variable value.
 
     Args:
-        dfs (list[pd.DataFrame]): A list of pandas DataFrames containing the probability of negative viscosity
-            for each reactor, sorted by the amount of dye produced.
+        df (pd.DataFrame): DataFrame with the probability of negative viscosity for each reactor
+            and value of the variable.
         tinte (str): The name of the dye being produced.
+        variable (str): The variable whose range was evaluated.
     """
-    # Ordenamos por cantidad y preparamos los trazos de los gráficos
-    trazos = []
-    nombres_reactores = ["Reactor Grande", "Reactor Mediano", "Reactor Pequeño"]
-
-    for i, df in enumerate(dfs):
-        if df is not None:
-            df_sorted = df.sort_values(by=[variable])
-            dfs[i] = df_sorted
-
-            # Agregar trazo al gráfico
-            trazo = go.Scatter(
-                x=df_sorted[variable],
-                y=df_sorted["probabilidad"],
-                mode="lines",
-                name=nombres_reactores[i],
-            )
-            trazos.append(trazo)
-
-            # Encontrar el mínimo de probabilidad y el valor correspondiente de la variable
-            min_prob = df_sorted["probabilidad"].min()
-            valor_variable_min_prob = df_sorted[df_sorted["probabilidad"] == min_prob][
-                variable
-            ].iloc[0]
-
-            # Mostrar esta información
-            logger.info(
-                f"{nombres_reactores[i]}: Probabilidad mínima de {min_prob}% a {valor_variable_min_prob} Kg de {tinte}"
-            )
+    df = df.sort_values(by=[variable])
+
+    # Un trazo por reactor, en el orden en que están definidos
+    trazos = [
+        go.Scatter(
+            x=df_reactor[variable],
+            y=df_reactor["probabilidad"],
+            mode="lines",
+            name=f"Reactor {reactor.capitalize()}",
+        )
+        for reactor, df_reactor in df.groupby("reactor", sort=False)
+    ]
+
+    # Mínimo de probabilidad de cada reactor y el valor correspondiente de la variable
+    minimos = df.loc[df.groupby("reactor", sort=False)["probabilidad"].idxmin()]
+    for row in minimos.itertuples(index=False):
+        logger.info(
+            f"Reactor {row.reactor.capitalize()}: Probabilidad mínima de {row.probabilidad}% "
+            f"a {getattr(row, variable)} Kg de {tinte}"
+        )
 
     # Crear figura con los trazos
     fig = go.Figure(data=trazos)
@@ -235,59 +207,71 @@ def mostrar_resultado_con_rango(
 
 # ----------------------------------------------------------------------------------------------------------------------
 def predecir_viscosidad(
-    dfs: list[pd.DataFrame],
+    df: pd.DataFrame,
     model,
     variable: str,
     valor_medio: float,
     rango: int,
-):
+) -> pd.DataFrame:
     """
-    Predice la probabilidad de viscosidad para cada reactor y actualiza los DataFrames.
+    Predice la probabilidad de viscosidad para cada reactor, y para cada valor del rango si se indica.
 
-    :param dfs: Lista de DataFrames correspondientes a cada reactor.
+    Todas las combinaciones de reactor y valor se construyen como una única matriz y se evalúan con una sola
+    llamada al modelo.
+
+    :param df: DataFrame con una fila por reactor, creado con 'crear_df_reactores'.
     :param model: Modelo para la predicción.
     :param variable: Nombre de la variable a aplicar el rango
     :param valor_medio: Valor medio de la variable a crear el rango
     :param rango: Rango de variación de la variable.
-    :param grado_llenado: Función para calcular el grado de llenado.
+    :return: DataFrame con la columna 'probabilidad'.
     """
-    for i, df in enumerate(dfs):
-        if df is not None:
-            # Predecir probabilidad inicial
-            df["probabilidad_valor_medio"] = (
-                model.predict_proba(df)[:, 1] * 100
-            ).round(2)
-
-            if rango > 0:
-                for j in range(int(valor_medio) - rango, int(valor_medio) + rango + 1):
-                    if (
-                        i == 0
-                        or (
-                            j <= CAPACIDAD_REACTORES[["mediano", "pequeño"][i - 1]]
-                            and variable == "cantidad"
-                        )
-                    ) or variable != "cantidad":
-                        df_temp = df.copy()
-                        if variable == "cantidad":
-                            df_temp[variable] = j
-                            df_temp["grado_llenado"] = grado_llenado(
-                                j, show_warning=False
-                            )[i]
-                        else:
-                            df_temp[variable] = j
-
-                        # Concatenar con el DataFrame principal
-                        dfs[i] = pd.concat([dfs[i], df_temp])
-
-            # Calcular la probabilidad final
-            dfs[i]["probabilidad"] = (
-                model.predict_proba(dfs[i].drop(columns=["probabilidad_valor_medio"]))[
-                    :, 1
-                ]
-                * 100
-            ).round(2)
-
-    return dfs
+    if rango > 0:
+        valores = np.arange(int(valor_medio) - rango, int(valor_medio) + rango + 1)
+        n_reactores = len(df)
+
+        # Producto cartesiano de reactores y valores de la variable
+        df = df.loc[df.index.repeat(len(valores))].reset_index(drop=True)
+        df[variable] = np.tile(valores, n_reactores)
+
+        if variable == "cantidad":
+            # Recalculamos el grado de llenado y descartamos las cantidades que no caben en el reactor
+            capacidades = CAPACIDADES[indices_reactores(df["reactor"])]
+            df["grado_llenado"] = np.round(df["cantidad"] / capacidades * 100, 2)
+            df = df[(df["cantidad"] > 0) & (df["cantidad"] <= capacidades)]
+
+    df = df.copy()
+    df["probabilidad"] = predecir_probabilidades(model, df)
+
+    return df
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def obtener_componentes_tinte(tinte: str) -> pd.DataFrame | None:
+    """
+    Devuelve los componentes del tinte seleccionado, o None si no se encuentran.
+
+    Args:
+        tinte (str): El tinte seleccionado, empieza por su código de material.
+
+    Returns:
+        pd.DataFrame | None: DataFrame de una fila con los componentes del tinte.
+    """
+    componentes_df = cargar_componentes()
+
+    # Selecciono el tinte que se eligió en el selectbox
+    # y filtro el DataFrame de componentes por ese tinte
+    componentes_df = componentes_df.loc[
+        componentes_df["material"] == int(tinte[:6])
+    ].drop("material", axis=1)
+
+    # Compruebo que el DataFrame de componentes no esté vacío
+    if componentes_df.empty:
+        logger.error("No se encontraron componentes para el tinte seleccionado")
+        st.error("No se encontraron componentes para el tinte seleccionado")
+        return None
+
+    return componentes_df
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -308,41 +292,84 @@ def run_prediccion(tinte: str, cantidad: int, rango: int) -> None:
         f"Predicción para el tinte {tinte} con {cantidad} Kg con rango {rango} %"
     )
 
-    componentes_df = read_data("componentes.csv")
-    # Rest of the code...
+    # Cada predicción se registra en la auditoría con su resultado y la latencia de cada etapa, también si falla
+    usuario = st.session_state["username"]
+    cronometro = Cronometro()
+    version = df_resultado = None
+    estado = "error"
+    try:
+        componentes_df = obtener_componentes_tinte(tinte)
+        cronometro.marcar("componentes")
+        if componentes_df is None:
+            estado = "sin_componentes"
+            return
+
+        # Calculo el grado de llenado para cada uno de los reactores
+        grados_llenado = grado_llenado(cantidad)
+        # Creo las variables del modelo para cada reactor
+        df_reactores = crear_df_reactores(componentes_df, grados_llenado, cantidad)
+        cronometro.marcar("features")
+
+        # Cargamos el modelo activo del usuario, si no tiene ninguno el compartido o el modelo por defecto.
+        # Los modelos se mantienen en un pool en memoria, así que normalmente no se leen de disco
+        loaded_model, version = cargar_modelo(usuario)
+        cronometro.marcar("modelo")
+
+        # El valor del rango es un %, lo transformamos a un valor absoluto y lo redondeamos
+        rango_kg = round(cantidad * (rango / 100))
+
+        # Predecimos la probabilidad de viscosidad para cada reactor
+        df_resultado = predecir_viscosidad(
+            df_reactores, loaded_model, "cantidad", cantidad, rango_kg
+        )
+        cronometro.marcar("prediccion")
 
-    # Selecciono el tinte que se eligió en el selectbox
-    # y filtro el DataFrame de componentes por ese tinte
-    componentes_df = componentes_df.loc[
-        componentes_df["material"] == int(tinte[:6])
-    ].drop("material", axis=1)
+        if rango == 0:
+            mostrar_resultado_sin_rango(df_resultado, tinte)
+        else:
+            mostrar_resultado_con_rango(df_resultado, tinte, "cantidad")
+        cronometro.marcar("presentacion")
+        estado = "ok"
+    finally:
+        # Un fallo de la auditoría se registra en el log, no sustituye al resultado ni al error de la predicción
+        try:
+            registrar_prediccion(
+                usuario, tinte, cantidad, rango, version, estado, df_resultado, cronometro
+            )
+        except Exception as e:
+            logger.error(f"Error al registrar la predicción en la auditoría: {e}")
 
-    # Compruebo que el DataFrame de componentes no esté vacío
-    if componentes_df.empty:
-        logger.error("No se encontraron componentes para el tinte seleccionado")
-        st.error("No se encontraron componentes para el tinte seleccionado")
-        return
 
-    # Calculo el grado de llenado para cada uno de los reactores
-    grados_llenado = grado_llenado(cantidad)
-    # Creo los DataFrames para cada reactor
-    dfs = crear_df_reactores(componentes_df, grados_llenado, cantidad)
-
-    # Cargamos el modelo
-    # Si existe el model de usuario, cargamos el modelo de usuario, si no el modelo por defecto
-    if os.path.isfile(RUTA_MODELO_USUARIO):
-        loaded_model = joblib.load(RUTA_MODELO_USUARIO)
-    else:
-        loaded_model = joblib.load(RUTA_MODELO)
-
-    if rango == 0:
-        predecir_viscosidad(dfs, loaded_model, "cantidad", cantidad, rango)
-        mostrar_resultado_sin_rango(dfs, tinte)
+# ----------------------------------------------------------------------------------------------------------------------
+@span("prediccion.division")
+def run_division(tinte: str, cantidad: int) -> None:
+    """
+    Busca y muestra la mejor división del pedido en lotes entre los reactores.
+
+    Args:
+        tinte (str): The selected tinte.
+        cantidad (int): The amount of tinte.
+    """
+    logger.info(f"División en lotes para el tinte {tinte} con {cantidad} Kg")
+
+    componentes_df = obtener_componentes_tinte(tinte)
+    if componentes_df is None:
         return
 
-    # El valor del rango es un %, lo transformamos a un valor absoluto y lo redondeamos
-    rango = round(cantidad * (rango / 100))
+    loaded_model, _ = cargar_modelo(st.session_state["username"])
+    lotes, resumen = optimizar_division(loaded_model, componentes_df, cantidad)
+
+    message = (
+        f"División recomendada en {len(lotes)} lotes: {probabilidad_combinada(lotes['probabilidad']):.2f}% "
+        f"de probabilidad de viscosidad negativa en algún lote"
+    )
+    st.success(message)
+    logger.info(message)
 
-    # Predecimos la probabilidad de viscosidad para cada reactor
-    dfs = predecir_viscosidad(dfs, loaded_model, "cantidad", cantidad, rango)
-    mostrar_resultado_con_rango(dfs, tinte, "cantidad")
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.markdown(f"**Lotes para el tinte {tinte}**")
+        st.dataframe(lotes, hide_index=True, use_container_width=True)
+    with col2:
+        st.markdown("**Mejor probabilidad por número de lotes**")
+        st.dataframe(resumen, hide_index=True, use_container_width=True)
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from constants import REACTORES
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Operaciones vectorizadas sobre los reactores definidos en 'REACTORES'
+#
+# Todas las funciones trabajan con arrays de forma (n_cantidades, n_reactores) o con índices de reactor, de modo que
+# el coste no crece con bucles de Python al añadir reactores a la planta.
+# ----------------------------------------------------------------------------------------------------------------------
+NOMBRES_REACTORES = [reactor["nombre"] for reactor in REACTORES]
+CAPACIDADES = np.array([reactor["capacidad"] for reactor in REACTORES], dtype=float)
+COLUMNAS_REACTOR = [reactor["columna"] for reactor in REACTORES if reactor["columna"]]
+
+# Matriz de codificación (n_reactores, n_columnas): cada fila son las variables indicadoras de un reactor
+MATRIZ_CODIFICACION = np.array(
+    [
+        [int(reactor["columna"] == columna) for columna in COLUMNAS_REACTOR]
+        for reactor in REACTORES
+    ],
+    dtype=int,
+).reshape(len(REACTORES), len(COLUMNAS_REACTOR))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def calcular_grados_llenado(cantidades) -> np.ndarray:
+    """
+    Calcula el grado de llenado (%) de cada reactor para cada cantidad.
+
+    Args:
+        cantidades: Escalar o array de cantidades en Kg.
+
+    Returns:
+        np.ndarray: Array (n_cantidades, n_reactores) con el grado de llenado, 0 si la cantidad supera
+        la capacidad del reactor o no es positiva.
+    """
+    cantidades = np.atleast_1d(np.asarray(cantidades, dtype=float))[:, np.newaxis]
+    grados = np.round(cantidades / CAPACIDADES * 100, 2)
+    return np.where((cantidades > 0) & (cantidades <= CAPACIDADES), grados, 0.0)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def indices_reactores(nombres: pd.Series) -> np.ndarray:
+    """
+    Convierte una serie de nombres de reactor en sus índices dentro de 'REACTORES'.
+
+    Raises:
+        ValueError: Si algún nombre no corresponde a ningún reactor definido.
+    """
+    indices = pd.Categorical(nombres, categories=NOMBRES_REACTORES).codes
+    if (indices < 0).any():
+        desconocidos = sorted(set(nombres[indices < 0].astype(str)))
+        raise ValueError(f"Reactores no definidos: {', '.join(desconocidos)}")
+    return indices
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def codificar_reactores(indices: np.ndarray) -> pd.DataFrame:
+    """
+    Devuelve las variables indicadoras de los reactores indicados, con las columnas que espera el modelo.
+
+    Args:
+        indices (np.ndarray): Índices de reactor, uno por fila.
+    """
+    return pd.DataFrame(MATRIZ_CODIFICACION[indices], columns=COLUMNAS_REACTOR)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def crear_matriz_features(
+    componentes: pd.DataFrame, cantidades: np.ndarray, indices: np.ndarray
+) -> pd.DataFrame:
+    """
+    Construye la matriz de variables del modelo para un tinte, con una fila por pareja (cantidad, reactor).
+
+    Args:
+        componentes (pd.DataFrame): DataFrame de una fila con los componentes del tinte.
+        cantidades (np.ndarray): Cantidad de cada fila.
+        indices (np.ndarray): Índice del reactor de cada fila.
+
+    Returns:
+        pd.DataFrame: Variables del modelo más la columna 'reactor' con el nombre del reactor.
+    """
+    cantidades = np.asarray(cantidades, dtype=float)
+    indices = np.asarray(indices, dtype=int)
+    n_filas = len(cantidades)
+
+    grados = np.round(cantidades / CAPACIDADES[indices] * 100, 2)
+    valores_componentes = np.repeat(componentes.to_numpy()[:1], n_filas, axis=0)
+
+    df = pd.concat(
+        [
+            pd.DataFrame({"cantidad": cantidades, "grado_llenado": grados}),
+            pd.DataFrame(valores_componentes, columns=componentes.columns).astype(
+                componentes.dtypes.to_dict()
+            ),
+            codificar_reactores(indices),
+        ],
+        axis=1,
+    )
+    df["reactor"] = np.array(NOMBRES_REACTORES, dtype=object)[indices]
+    return df
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def predecir_probabilidades(model, df: pd.DataFrame) -> np.ndarray:
+    """
+    Calcula la probabilidad (%) de viscosidad incorrecta de cada fila con una única llamada al modelo.
+    Las columnas se ordenan según las variables con las que se entrenó el modelo. XGBoost devuelve float32, se pasa
+    a float64 antes de escalar y redondear para que los porcentajes no arrastren error de precisión simple.
+    """
+    probabilidades = model.predict_proba(df[list(model.feature_names_in_)])[:, 1]
+    return np.round(probabilidades.astype(np.float64) * 100, 2)
@@ -0,0 +1,156 @@
+import argparse
+import os
+import re
+import time
+import uuid
+
+import joblib
+import streamlit as st
+
+from constants import CARPETA_SNAPSHOTS_EDA
+from data_repo import (
+    calcular_caja_eda,
+    calcular_conteo_reactor,
+    calcular_conteo_target,
+    calcular_correlacion_eda,
+    calcular_cubo_eda,
+    calcular_descripcion_eda,
+    calcular_histograma_eda,
+    calcular_opciones_filtro,
+    resolver_datos_entrenamiento,
+)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Snapshot del EDA
+#
+# Un snapshot contiene todos los agregados que muestra la página de EDA para una versión de los datos de
+# entrenamiento: conteos, descripción estadística, correlaciones, cubo de defectos, opciones de filtro y el
+# histograma y el diagrama de caja de cada variable numérica. Se genera una vez por versión con este script y la
+# página lo lee de disco en lugar de recalcular. Las vistas que dependen de parejas de variables elegidas por el
+# usuario (densidad y dispersión) y la tabla paginada se siguen calculando al momento.
+#
+# Uso: python -m snapshot_eda [--usuario USUARIO] [--forzar]
+# ----------------------------------------------------------------------------------------------------------------------
+def ruta_snapshot(version: str) -> str:
+    """
+    Devuelve la ruta del snapshot de una versión de los datos.
+    """
+    return os.path.join(CARPETA_SNAPSHOTS_EDA, re.sub(r"[^\w.-]", "_", version) + ".joblib")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def generar_snapshot(version: str, ruta_datos: str) -> dict:
+    """
+    Calcula todos los agregados del EDA de una versión de los datos.
+
+    Args:
+        version (str): Versión de los datos devuelta por 'resolver_datos_entrenamiento'.
+        ruta_datos (str): Ruta de los datos de entrenamiento.
+
+    Returns:
+        dict: Snapshot con la versión, la fecha, la duración del cálculo y los agregados. Las claves de los
+        agregados son tuplas con el nombre del agregado y sus parámetros.
+    """
+    inicio = time.perf_counter()
+
+    descripcion = calcular_descripcion_eda(version, ruta_datos)
+    agregados = {
+        ("descripcion",): descripcion,
+        ("conteo_target",): calcular_conteo_target(version, ruta_datos),
+        ("conteo_reactor",): calcular_conteo_reactor(version, ruta_datos),
+        ("correlacion",): calcular_correlacion_eda(version, ruta_datos),
+        ("cubo",): calcular_cubo_eda(version, ruta_datos),
+        ("opciones_filtro",): calcular_opciones_filtro(version, ruta_datos),
+    }
+    for variable in descripcion.columns:
+        for segmentar in (True, False):
+            agregados[("histograma", variable, segmentar)] = calcular_histograma_eda(
+                version, ruta_datos, variable, segmentar
+            )
+        agregados[("caja", variable)] = calcular_caja_eda(version, ruta_datos, variable)
+
+    return {
+        "version": version,
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "duracion_s": round(time.perf_counter() - inicio, 2),
+        "agregados": agregados,
+    }
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def guardar_snapshot(snapshot: dict) -> str:
+    """
+    Guarda un snapshot en disco. Se escribe en un fichero temporal que después sustituye al definitivo, de modo
+    que la página nunca lee un snapshot a medio escribir.
+
+    Returns:
+        str: Ruta del snapshot.
+    """
+    ruta = ruta_snapshot(snapshot["version"])
+    os.makedirs(CARPETA_SNAPSHOTS_EDA, exist_ok=True)
+
+    ruta_temporal = f"{ruta}.{uuid.uuid4().hex}.tmp"
+    joblib.dump(snapshot, ruta_temporal)
+    os.replace(ruta_temporal, ruta)
+
+    return ruta
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def obtener_snapshot(version: str) -> dict | None:
+    """
+    Devuelve el snapshot de una versión de los datos, o None si no se ha generado.
+    """
+    ruta = ruta_snapshot(version)
+    if not os.path.isfile(ruta):
+        return None
+    return cargar_snapshot(version, os.path.getmtime(ruta))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_resource(max_entries=4, show_spinner=False)
+def cargar_snapshot(version: str, fecha_modificacion: float) -> dict:
+    """
+    Lee un snapshot de disco, cacheado por versión y fecha de modificación para detectar cuándo se regenera.
+    El snapshot se comparte entre sesiones sin copiarlo, hay que tratarlo como de solo lectura.
+    """
+    return joblib.load(ruta_snapshot(version))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def main(usuario: str | None = None, forzar: bool = False) -> None:
+    """
+    Genera el snapshot de los datos de entrenamiento que ve un usuario, si no existe ya para su versión.
+    """
+    version, ruta_datos = resolver_datos_entrenamiento(usuario)
+    ruta = ruta_snapshot(version)
+
+    if os.path.isfile(ruta) and not forzar:
+        print(f"El snapshot de la versión {version} ya existe: {ruta}")
+        return
+
+    snapshot = generar_snapshot(version, ruta_datos)
+    guardar_snapshot(snapshot)
+    print(
+        f"Snapshot de la versión {version} generado en {snapshot['duracion_s']} s: "
+        f"{ruta} ({os.path.getsize(ruta)} bytes, {len(snapshot['agregados'])} agregados)"
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Genera el snapshot del EDA de la versión actual de los datos de entrenamiento"
+    )
+    parser.add_argument(
+        "--usuario",
+        default=None,
+        help="Usuario cuyos datos se analizan, por defecto los del registro compartido",
+    )
+    parser.add_argument(
+        "--forzar", action="store_true", help="Regenera el snapshot aunque ya exista"
+    )
+    args = parser.parse_args()
+
+    main(args.usuario, args.forzar)
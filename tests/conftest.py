@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos de la aplicación están en la raíz del repositorio y usan rutas relativas a ella
+RAIZ_REPOSITORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_REPOSITORIO)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.fixture(scope="session", autouse=True)
+def carpeta_repositorio():
+    """
+    Ejecuta las pruebas desde la raíz del repositorio, como la aplicación, aunque pytest se lance desde otra carpeta.
+    """
+    carpeta_inicial = os.getcwd()
+    os.chdir(RAIZ_REPOSITORIO)
+    yield
+    os.chdir(carpeta_inicial)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.fixture
+def modelo_defecto():
+    """
+    Modelo por defecto de 'static_data'.
+    """
+    from constants import RUTA_ESQUEMA, RUTA_MODELO_NATIVO
+    from model_format import cargar_modelo_fichero
+
+    return cargar_modelo_fichero(
+        os.path.join(RAIZ_REPOSITORIO, RUTA_MODELO_NATIVO),
+        os.path.join(RAIZ_REPOSITORIO, RUTA_ESQUEMA),
+    )
@@ -0,0 +1,45 @@
+from cache_lru import CacheLRU
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_expulsa_el_elemento_usado_hace_mas_tiempo():
+    cache = CacheLRU(100, "modelos")
+    cache.obtener("a", lambda: "A", 40)
+    cache.obtener("b", lambda: "B", 40)
+    # Usar 'a' la convierte en la más reciente, así que al añadir 'c' se expulsa 'b'
+    assert cache.obtener("a", lambda: "otro", 40) == "A"
+    cache.obtener("c", lambda: "C", 40)
+
+    cargados = []
+    assert cache.obtener("a", lambda: cargados.append("a"), 40) == "A"
+    cache.obtener("b", lambda: cargados.append("b") or "B", 40)
+    assert cargados == ["b"]
+
+    metricas = cache.metricas()
+    assert metricas["modelos"] == 2
+    assert metricas["aciertos"] == 2
+    assert metricas["fallos"] == 4
+    assert metricas["expulsiones"] == 2
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_conserva_el_ultimo_elemento_aunque_supere_el_limite():
+    cache = CacheLRU(100)
+    cache.obtener("pequeno", lambda: 1, 10)
+    cache.obtener("grande", lambda: 2, 500)
+
+    metricas = cache.metricas()
+    assert metricas["elementos"] == 1
+    assert metricas["expulsiones"] == 1
+    assert cache.obtener("grande", lambda: None, 500) == 2
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_tamano_calculado_a_partir_del_elemento():
+    cache = CacheLRU(10)
+    cache.obtener("a", lambda: b"x" * 6, len)
+    cache.obtener("b", lambda: b"y" * 6, len)
+
+    assert cache.metricas()["elementos"] == 1
+    assert cache.expulsiones == 1
+    assert cache.bytes_expulsados == 6
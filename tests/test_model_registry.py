@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from constants import ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO, ARCHIVO_METADATOS, ARCHIVO_VERSION_ACTUAL
+from model_registry import (
+    activar_version,
+    listar_versiones,
+    publicar_version,
+    resolver_version,
+    ruta_version,
+)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.fixture(autouse=True)
+def carpeta_trabajo(tmp_path, monkeypatch):
+    # Las rutas del registro son relativas, cada prueba trabaja en su propia carpeta
+    monkeypatch.chdir(tmp_path)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def crear_version(usuario: str | None, version_id: str) -> None:
+    ruta = ruta_version(usuario, version_id)
+    os.makedirs(ruta)
+    with open(os.path.join(ruta, ARCHIVO_METADATOS), "w") as f:
+        json.dump({"version": version_id, "usuario": usuario}, f)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_resolver_version_sin_registros_usa_el_modelo_por_defecto():
+    assert resolver_version("ana") == (None, None)
+    assert resolver_version(None) == (None, None)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_resolver_version_usa_el_registro_compartido_como_respaldo():
+    crear_version(None, "20240101-000000-000000")
+    activar_version(None, "20240101-000000-000000")
+
+    assert resolver_version("ana") == (None, "20240101-000000-000000")
+
+    crear_version("ana", "20240201-000000-000000")
+    activar_version("ana", "20240201-000000-000000")
+
+    assert resolver_version("ana") == ("ana", "20240201-000000-000000")
+    assert resolver_version("luis") == (None, "20240101-000000-000000")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_activar_version_anterior():
+    crear_version("ana", "20240101-000000-000000")
+    crear_version("ana", "20240201-000000-000000")
+    activar_version("ana", "20240201-000000-000000")
+    activar_version("ana", "20240101-000000-000000")
+
+    assert resolver_version("ana") == ("ana", "20240101-000000-000000")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_activar_version_inexistente():
+    crear_version("ana", "20240101-000000-000000")
+    activar_version("ana", "20240101-000000-000000")
+
+    with pytest.raises(FileNotFoundError):
+        activar_version("ana", "20990101-000000-000000")
+    assert resolver_version("ana") == ("ana", "20240101-000000-000000")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_usuario_no_valido():
+    with pytest.raises(ValueError):
+        resolver_version("../ana")
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_publicar_version_desde_memoria(modelo_defecto):
+    datos = b"orden,cantidad\n1,100\n"
+    version_id = publicar_version("ana", modelo_defecto, memoryview(datos), {"seed": 0}, {"auc": 0.5})
+
+    assert resolver_version("ana") == ("ana", version_id)
+    with open(os.path.join(ruta_version("ana", version_id), ARCHIVO_DATOS_ENTRENAMIENTO_USUARIO), "rb") as f:
+        assert f.read() == datos
+    (metadatos,) = listar_versiones("ana")
+    assert metadatos["hash_datos"] == hashlib.sha256(datos).hexdigest()
+    assert metadatos["parametros"] == {"seed": 0}
+    # Solo queda el directorio de la versión y el puntero, sin directorios temporales
+    assert sorted(os.listdir(os.path.dirname(ruta_version("ana", version_id)))) == sorted([ARCHIVO_VERSION_ACTUAL, version_id])
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+import motor_duckdb
+from constants import MAPA_RESULTADO
+from cubo_eda import construir_cubo
+from data_repo import cargar_pedidos, preprocesar_datos_eda
+
+pytestmark = pytest.mark.skipif(not motor_duckdb.disponible(), reason="DuckDB no está instalado")
+
+RUTA_DATOS = "static_data/datos_entrenamiento.csv"
+VERSION = "prueba"
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.fixture(autouse=True)
+def carpeta_parquet(tmp_path, monkeypatch):
+    # Los Parquet de la prueba se escriben en una carpeta temporal, no en la de la aplicación
+    monkeypatch.setattr(motor_duckdb, "CARPETA_PARQUET_EDA", str(tmp_path))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.fixture(scope="module")
+def datos_eda():
+    return preprocesar_datos_eda(RUTA_DATOS)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_describir_igual_que_pandas(datos_eda):
+    pd.testing.assert_frame_equal(
+        motor_duckdb.describir(VERSION, RUTA_DATOS),
+        datos_eda.select_dtypes(include="number").describe(),
+        check_dtype=False,
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_correlacion_igual_que_pandas(datos_eda):
+    pd.testing.assert_frame_equal(
+        motor_duckdb.correlacion(VERSION, RUTA_DATOS),
+        datos_eda.select_dtypes(include="number").corr(),
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_conteos_igual_que_pandas(datos_eda):
+    assert motor_duckdb.conteo_target(VERSION, RUTA_DATOS).to_dict() == datos_eda["target"].value_counts().to_dict()
+
+    conteo_pandas = (
+        datos_eda.groupby(["reactor", datos_eda["target"].map(MAPA_RESULTADO).rename("resultado")])
+        .size()
+        .reset_index(name="pedidos")
+    )
+    pd.testing.assert_frame_equal(motor_duckdb.conteo_reactor(VERSION, RUTA_DATOS), conteo_pandas)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_cubo_igual_que_pandas():
+    pd.testing.assert_frame_equal(
+        motor_duckdb.cubo(VERSION, RUTA_DATOS),
+        construir_cubo(cargar_pedidos(VERSION, RUTA_DATOS)),
+        check_dtype=False,
+    )
@@ -0,0 +1,62 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from constants import CAPACIDAD_REACTORES
+from data_repo import cargar_componentes
+from optimizador_lotes import evaluar_lotes_candidatos, optimizar_division, probabilidad_combinada
+
+PASO = 100
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.fixture
+def componentes():
+    componentes = cargar_componentes()
+    return componentes.iloc[[0]].drop("material", axis=1)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def mejor_division_exhaustiva(model, componentes, cantidad: int, max_lotes: int) -> float:
+    """
+    Prueba todas las combinaciones de lotes candidatos y devuelve la menor probabilidad combinada (%).
+    """
+    candidatos = evaluar_lotes_candidatos(model, componentes, PASO)
+    unidades = candidatos["unidades"].to_numpy()
+    probabilidades = candidatos["probabilidad"].to_numpy() / 100
+    mejor = np.inf
+    for k in range(1, max_lotes + 1):
+        for combinacion in itertools.combinations_with_replacement(range(len(candidatos)), k):
+            if unidades[list(combinacion)].sum() * PASO == cantidad:
+                mejor = min(mejor, 1 - np.prod(1 - probabilidades[list(combinacion)]))
+    return mejor * 100
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+@pytest.mark.parametrize("cantidad", [400, 3500, 4200])
+def test_optimizar_division_encuentra_la_mejor_division(modelo_defecto, componentes, cantidad):
+    lotes, resumen = optimizar_division(modelo_defecto, componentes, cantidad, paso=PASO, max_lotes=2)
+
+    assert resumen["probabilidad_combinada"].min() == pytest.approx(
+        mejor_division_exhaustiva(modelo_defecto, componentes, cantidad, 2), abs=0.01
+    )
+    assert lotes["cantidad"].sum() == pytest.approx(cantidad)
+    assert (lotes["cantidad"] <= lotes["reactor"].map(CAPACIDAD_REACTORES)).all()
+    assert probabilidad_combinada(lotes["probabilidad"]) == pytest.approx(
+        resumen["probabilidad_combinada"].min(), abs=0.05
+    )
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_optimizar_division_ajusta_la_cantidad_exacta(modelo_defecto, componentes):
+    lotes, _ = optimizar_division(modelo_defecto, componentes, 3456.5, paso=PASO, max_lotes=3)
+
+    assert lotes["cantidad"].sum() == pytest.approx(3456.5)
+    assert list(lotes["lote"]) == list(range(1, len(lotes) + 1))
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def test_optimizar_division_pedido_demasiado_grande(modelo_defecto, componentes):
+    with pytest.raises(ValueError):
+        optimizar_division(modelo_defecto, componentes, 2 * max(CAPACIDAD_REACTORES.values()) + PASO, max_lotes=2)
@@ -1,48 +1,63 @@
-import base64
+import gzip
+import io
+import mimetypes
+import os
+import shutil
+from functools import partial
 
 import streamlit as st
 
+from constants import EXTENSIONES_DESCARGA_GZIP, TAMANO_BLOQUE_DESCARGA
+
+
 # ----------------------------------------------------------------------------------------------------------------------
-def get_binary_file_downloader_html(bin_file, file_label="File") -> str:
+def leer_fichero_descarga(ruta: str, comprimir: bool) -> bytes:
     """
-    Genera un enlace HTML para descargar un archivo binario.
+    Lee un fichero para descargarlo, por bloques y opcionalmente comprimido con gzip. Solo se llama cuando el
+    usuario pulsa el botón de descarga.
 
     Args:
-        bin_file (str): Ruta al archivo binario que se quiere descargar.
-        file_label (str, opcional): Etiqueta para el archivo en el enlace de descarga. Por defecto es "File".
+        ruta (str): Ruta del fichero.
+        comprimir (bool): Si se comprime con gzip. Se comprime bloque a bloque, sin cargar el fichero entero.
 
     Returns:
-        str: Una cadena de caracteres que representa un enlace de descarga HTML.
+        bytes: Contenido del fichero, comprimido si se indica.
     """
+    with open(ruta, "rb") as f:
+        if not comprimir:
+            return f.read()
 
-    # Abre el archivo binario en modo de lectura binaria
-    with open(bin_file, "rb") as f:
-        data = f.read()  # Lee los datos del archivo
-
-    # Codifica los datos binarios a una cadena base64
-    bin_str = base64.b64encode(data).decode()
-
-    # Crea un enlace HTML para la descarga.
-    # 'data:application/octet-stream' indica que es un stream de datos binarios.
-    # 'base64,{bin_str}' es el archivo codificado en base64.
-    # 'download="{bin_file}"' sugiere el nombre del archivo para la descarga.
-    # 'style="text-decoration: none;"' elimina el subrayado del enlace para mejorar la estética.
-    href = f'<a href="data:application/octet-stream;base64,{bin_str}" download="{bin_file}" style="text-decoration: none;">Descargar {file_label}</a>'
-
-    return href  # Devuelve el enlace de descarga
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode="wb", filename=os.path.basename(ruta)) as gz:
+            shutil.copyfileobj(f, gz, TAMANO_BLOQUE_DESCARGA)
+        return buffer.getvalue()
 
 
 # ----------------------------------------------------------------------------------------------------------------------
-def download_link(file_path: str, description: str) -> None:
+def download_link(file_path: str, description: str, comprimir: bool | None = None) -> None:
     """
-    Muestra un enlace de descarga para un archivo dado y una descripción.
+    Muestra un botón de descarga para un archivo dado y una descripción.
+
+    El contenido no se incrusta en la página: el fichero se lee al pulsar el botón, así el tamaño de la página
+    no depende del de los ficheros.
 
     Args:
         file_path (str): Ruta del archivo a descargar.
         description (str): Descripción del archivo.
+        comprimir (bool | None): Si se descarga comprimido con gzip. Por defecto se comprimen las extensiones de
+            'EXTENSIONES_DESCARGA_GZIP'.
     """
-    file_name = file_path.split("/")[-1]
-    st.markdown(
-        get_binary_file_downloader_html(file_path, file_name), unsafe_allow_html=True
+    file_name = os.path.basename(file_path)
+    if comprimir is None:
+        comprimir = file_name.endswith(EXTENSIONES_DESCARGA_GZIP)
+
+    st.download_button(
+        f"Descargar {file_name}",
+        data=partial(leer_fichero_descarga, file_path, comprimir),
+        file_name=f"{file_name}.gz" if comprimir else file_name,
+        mime="application/gzip" if comprimir else mimetypes.guess_type(file_name)[0],
+        help=f"{os.path.getsize(file_path) / 1024:.0f} KB" + (" sin comprimir" if comprimir else ""),
+        key=f"descarga_{file_path}",
+        on_click="ignore",
     )
     st.write(description)
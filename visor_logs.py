@@ -0,0 +1,198 @@
+import bisect
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Iterator
+
+import streamlit as st
+
+from constants import PASO_INDICE_LOGS, TAMANO_BLOQUE_LOGS
+
+# Cabecera de cada entrada del log: '2024-05-01 10:00:00,123 - tomakeup_logger - INFO - mensaje' en formato de
+# texto y '{"fecha": "2024-05-01 10:00:00,123", "nivel": "INFO", ...' en formato JSON
+PATRON_ENTRADA = re.compile(
+    rb'^(?:\{"fecha": ")?(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d{3}(?: - \S+ - |", "nivel": ")(\w+)'
+)
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+NIVELES_LOG = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Lectura de logs desde el final
+#
+# Los ficheros se recorren hacia atrás por bloques con seek, así mostrar las últimas entradas o una página anterior
+# cuesta lo mismo en un log de pocos KB que en uno de varios GB. Cada página devuelve el offset en bytes de su
+# entrada más antigua, que es el final de la página siguiente. Las líneas sin cabecera (trazas de excepciones) se
+# agrupan con la entrada a la que pertenecen, así los filtros se aplican a entradas completas.
+# ----------------------------------------------------------------------------------------------------------------------
+def lineas_hacia_atras(ruta: str, fin: int | None = None) -> Iterator[tuple[int, bytes]]:
+    """
+    Recorre las líneas de un fichero desde 'fin' hacia el principio.
+
+    Args:
+        ruta (str): Ruta del fichero.
+        fin (int | None): Offset en bytes donde termina la lectura, debe ser un inicio de línea. Por defecto el
+            final del fichero.
+
+    Yields:
+        tuple[int, bytes]: Offset del inicio de la línea y la línea sin el salto de línea.
+    """
+    with open(ruta, "rb") as f:
+        posicion = os.fstat(f.fileno()).st_size if fin is None else fin
+        resto = b""
+        while posicion > 0:
+            tamano = min(TAMANO_BLOQUE_LOGS, posicion)
+            posicion -= tamano
+            f.seek(posicion)
+            datos = f.read(tamano) + resto
+
+            # La primera línea del bloque puede estar cortada, se completa con el bloque anterior
+            lineas = datos.split(b"\n")
+            resto = lineas[0]
+            fin_linea = posicion + len(datos)
+            for linea in reversed(lineas[1:]):
+                inicio = fin_linea - len(linea)
+                if linea:
+                    yield inicio, linea
+                fin_linea = inicio - 1
+
+        if resto:
+            yield 0, resto
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def entradas_hacia_atras(ruta: str, fin: int | None = None) -> Iterator[dict]:
+    """
+    Recorre las entradas de un log desde 'fin' hacia el principio.
+
+    Yields:
+        dict: Entrada con 'offset', 'fecha' (datetime), 'nivel' y 'mensaje' (cabecera y líneas siguientes).
+    """
+    pendientes = []
+    for offset, linea in lineas_hacia_atras(ruta, fin):
+        cabecera = PATRON_ENTRADA.match(linea)
+        if cabecera is None:
+            pendientes.append(linea)
+            continue
+
+        yield {
+            "offset": offset,
+            "fecha": datetime.strptime(cabecera[1].decode(), FORMATO_FECHA),
+            "nivel": cabecera[2].decode(),
+            "mensaje": b"\n".join([linea, *reversed(pendientes)]).decode("utf-8", errors="replace"),
+        }
+        pendientes = []
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def leer_entradas(
+    ruta: str,
+    fin: int | None = None,
+    n_entradas: int = 100,
+    niveles: list[str] | None = None,
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+    texto: str | None = None,
+) -> tuple[list[dict], int | None]:
+    """
+    Devuelve una página de entradas del log que cumplen los filtros, leyendo hacia atrás desde 'fin'.
+
+    Args:
+        ruta (str): Ruta del log.
+        fin (int | None): Offset donde termina la página, devuelto por la página anterior. Por defecto el final
+            del fichero, o el punto del índice de fechas más cercano a 'hasta' si se indica.
+        n_entradas (int): Número máximo de entradas de la página.
+        niveles (list[str] | None): Si se indica, solo las entradas de estos niveles.
+        desde (datetime | None): Si se indica, solo las entradas de esta fecha o posteriores.
+        hasta (datetime | None): Si se indica, solo las entradas de esta fecha o anteriores.
+        texto (str | None): Si se indica, solo las entradas que lo contienen (sin distinguir mayúsculas).
+
+    Returns:
+        tuple[list[dict], int | None]: Entradas en orden cronológico y offset donde termina la página siguiente,
+        None si no hay más entradas.
+    """
+    if fin is None and hasta is not None:
+        fin = offset_fecha(ruta, hasta)
+    texto = texto.lower() if texto else None
+
+    entradas = []
+    for entrada in entradas_hacia_atras(ruta, fin):
+        # Las entradas están en orden cronológico, las anteriores a 'desde' ya no pueden cumplir el filtro
+        if desde is not None and entrada["fecha"] < desde:
+            return entradas[::-1], None
+        if hasta is not None and entrada["fecha"] > hasta:
+            continue
+        if niveles and entrada["nivel"] not in niveles:
+            continue
+        if texto and texto not in entrada["mensaje"].lower():
+            continue
+
+        entradas.append(entrada)
+        if len(entradas) == n_entradas:
+            return entradas[::-1], entrada["offset"] or None
+
+    return entradas[::-1], None
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+# Índice de fechas
+#
+# Para cada log se guarda la fecha de la primera entrada que empieza después de cada múltiplo de 'PASO_INDICE_LOGS'
+# bytes. Construirlo solo necesita un seek y unas pocas líneas por punto, no recorrer el fichero. El log activo
+# crece, así que el índice se amplía con los puntos nuevos y se reconstruye si el fichero cambia (rotación).
+# ----------------------------------------------------------------------------------------------------------------------
+@st.cache_resource
+def obtener_indices_logs() -> tuple[dict, threading.Lock]:
+    """
+    Devuelve los índices de fechas de los logs del proceso, compartidos por todas las sesiones, y su bloqueo.
+    """
+    return {}, threading.Lock()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def indice_fechas(ruta: str) -> list[tuple[datetime, int]]:
+    """
+    Devuelve el índice de fechas de un log, ampliándolo si el fichero ha crecido desde la última consulta.
+
+    Returns:
+        list[tuple[datetime, int]]: Puntos (fecha, offset) ordenados, uno por cada 'PASO_INDICE_LOGS' bytes.
+    """
+    indices, lock = obtener_indices_logs()
+    estado = os.stat(ruta)
+
+    with lock:
+        indice = indices.get(ruta)
+        if indice is None or indice["inodo"] != estado.st_ino or indice["tamano"] > estado.st_size:
+            indice = {"inodo": estado.st_ino, "tamano": 0, "puntos": []}
+
+        puntos = list(indice["puntos"])
+        # Se continúa desde el primer múltiplo del paso que aún no se ha indexado
+        primer_paso = -(-indice["tamano"] // PASO_INDICE_LOGS) * PASO_INDICE_LOGS
+        with open(ruta, "rb") as f:
+            for inicio in range(primer_paso, estado.st_size, PASO_INDICE_LOGS):
+                f.seek(inicio)
+                if inicio > 0:
+                    f.readline()  # Línea cortada por el seek
+                while f.tell() < min(inicio + PASO_INDICE_LOGS, estado.st_size):
+                    offset = f.tell()
+                    cabecera = PATRON_ENTRADA.match(f.readline())
+                    if cabecera is not None:
+                        puntos.append((datetime.strptime(cabecera[1].decode(), FORMATO_FECHA), offset))
+                        break
+
+        indices[ruta] = {"inodo": estado.st_ino, "tamano": estado.st_size, "puntos": puntos}
+        return puntos
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def offset_fecha(ruta: str, fecha: datetime) -> int:
+    """
+    Devuelve un offset del log a partir del cual todas las entradas son posteriores a 'fecha'. Las entradas entre
+    el offset y la fecha buscada están como mucho a 'PASO_INDICE_LOGS' bytes.
+    """
+    puntos = indice_fechas(ruta)
+    posicion = bisect.bisect_right([punto[0] for punto in puntos], fecha)
+    if posicion == len(puntos):
+        return os.path.getsize(ruta)
+    return puntos[posicion][1]